@@ -0,0 +1,141 @@
+"""
+MongoDB index declarations and provisioning (ensure_indexes)
+"""
+import logging
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from utils.idempotency import IDEMPOTENCY_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# collection -> list of index definitions (keys + create_index options)
+INDEX_SPECS = {
+    "users": [
+        {"name": "id_unique", "keys": [("id", ASCENDING)], "unique": True},
+        {"name": "username_unique", "keys": [("username", ASCENDING)], "unique": True},
+    ],
+    "weddings": [
+        {"name": "id_unique", "keys": [("id", ASCENDING)], "unique": True},
+        {"name": "user_id_unique", "keys": [("user_id", ASCENDING)], "unique": True},
+        {"name": "shareable_id_unique", "keys": [("shareable_id", ASCENDING)], "unique": True, "sparse": True},
+    ],
+    "sessions": [
+        {"name": "session_id_unique", "keys": [("session_id", ASCENDING)], "unique": True},
+        # Sliding expiry: each document expires at its own expires_at
+        {"name": "expires_at_ttl", "keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "guestbook": [
+        {"name": "id_unique", "keys": [("id", ASCENDING)], "unique": True},
+        # Serves the newest-first keyset pagination of one wedding's messages
+        {"name": "wedding_id_created_at_id", "keys": [("wedding_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]},
+    ],
+    "rsvps": [
+        # Newest-first keyset pagination and streaming of one wedding's RSVPs
+        {"name": "wedding_id_submitted_at_id", "keys": [("wedding_id", ASCENDING), ("submitted_at", DESCENDING), ("id", DESCENDING)]},
+        # One RSVP per guest; rows without an email are not deduplicated
+        {
+            "name": "wedding_id_guest_email_unique",
+            "keys": [("wedding_id", ASCENDING), ("guest_email", ASCENDING)],
+            "unique": True,
+            "partialFilterExpression": {"guest_email": {"$gt": ""}},
+        },
+    ],
+    "idempotency_keys": [
+        {"name": "key_unique", "keys": [("key", ASCENDING)], "unique": True},
+        {"name": "created_at_ttl", "keys": [("created_at", ASCENDING)], "expireAfterSeconds": IDEMPOTENCY_TTL_SECONDS},
+    ],
+    "rsvp_summaries": [
+        {"name": "wedding_id_unique", "keys": [("wedding_id", ASCENDING)], "unique": True},
+    ],
+    "contributions": [
+        {"name": "wedding_id_payment_status", "keys": [("wedding_id", ASCENDING), ("payment_status", ASCENDING)]},
+        # Confirmation looks contributions up by their PaymentIntent
+        {"name": "stripe_payment_intent_id", "keys": [("stripe_payment_intent_id", ASCENDING)]},
+    ],
+    "stripe_events": [
+        {"name": "id_unique", "keys": [("id", ASCENDING)], "unique": True},
+        # Recovery scan for events that were stored but never applied
+        {"name": "processed_at_received_at", "keys": [("processed_at", ASCENDING), ("received_at", ASCENDING)]},
+        # Stripe stops redelivering after 3 days; keep a month for auditing
+        {"name": "received_at_ttl", "keys": [("received_at", ASCENDING)], "expireAfterSeconds": 30 * 24 * 60 * 60},
+    ],
+    "contribution_totals": [
+        {"name": "wedding_id_unique", "keys": [("wedding_id", ASCENDING)], "unique": True},
+    ],
+}
+
+# Result of the last ensure_indexes() run
+index_report = {"status": "pending", "collections": {}}
+
+
+async def ensure_indexes(database) -> dict:
+    """Create missing indexes declared in INDEX_SPECS and report their state"""
+    index_report["status"] = "running"
+    collections = {}
+
+    for collection_name, specs in INDEX_SPECS.items():
+        collection = database[collection_name]
+        result = {"existing": [], "created": [], "updated": [], "failed": {}}
+        collections[collection_name] = result
+
+        try:
+            existing = await collection.index_information()
+        except OperationFailure as e:
+            result["failed"]["*"] = str(e)
+            continue
+        existing_by_keys = {tuple(info["key"]): (name, info) for name, info in existing.items()}
+
+        for spec in specs:
+            keys = [tuple(key) for key in spec["keys"]]
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            name = spec["name"]
+
+            if tuple(keys) in existing_by_keys:
+                existing_name, info = existing_by_keys[tuple(keys)]
+                ttl = spec.get("expireAfterSeconds")
+                if ttl is not None and info.get("expireAfterSeconds") != ttl:
+                    # TTL changes don't need a rebuild
+                    try:
+                        await database.command(
+                            "collMod", collection_name,
+                            index={"name": existing_name, "expireAfterSeconds": ttl}
+                        )
+                        result["updated"].append(existing_name)
+                    except OperationFailure as e:
+                        result["failed"][existing_name] = str(e)
+                else:
+                    result["existing"].append(existing_name)
+                continue
+
+            logger.info(f"🔧 Missing index {collection_name}.{name}, building")
+            try:
+                await collection.create_index(keys, **options)
+                result["created"].append(name)
+            except OperationFailure as e:
+                # Typically duplicate values blocking a unique index
+                logger.error(f"❌ Could not build index {collection_name}.{name}: {e}")
+                result["failed"][name] = str(e)
+
+    index_report["collections"] = collections
+    index_report["building"] = await _index_builds_in_progress(database)
+    failed = sum(len(result["failed"]) for result in collections.values())
+    index_report["status"] = "degraded" if failed else "ok"
+    logger.info(f"✅ Index provisioning finished ({index_report['status']})")
+    return index_report
+
+
+async def _index_builds_in_progress(database) -> list:
+    """Index builds still running on the server (e.g. started by another worker)"""
+    try:
+        result = await database.client.admin.command({
+            "currentOp": 1,
+            "command.createIndexes": {"$exists": True},
+            "ns": {"$regex": f"^{database.name}\\."}
+        })
+    except Exception:
+        # currentOp needs extra privileges on hosted clusters
+        return []
+    return [
+        {"ns": op.get("ns"), "progress": op.get("progress"), "msg": op.get("msg")}
+        for op in result.get("inprog", [])
+    ]
@@ -20,6 +20,9 @@ class Settings:
     # Stripe Configuration
     STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
     STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+    STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+    # Alternative API host, e.g. the local stub in utils/stripe_stub.py
+    STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")
     
     # CORS Configuration
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
@@ -0,0 +1,209 @@
+"""
+Maintenance commands
+
+Run from the backend directory, e.g.::
+
+    python manage.py rebuild-rsvp-summaries
+    python manage.py rebuild-rsvp-summaries --wedding-id <id>
+    python manage.py dedupe-rsvps
+    python manage.py ensure-indexes
+    python manage.py rebuild-contribution-totals
+    python manage.py reconcile-payments --lookback-days 7
+    python manage.py externalize-media
+    python manage.py generate-media-derivatives
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Optional
+
+import stripe
+import typer
+
+from config import database as db
+from config.indexes import ensure_indexes
+from config.settings import settings
+from utils.media_derivatives import DerivativePipeline
+from utils.media_store import MediaStore, is_data_url
+from utils.contribution_totals import rebuild_totals
+from utils.reconcile import reconcile_pending
+from utils.rsvp_summary import rebuild_summaries
+from utils.stripe_gateway import StripeGateway
+
+app = typer.Typer(help="Wedding Card API maintenance commands")
+
+
+def run(command):
+    """Run an async command against a fresh MongoDB connection"""
+    async def runner():
+        await db.connect_to_mongo()
+        if db.database is None:
+            raise typer.Exit(code=1)
+        try:
+            return await command(db.database)
+        finally:
+            await db.close_mongo_connection()
+    return asyncio.run(runner())
+
+
+@app.command("rebuild-rsvp-summaries")
+def rebuild_rsvp_summaries(
+    wedding_id: Optional[str] = typer.Option(None, help="Only rebuild this wedding's summary"),
+):
+    """Recompute RSVP summary counters from the rsvps collection"""
+    started = time.perf_counter()
+    rebuilt = run(lambda database: rebuild_summaries(database, wedding_id))
+    typer.echo(f"✅ Rebuilt {rebuilt} RSVP summaries in {time.perf_counter() - started:.2f}s")
+
+
+async def dedupe_rsvps(database) -> int:
+    """Keep each guest's latest RSVP and lowercase emails so the unique index can build"""
+    pipeline = [
+        {"$match": {"guest_email": {"$gt": ""}}},
+        {"$sort": {"submitted_at": -1}},
+        {"$group": {
+            "_id": {"wedding_id": "$wedding_id", "email": {"$toLower": {"$trim": {"input": "$guest_email"}}}},
+            "keep": {"$first": "$_id"},
+            "ids": {"$push": "$_id"},
+        }},
+    ]
+    removed = 0
+    async for group in database.rsvps.aggregate(pipeline, allowDiskUse=True):
+        duplicates = [_id for _id in group["ids"] if _id != group["keep"]]
+        if duplicates:
+            result = await database.rsvps.delete_many({"_id": {"$in": duplicates}})
+            removed += result.deleted_count
+        await database.rsvps.update_one({"_id": group["keep"]}, {"$set": {"guest_email": group["_id"]["email"]}})
+    await rebuild_summaries(database)
+    return removed
+
+
+@app.command("dedupe-rsvps")
+def dedupe_rsvps_command():
+    """Remove duplicate RSVPs per (wedding, guest email), keeping the latest"""
+    removed = run(dedupe_rsvps)
+    typer.echo(f"✅ Removed {removed} duplicate RSVPs and rebuilt summaries")
+
+
+@app.command("ensure-indexes")
+def ensure_indexes_command():
+    """Build missing MongoDB indexes now (e.g. after dedupe-rsvps) and wait for them"""
+    report = run(ensure_indexes)
+    for name, result in report["collections"].items():
+        for index_name, error in result["failed"].items():
+            typer.echo(f"❌ {name}.{index_name}: {error}")
+        if result["created"] or result["updated"]:
+            typer.echo(f"🔧 {name}: created {result['created']}, updated {result['updated']}")
+    typer.echo(f"✅ Index provisioning finished ({report['status']})")
+    if report["status"] != "ok":
+        raise typer.Exit(code=1)
+
+
+@app.command("rebuild-contribution-totals")
+def rebuild_contribution_totals(
+    wedding_id: Optional[str] = typer.Option(None, help="Only rebuild this wedding's total"),
+):
+    """Recompute running contribution totals from completed contributions"""
+    started = time.perf_counter()
+    rebuilt = run(lambda database: rebuild_totals(database, wedding_id))
+    typer.echo(f"✅ Rebuilt {rebuilt} contribution totals in {time.perf_counter() - started:.2f}s")
+
+
+@app.command("reconcile-payments")
+def reconcile_payments(
+    lookback_days: int = typer.Option(30, help="Ignore PaymentIntents created before this many days ago"),
+    page_size: int = typer.Option(100, help="PaymentIntents fetched per list call (max 100)"),
+):
+    """Settle pending contributions from Stripe's PaymentIntent list"""
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    gateway = StripeGateway(api_base=settings.STRIPE_API_BASE).configure()
+    try:
+        report = run(lambda database: reconcile_pending(database, gateway, lookback_days, min(page_size, 100)))
+    finally:
+        gateway.close()
+    typer.echo(
+        f"✅ Scanned {report['intents_scanned']} PaymentIntents in {report['pages']} pages, "
+        f"settled {report['matched']} contributions ({report['completed']} completed, {report['failed']} failed) "
+        f"in {report['elapsed_seconds']}s ({report['rows_per_second']} rows/s)"
+    )
+
+
+def _has_data_url(value) -> bool:
+    if is_data_url(value):
+        return True
+    if isinstance(value, dict):
+        return any(_has_data_url(item) for item in value.values())
+    if isinstance(value, list):
+        return any(_has_data_url(item) for item in value)
+    return False
+
+
+async def externalize_wedding_media(database, store: MediaStore) -> tuple:
+    """Move inline data URLs of every wedding into the media store"""
+    weddings = updated = 0
+    # Only weddings with a data URL somewhere are rewritten
+    async for wedding in database.weddings.find({}, {"_id": 0}):
+        weddings += 1
+        changed = {
+            field: await store.externalize(value)
+            for field, value in wedding.items()
+            if _has_data_url(value)
+        }
+        if changed:
+            # Conditional on the version read, so an edit saved meanwhile wins
+            # (the next run picks that wedding up again). The server's public
+            # cache is per process: it expires within PUBLIC_CACHE_TTL and the
+            # new updated_at changes the wedding's ETag.
+            result = await database.weddings.update_one(
+                {"id": wedding["id"], "version": wedding.get("version")},
+                {"$set": {**changed, "updated_at": datetime.utcnow().isoformat()}, "$inc": {"version": 1}}
+            )
+            updated += result.modified_count
+    return weddings, updated
+
+
+@app.command("externalize-media")
+def externalize_media(
+    url_prefix: str = typer.Option("/api/media", envvar="MEDIA_URL_PREFIX", help="Prefix of the stored media URLs"),
+):
+    """Replace inline base64 images in existing weddings with media references"""
+    started = time.perf_counter()
+    store = MediaStore(settings.ROOT_DIR / "media", url_prefix=url_prefix)
+    weddings, updated = run(lambda database: externalize_wedding_media(database, store))
+    typer.echo(
+        f"✅ Externalized media in {updated} of {weddings} weddings "
+        f"({store.stored} new files, {store.deduplicated} duplicates) in {time.perf_counter() - started:.2f}s"
+    )
+
+
+
+async def generate_derivatives(pipeline: DerivativePipeline) -> tuple:
+    """Render missing derivatives of every original in the store"""
+    originals = [
+        path.name for path in pipeline.store.root.glob("*/*")
+        if pipeline.supports(path.name) and pipeline.store.path(path.name) == path and not pipeline.source_of(path.name)
+    ]
+    results = await asyncio.gather(*(pipeline.ensure(media_id) for media_id in originals))
+    pipeline.close()
+    return len(originals), results.count(False)
+
+
+@app.command("generate-media-derivatives")
+def generate_media_derivatives(
+    workers: int = typer.Option(4, help="Worker processes"),
+):
+    """Create the resized WebP copies of images stored before derivatives existed"""
+    started = time.perf_counter()
+    pipeline = DerivativePipeline(MediaStore(settings.ROOT_DIR / "media"), max_workers=workers)
+    if not pipeline.enabled:
+        typer.echo("❌ Pillow is not installed")
+        raise typer.Exit(code=1)
+    originals, failed = asyncio.run(generate_derivatives(pipeline))
+    typer.echo(
+        f"✅ Checked {originals} images, wrote {pipeline.generated} derivatives "
+        f"({failed} failed) in {time.perf_counter() - started:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    app()
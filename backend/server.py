@@ -1,6 +1,6 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Request, Response, status
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
@@ -9,11 +9,31 @@ from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+import hmac
 import json
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import asyncio
 import stripe
+from utils.shard_store import ShardedJsonStore
+from utils.cache import TTLCache
+from utils.http_cache import content_etag, etag_matches, not_modified, wedding_etag
+from utils.json_patch import PatchError, apply_operations, touched_fields
+from utils.pagination import fetch_page, keyset_sort
+from utils.contribution_totals import add_to_totals, complete_contribution, get_totals
+from utils.idempotency import get_stored_response, idempotency_key, store_response
+from utils.reconcile import reconcile_pending
+from utils.rsvp_import import ImportTooLarge, clean_row, csv_chunk, iter_csv_rows, iter_lines, iter_ndjson_rows
+from utils.rsvp_summary import apply_summary_delta, get_summary, merge_deltas, rebuild_summaries, summary_delta
+from utils.media_derivatives import DerivativePipeline
+from utils.media_store import MediaError, MediaStore, MediaTooLarge, is_data_url
+from utils.multipart_upload import MultipartImageUpload
+from utils.persistence import persistence_executor
+from utils.stripe_events import HANDLED_PREFIX as STRIPE_EVENT_PREFIX, StripeEventProcessor, event_record
+from utils.stripe_gateway import StripeGateway, StripeGatewayBusy
+from config.indexes import ensure_indexes, index_report
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -25,14 +45,71 @@ DB_NAME = os.getenv("DB_NAME", "weddingcard")
 # Stripe configuration
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 stripe.api_key = STRIPE_SECRET_KEY
 
+# Stripe calls run on a bounded thread pool (see utils/stripe_gateway.py);
+# STRIPE_API_BASE points them at a local stub for offline load tests
+stripe_gateway = StripeGateway(
+    max_concurrency=int(os.getenv("STRIPE_MAX_CONCURRENCY", "8")),
+    timeout=float(os.getenv("STRIPE_TIMEOUT_SECONDS", "10")),
+    queue_timeout=float(os.getenv("STRIPE_QUEUE_TIMEOUT_SECONDS", "5")),
+    api_base=os.getenv("STRIPE_API_BASE")
+)
+
+# Content-addressed image store; wedding documents keep /api/media/<id> references.
+# MEDIA_URL_PREFIX can be absolute when the frontend is served from another origin
+media_store = MediaStore(
+    ROOT_DIR / 'media',
+    url_prefix=os.getenv("MEDIA_URL_PREFIX", "/api/media"),
+    max_bytes=int(os.getenv("MEDIA_MAX_BYTES", str(10 * 1024 * 1024)))
+)
+
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Resized WebP copies for phones, rendered in worker processes (needs Pillow; 0 disables)
+media_derivatives = DerivativePipeline(
+    media_store,
+    max_workers=int(os.getenv("MEDIA_DERIVATIVE_WORKERS", "2"))
+)
+
+# Limits for one multipart photo upload (MEDIA_MAX_BYTES still applies per file)
+MEDIA_UPLOAD_MAX_BYTES = int(os.getenv("MEDIA_UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+MEDIA_UPLOAD_MAX_FILES = int(os.getenv("MEDIA_UPLOAD_MAX_FILES", "20"))
+
+async def externalize_media(value):
+    """Move inline image data URLs in value into the media store"""
+    stored = []
+    try:
+        value = await media_store.externalize(value, stored)
+    except MediaTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except MediaError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    for media_id in stored:
+        media_derivatives.schedule(media_id)
+    return value
+
+# Periodic settling of contributions left pending (0 disables it; see manage.py reconcile-payments)
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("RECONCILE_INTERVAL_SECONDS", "0"))
+reconcile_task = None
+last_reconcile_report = None
+
+# Webhook events are applied to contributions in batches by a background worker
+stripe_event_processor = StripeEventProcessor(
+    lambda: database,
+    batch_size=int(os.getenv("STRIPE_EVENT_BATCH_SIZE", "100"))
+)
+
 # MongoDB client and database
 mongodb_client = None
 database = None
 
+# Background index provisioning started on connect
+index_task = None
+
 async def connect_to_mongo():
-    global mongodb_client, database
+    global mongodb_client, database, index_task
     try:
         print(f"🔄 Attempting to connect to MongoDB: {MONGO_URL}")
         mongodb_client = AsyncIOMotorClient(MONGO_URL)
@@ -41,6 +118,8 @@ async def connect_to_mongo():
         await database.command("ping")
         print(f"✅ Connected to MongoDB database: {DB_NAME}")
         logger.info(f"✅ Connected to MongoDB database: {DB_NAME}")
+        # Build missing indexes without holding up startup
+        index_task = asyncio.create_task(ensure_indexes(database))
     except Exception as e:
         print(f"❌ Error connecting to MongoDB: {e}")
         logger.error(f"❌ Error connecting to MongoDB: {e}")
@@ -56,6 +135,15 @@ async def close_mongo_connection():
 USERS_FILE = ROOT_DIR / 'users.json'
 WEDDINGS_FILE = ROOT_DIR / 'weddings.json'
 
+# Sharded JSON backups (one file per record + secondary key index), migrated
+# from the monolithic files above on first start
+users_backup = ShardedJsonStore(ROOT_DIR / 'users', index_fields=("username",), legacy_file=USERS_FILE)
+weddings_backup = ShardedJsonStore(
+    ROOT_DIR / 'weddings',
+    index_fields=("shareable_id", "user_id"),
+    legacy_file=WEDDINGS_FILE
+)
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -74,8 +162,58 @@ async def get_collections():
         weddings_collection = database.weddings
     return users_collection, weddings_collection
 
-# Simple session storage (in production, use Redis or similar)
-active_sessions = {}
+# Session cache: bounded LRU with sliding expiry, backed by the sessions
+# collection (TTL index on expires_at) for persistence across restarts
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(30 * 24 * 3600)))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# Push the sliding expiry to MongoDB at most this often per session
+SESSION_REFRESH_SECONDS = int(os.getenv("SESSION_REFRESH_SECONDS", "3600"))
+# Re-check cached sessions against MongoDB at most this often, so a logout
+# handled by another worker takes effect here too
+SESSION_REVALIDATE_SECONDS = int(os.getenv("SESSION_REVALIDATE_SECONDS", "60"))
+active_sessions = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_TTL_SECONDS, sliding=True)
+session_sweep_task = None
+
+# Read-through cache of sanitized public wedding payloads, keyed by lookup
+# ("public", id) / ("share", shareable_id) / ("user", username) and tagged with
+# the wedding id and owner id so any write drops every cached view of it
+PUBLIC_CACHE_TTL = float(os.getenv("PUBLIC_CACHE_TTL", "60"))
+PUBLIC_CACHE_SIZE = int(os.getenv("PUBLIC_CACHE_SIZE", "2048"))
+public_wedding_cache = TTLCache(maxsize=PUBLIC_CACHE_SIZE, ttl=PUBLIC_CACHE_TTL)
+
+def public_wedding_payload(wedding: dict) -> dict:
+    """Strip owner and storage fields from a wedding for public access
+    
+    media_variants maps each stored image URL in the payload to its resized
+    copies ({"thumb": url, "medium": url, "large": url}) for srcset.
+    """
+    public_data = {k: v for k, v in wedding.items() if k not in ["user_id", "_id"]}
+    public_data["media_variants"] = media_derivatives.variant_map(public_data)
+    return public_data
+
+def cache_public_wedding(key: tuple, wedding: dict) -> tuple:
+    """Sanitize a wedding and cache it with its ETag under key"""
+    public_data = public_wedding_payload(wedding)
+    etag = wedding_etag("public", wedding) or content_etag("public", public_data)
+    entry = (public_data, etag)
+    public_wedding_cache.set(key, entry, tags=(wedding.get("id"), wedding.get("user_id")))
+    return entry
+
+def conditional_response(entry: tuple, response: Response, if_none_match: Optional[str]):
+    """Return 304 if the client's validator matches, else the payload with its ETag"""
+    payload, etag = entry
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return payload
+
+# Only id + updated_at are needed to validate an ETag
+ETAG_PROJECTION = {"_id": 0, "id": 1, "updated_at": 1}
+
+def invalidate_public_wedding(*tags):
+    """Drop cached public payloads for a wedding id and/or owner user id"""
+    public_wedding_cache.invalidate(*tags)
 
 # Models
 class UserRegister(BaseModel):
@@ -125,7 +263,6 @@ class WeddingData(BaseModel):
     faqs: List[dict] = []
     theme: str = "classic"
     rsvp_responses: List[dict] = []  # Store RSVP responses
-    guestbook_messages: List[dict] = []  # Store guestbook messages in owner's document
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -147,7 +284,6 @@ class WeddingDataCreate(BaseModel):
     honeymoon_fund: dict = {}
     faqs: List[dict] = []
     theme: str = "classic"
-    guestbook_messages: List[dict] = []  # Store guestbook messages in owner's document
 
 class AuthResponse(BaseModel):
     session_id: str
@@ -187,31 +323,23 @@ class PaymentRequest(BaseModel):
     currency: str = "inr"
     message: Optional[str] = ""
 
-# Simple file operations
-def load_json_file(filename):
-    if not filename.exists():
-        return {}
-    try:
-        with open(filename, 'r') as f:
-            return json.load(f)
-    except:
-        return {}
-
-def save_json_file(filename, data):
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2, default=str)
-
 # MongoDB-based authentication helper functions
-async def create_simple_session(user_id: str) -> str:
+async def create_simple_session(user_id: str, user: Optional[User] = None) -> str:
     session_id = str(uuid.uuid4())
+    now = datetime.utcnow()
     session_data = {
         "session_id": session_id,
         "user_id": user_id,
-        "created_at": datetime.utcnow()
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=SESSION_TTL_SECONDS)
     }
     
-    # Store in memory for fast access
-    active_sessions[session_id] = session_data
+    # Store in memory for fast access, with the already validated user so
+    # authenticated requests need no user lookup
+    active_sessions.set(
+        session_id,
+        {**session_data, "refreshed_at": now, "validated_at": now, "user": user}
+    )
     
     # Also store in MongoDB for persistence across server restarts
     users_coll, weddings_coll = await get_collections()
@@ -242,9 +370,11 @@ async def get_current_user_simple(session_id: str = None):
             if users_coll is not None:
                 sessions_collection = database.sessions
                 session_data = await sessions_collection.find_one({"session_id": session_id})
-                if session_data:
+                # The TTL monitor only runs once a minute, so check expiry here too
+                if session_data and not session_expired(session_data):
                     # Restore to memory cache
-                    active_sessions[session_id] = session_data
+                    session_data["refreshed_at"] = session_data["validated_at"] = datetime.utcnow()
+                    active_sessions.set(session_id, session_data)
                     session = session_data
                     print(f"✅ Session {session_id} restored from MongoDB")
         except Exception as e:
@@ -256,6 +386,18 @@ async def get_current_user_simple(session_id: str = None):
             detail="Invalid session"
         )
     
+    if not await revalidate_session(session):
+        # Logged out (or expired) through another worker
+        active_sessions.pop(session_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid session"
+        )
+    
+    # Hot path: the user was cached with the session
+    if session.get("user") is not None:
+        return session["user"]
+    
     users_coll, weddings_coll = await get_collections()
     user_data = await users_coll.find_one({"id": session["user_id"]})
     
@@ -265,7 +407,59 @@ async def get_current_user_simple(session_id: str = None):
             detail="User not found"
         )
     
-    return User(**user_data)
+    session["user"] = User(**user_data)
+    return session["user"]
+
+def session_expired(session_data: dict) -> bool:
+    expires_at = session_data.get("expires_at")
+    if expires_at is None:
+        # Sessions stored before expiry tracking live for one TTL from creation
+        created_at = session_data.get("created_at") or datetime.utcnow()
+        expires_at = created_at + timedelta(seconds=SESSION_TTL_SECONDS)
+    return expires_at <= datetime.utcnow()
+
+async def revalidate_session(session: dict) -> bool:
+    """Check a cached session still exists in MongoDB, at most once per
+    SESSION_REVALIDATE_SECONDS, sliding its persisted expiry forward at most
+    once per SESSION_REFRESH_SECONDS. Returns False if it is gone."""
+    now = datetime.utcnow()
+    if (now - session.get("validated_at", now)).total_seconds() < SESSION_REVALIDATE_SECONDS:
+        return True
+    # Mark first so concurrent requests on the same session don't all query
+    session["validated_at"] = now
+    try:
+        if (now - session.get("refreshed_at", now)).total_seconds() >= SESSION_REFRESH_SECONDS:
+            session["refreshed_at"] = now
+            result = await database.sessions.update_one(
+                {"session_id": session["session_id"]},
+                {"$set": {"expires_at": now + timedelta(seconds=SESSION_TTL_SECONDS)}}
+            )
+            return result.matched_count > 0
+        return await database.sessions.count_documents({"session_id": session["session_id"]}, limit=1) > 0
+    except Exception as e:
+        # MongoDB unavailable: keep serving from the cache
+        print(f"⚠️ Failed to revalidate session in MongoDB: {e}")
+        return True
+
+async def sweep_sessions_periodically():
+    """Drop expired sessions from memory in the background"""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        removed = active_sessions.sweep()
+        if removed:
+            logger.info(f"🧹 Swept {removed} expired sessions")
+
+async def reconcile_payments_periodically():
+    """Settle pending contributions against Stripe's PaymentIntent list"""
+    global last_reconcile_report
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL_SECONDS)
+        try:
+            last_reconcile_report = await reconcile_pending(database, stripe_gateway)
+            if last_reconcile_report["matched"]:
+                logger.info(f"✅ Reconciled {last_reconcile_report['matched']} pending contributions")
+        except Exception as e:
+            logger.error(f"❌ Payment reconciliation failed: {e}")
 
 # Auth Routes - MongoDB-based
 @api_router.post("/auth/register", response_model=AuthResponse)
@@ -291,9 +485,7 @@ async def register(user_data: UserRegister):
     await users_coll.insert_one(user_dict)
     
     # Also save to JSON as backup
-    users = load_json_file(USERS_FILE)
-    users[user.id] = user_dict
-    save_json_file(USERS_FILE, users)
+    await users_backup.set(user.id, user_dict)
     
     # Create default wedding data for new user with auto-generated shareable ID
     shareable_id = str(uuid.uuid4())[:8]  # Short 8-character shareable ID
@@ -343,12 +535,10 @@ async def register(user_data: UserRegister):
     await weddings_coll.insert_one(wedding_dict)
     
     # Also save to JSON as backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    weddings[default_wedding_data.id] = wedding_dict
-    save_json_file(WEDDINGS_FILE, weddings)
+    await weddings_backup.set(default_wedding_data.id, wedding_dict)
     
     # Create simple session
-    session_id = await create_simple_session(user.id)
+    session_id = await create_simple_session(user.id, user)
     
     return AuthResponse(
         session_id=session_id,
@@ -374,7 +564,7 @@ async def login(user_data: UserLogin):
         )
     
     # Create simple session
-    session_id = await create_simple_session(user_found["id"])
+    session_id = await create_simple_session(user_found["id"], User(**user_found))
     
     return AuthResponse(
         session_id=session_id,
@@ -383,6 +573,24 @@ async def login(user_data: UserLogin):
         success=True
     )
 
+@api_router.post("/auth/logout")
+async def logout(request_data: dict):
+    session_id = request_data.get('session_id')
+    if not session_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Session ID required"
+        )
+    
+    # Drops the cached user along with the session
+    active_sessions.pop(session_id)
+    try:
+        await database.sessions.delete_one({"session_id": session_id})
+    except Exception as e:
+        print(f"⚠️ Failed to delete session from MongoDB: {e}")
+    
+    return {"success": True}
+
 # MongoDB-based Wedding Data Routes
 @api_router.post("/wedding")
 async def create_wedding_data(request_data: dict):
@@ -406,6 +614,7 @@ async def create_wedding_data(request_data: dict):
     
     # Remove session_id from the data before creating wedding
     wedding_create_data = {k: v for k, v in request_data.items() if k != 'session_id'}
+    wedding_create_data = await externalize_media(wedding_create_data)
     
     # Generate shareable link ID automatically (shorter and user-friendly)
     shareable_id = str(uuid.uuid4())[:8]  # Short 8-character ID
@@ -426,14 +635,46 @@ async def create_wedding_data(request_data: dict):
     wedding_dict["_id"] = str(result.inserted_id)
     
     # Also save to JSON as backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    weddings[wedding.id] = wedding_dict
-    save_json_file(WEDDINGS_FILE, weddings)
+    await weddings_backup.set(wedding.id, wedding_dict)
+    
+    # The owner's username page may have cached the default card
+    invalidate_public_wedding(wedding.id, current_user.id)
     
     # Remove _id from response
     response_data = {k: v for k, v in wedding_dict.items() if k != "_id"}
     return response_data
 
+# Fields a patch or PUT may not touch; guestbook_messages now lives in the
+# guestbook collection and stale editor state must not bring it back
+PATCH_PROTECTED_FIELDS = {
+    "_id", "id", "user_id", "shareable_id", "created_at", "updated_at", "version", "guestbook_messages"
+}
+
+async def update_user_wedding(user_id: str, update_fields: dict, projection: dict = None) -> dict:
+    """$set fields on the user's wedding and return the post-image (404 if none)
+    
+    Protected fields sent by the client (e.g. the version it loaded) are
+    ignored; only updated_at is set by the callers themselves.
+    """
+    users_coll, weddings_coll = await get_collections()
+    update_fields = {
+        k: v for k, v in update_fields.items()
+        if k == "updated_at" or k not in PATCH_PROTECTED_FIELDS
+    }
+    update_fields = await externalize_media(update_fields)
+    updated_wedding = await weddings_coll.find_one_and_update(
+        {"user_id": user_id},
+        {"$set": update_fields, "$inc": {"version": 1}},
+        projection=projection,
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_wedding:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Wedding data not found"
+        )
+    return updated_wedding
+
 @api_router.put("/wedding")
 async def update_wedding_data(request_data: dict):
     session_id = request_data.get('session_id')
@@ -446,41 +687,139 @@ async def update_wedding_data(request_data: dict):
     current_user = await get_current_user_simple(session_id)
     users_coll, weddings_coll = await get_collections()
     
-    # Find existing wedding
-    existing_wedding = await weddings_coll.find_one({"user_id": current_user.id})
-    if not existing_wedding:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Wedding data not found"
-        )
-    
     # Remove session_id from the data before updating
     update_fields = {k: v for k, v in request_data.items() if k != 'session_id'}
     update_fields["updated_at"] = datetime.utcnow().isoformat()
     
-    # Update ONLY the fields sent, using MongoDB $set to preserve other fields
-    await weddings_coll.update_one(
-        {"user_id": current_user.id},
-        {"$set": update_fields}
-    )
-    
-    # Get the COMPLETE updated wedding data from MongoDB
-    updated_wedding = await weddings_coll.find_one({"user_id": current_user.id})
+    # Update ONLY the fields sent, using MongoDB $set to preserve other fields,
+    # and get the COMPLETE updated wedding data back in the same operation
+    updated_wedding = await update_user_wedding(current_user.id, update_fields)
     
     # Also update JSON backup with COMPLETE data
-    weddings = load_json_file(WEDDINGS_FILE)
     complete_data = {k: v for k, v in updated_wedding.items() if k != "_id"}
-    weddings[updated_wedding["id"]] = complete_data
-    save_json_file(WEDDINGS_FILE, weddings)
+    await weddings_backup.set(updated_wedding["id"], complete_data)
+    invalidate_public_wedding(updated_wedding["id"], current_user.id)
     
     # Return the COMPLETE wedding data (not just updated fields)
     return complete_data
 
+PATCH_MAX_RETRIES = 3
+
+@api_router.patch("/wedding")
+async def patch_wedding_data(request_data: dict):
+    """Apply JSON-patch style operations to individual fields/array items
+    
+    Body: {"session_id", "operations": [{"op", "path", "value"?, "from"?}],
+    "base_version"?}. Only the touched top-level fields are read and written,
+    and the response carries just the changed paths and the new version.
+    """
+    session_id = request_data.get('session_id')
+    if not session_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Session ID required"
+        )
+    
+    operations = request_data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="operations must be a non-empty list"
+        )
+    
+    try:
+        fields = touched_fields(operations)
+    except PatchError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    protected = fields & PATCH_PROTECTED_FIELDS
+    if protected:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Fields cannot be patched: {', '.join(sorted(protected))}"
+        )
+    
+    current_user = await get_current_user_simple(session_id)
+    users_coll, weddings_coll = await get_collections()
+    operations = await externalize_media(operations)
+    base_version = request_data.get('base_version')
+    projection = {"_id": 0, "id": 1, "version": 1, **{field: 1 for field in fields}}
+    
+    for _ in range(PATCH_MAX_RETRIES):
+        current = await weddings_coll.find_one({"user_id": current_user.id}, projection)
+        if not current:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Wedding data not found"
+            )
+        current_version = current.get("version", 0)
+        if base_version is not None and base_version != current_version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Wedding was modified", "version": current_version}
+            )
+        
+        try:
+            patched = apply_operations(current, operations)
+        except PatchError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        
+        update_fields = {field: patched[field] for field in fields if field in patched}
+        update_fields["updated_at"] = datetime.utcnow().isoformat()
+        update = {"$set": update_fields, "$inc": {"version": 1}}
+        removed = [field for field in fields if field not in patched]
+        if removed:
+            update["$unset"] = {field: "" for field in removed}
+        
+        # Compare-and-set on version so concurrent saves can't interleave
+        version_filter = {"version": current_version} if "version" in current else {"version": {"$exists": False}}
+        updated = await weddings_coll.find_one_and_update(
+            {"user_id": current_user.id, **version_filter},
+            update,
+            projection={"_id": 0, "id": 1, "version": 1, "updated_at": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if updated:
+            break
+        if base_version is not None:
+            # The caller pinned a version that just went stale
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Wedding was modified", "version": current_version + 1}
+            )
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Wedding is being modified concurrently, please retry"
+        )
+    
+    # Keep the JSON backup and public caches in step
+    backup_fields = {**update_fields, "version": updated["version"]}
+    await weddings_backup.update(updated["id"], backup_fields)
+    invalidate_public_wedding(updated["id"], current_user.id)
+    
+    return {
+        "success": True,
+        "version": updated["version"],
+        "updated_at": updated["updated_at"],
+        "changed_paths": [operation["path"] for operation in operations]
+    }
+
 @api_router.get("/wedding")
-async def get_wedding_data(session_id: str):
+async def get_wedding_data(
+    session_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None)
+):
     current_user = await get_current_user_simple(session_id)
     users_coll, weddings_coll = await get_collections()
     
+    if if_none_match:
+        # Validate against a tiny projection before loading the document body
+        stamp = await weddings_coll.find_one({"user_id": current_user.id}, ETAG_PROJECTION)
+        etag = wedding_etag("owner", stamp) if stamp else None
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    
     wedding_data = await weddings_coll.find_one({"user_id": current_user.id})
     if not wedding_data:
         raise HTTPException(
@@ -490,96 +829,136 @@ async def get_wedding_data(session_id: str):
     
     # Remove _id from response
     response_data = {k: v for k, v in wedding_data.items() if k != "_id"}
+    response.headers["ETag"] = wedding_etag("owner", wedding_data) or content_etag("owner", response_data)
     return response_data
 
 @api_router.get("/wedding/public/{wedding_id}")
-async def get_public_wedding_data(wedding_id: str):
+async def get_public_wedding_data(
+    wedding_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None)
+):
+    cache_key = ("public", wedding_id)
+    cached = public_wedding_cache.get(cache_key)
+    if cached is not None:
+        return conditional_response(cached, response, if_none_match)
+    
     users_coll, weddings_coll = await get_collections()
     
+    if if_none_match:
+        # Validate against a tiny projection before loading the document body
+        stamp = await weddings_coll.find_one({"id": wedding_id}, ETAG_PROJECTION)
+        etag = wedding_etag("public", stamp) if stamp else None
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    
     # Try MongoDB first
     wedding = await weddings_coll.find_one({"id": wedding_id})
     
     if not wedding:
-        # Fallback to JSON file
-        weddings = load_json_file(WEDDINGS_FILE)
-        if wedding_id not in weddings:
+        # Fallback to JSON backup
+        wedding = await weddings_backup.get(wedding_id)
+        if not wedding:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Wedding not found"
             )
-        wedding = weddings[wedding_id]
     
     # Remove sensitive data for public access
-    public_data = {k: v for k, v in wedding.items() if k not in ["user_id", "_id"]}
-    return public_data
+    entry = cache_public_wedding(cache_key, wedding)
+    return conditional_response(entry, response, if_none_match)
 
 # Add shareable link endpoint 
 @api_router.get("/wedding/share/{shareable_id}")
-async def get_wedding_by_shareable_id(shareable_id: str):
+async def get_wedding_by_shareable_id(
+    shareable_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None)
+):
+    cache_key = ("share", shareable_id)
+    cached = public_wedding_cache.get(cache_key)
+    if cached is not None:
+        return conditional_response(cached, response, if_none_match)
+    
     users_coll, weddings_coll = await get_collections()
     
+    if if_none_match:
+        # Validate against a tiny projection before loading the document body
+        stamp = await weddings_coll.find_one({"shareable_id": shareable_id}, ETAG_PROJECTION)
+        etag = wedding_etag("public", stamp) if stamp else None
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    
     # Search for wedding by shareable_id ONLY (8-character system)
     wedding = await weddings_coll.find_one({"shareable_id": shareable_id})
     
+    if not wedding:
+        # Fallback to the in-memory shareable_id index of the JSON backup (O(1), no scan)
+        wedding = await weddings_backup.get_by("shareable_id", shareable_id)
+    
     if wedding:
         # Remove sensitive data for public access
-        public_data = {k: v for k, v in wedding.items() if k not in ["user_id", "_id"]}
-        return public_data
-    
-    # Fallback to JSON file for shareable_id ONLY
-    weddings = load_json_file(WEDDINGS_FILE)
-    for wedding_id, wedding_data in weddings.items():
-        # Check ONLY shareable_id (no more custom_url support)
-        if wedding_data.get("shareable_id") == shareable_id:
-            # Remove sensitive data for public access
-            public_data = {k: v for k, v in wedding_data.items() if k not in ["user_id"]}
-            return public_data
+        entry = cache_public_wedding(cache_key, wedding)
+        return conditional_response(entry, response, if_none_match)
 
 # Username-based routing endpoints
-@api_router.get("/wedding/user/{username}")
-async def get_wedding_by_username(username: str):
-    """Get wedding data by username for personalized URLs"""
+async def find_wedding_by_username(username: str):
+    """Resolve a username to (user, wedding) in a single database round trip"""
     users_coll, weddings_coll = await get_collections()
     
-    # Find user by username
-    user = await users_coll.find_one({"username": username})
+    # users.username and weddings.user_id are both indexed, so this is two index lookups server-side
+    pipeline = [
+        {"$match": {"username": username}},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": weddings_coll.name,
+            "localField": "id",
+            "foreignField": "user_id",
+            "as": "weddings"
+        }},
+        {"$project": {"_id": 0, "id": 1, "weddings": {"$slice": ["$weddings", 1]}}}
+    ]
+    results = await users_coll.aggregate(pipeline).to_list(length=1)
+    if not results:
+        return None, None
+    
+    user = results[0]
+    weddings = user.pop("weddings", None) or []
+    return user, (weddings[0] if weddings else None)
+
+async def get_public_wedding_by_username(username: str) -> dict:
+    """Cached public payload for a username (default card if not customized yet)"""
+    cache_key = ("user", username)
+    cached = public_wedding_cache.get(cache_key)
+    if cached is not None:
+        return cached[0]
+    
+    user, wedding = await find_wedding_by_username(username)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    # Get user's wedding data
-    wedding = await weddings_coll.find_one({"user_id": user["id"]})
     if not wedding:
-        # Return default wedding data if user hasn't customized yet
-        return get_default_wedding_data()
+        # Return default wedding data if user hasn't customized yet;
+        # tagged with the user id so creating the wedding invalidates it
+        wedding = {**get_default_wedding_data(), "user_id": user["id"]}
     
     # Remove sensitive data for public access
-    public_data = {k: v for k, v in wedding.items() if k not in ["user_id", "_id"]}
+    public_data, _ = cache_public_wedding(cache_key, wedding)
     return public_data
 
+@api_router.get("/wedding/user/{username}")
+async def get_wedding_by_username(username: str):
+    """Get wedding data by username for personalized URLs"""
+    return await get_public_wedding_by_username(username)
+
 @api_router.get("/wedding/user/{username}/{section}")
 async def get_wedding_section_by_username(username: str, section: str):
     """Get specific section data by username for section-based URLs"""
-    users_coll, weddings_coll = await get_collections()
-    
-    # Find user by username
-    user = await users_coll.find_one({"username": username})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    # Get user's wedding data
-    wedding = await weddings_coll.find_one({"user_id": user["id"]})
-    if not wedding:
-        # Return default wedding data if user hasn't customized yet
-        wedding = get_default_wedding_data()
-    
-    # Remove sensitive data
-    public_data = {k: v for k, v in wedding.items() if k not in ["user_id", "_id"]}
+    # Copy so the section metadata doesn't leak into the cached payload
+    public_data = dict(await get_public_wedding_by_username(username))
     
     # Add section metadata
     public_data["current_section"] = section
@@ -787,15 +1166,15 @@ async def get_profile(session_id: str):
     }
 
 # RSVP Endpoints
-@api_router.post("/rsvp")
-async def submit_rsvp(rsvp_data: dict):
-    users_coll, weddings_coll = await get_collections()
-    
-    # Create RSVP response
+def normalize_guest_email(email) -> str:
+    return (email or "").strip().lower()
+
+def build_rsvp(wedding_id: str, rsvp_data: dict) -> dict:
+    """RSVP document ready for storage from submitted/imported fields"""
     rsvp_response = RSVPResponse(
-        wedding_id=rsvp_data.get('wedding_id', ''),
+        wedding_id=wedding_id,
         guest_name=rsvp_data.get('guest_name', ''),
-        guest_email=rsvp_data.get('guest_email', ''),
+        guest_email=normalize_guest_email(rsvp_data.get('guest_email')),
         guest_phone=rsvp_data.get('guest_phone', ''),
         attendance=rsvp_data.get('attendance', ''),
         guest_count=int(rsvp_data.get('guest_count', 1)),
@@ -806,37 +1185,289 @@ async def submit_rsvp(rsvp_data: dict):
     # Convert to dict
     rsvp_dict = rsvp_response.dict()
     rsvp_dict["submitted_at"] = rsvp_dict["submitted_at"].isoformat()
+    return rsvp_dict
+
+def rsvp_upsert_filter(rsvp_dict: dict) -> dict:
+    return {"wedding_id": rsvp_dict["wedding_id"], "guest_email": rsvp_dict["guest_email"]}
+
+async def store_rsvp(rsvp_dict: dict) -> tuple:
+    """Insert an RSVP, or replace the guest's earlier answer; returns (rsvp_id, updated)
+
+    RSVPs are unique per (wedding_id, guest_email), so a guest changing their
+    answer updates their row and the summary counters move by the difference.
+    """
+    rsvps_collection = database.rsvps
+    if not rsvp_dict["guest_email"]:
+        # Nothing to deduplicate on
+        await rsvps_collection.insert_one(dict(rsvp_dict))
+        await apply_summary_delta(database, rsvp_dict["wedding_id"], summary_delta(rsvp_dict))
+        return rsvp_dict["id"], False
+    
+    fields = {k: v for k, v in rsvp_dict.items() if k != "id"}
+    for attempt in range(2):
+        try:
+            previous = await rsvps_collection.find_one_and_update(
+                rsvp_upsert_filter(rsvp_dict),
+                {"$set": fields, "$setOnInsert": {"id": rsvp_dict["id"]}},
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+            break
+        except DuplicateKeyError:
+            # Lost an insert race with the same guest; the retry updates their row
+            if attempt:
+                raise
+    
+    delta = merge_deltas(summary_delta(previous, -1), summary_delta(rsvp_dict))
+    await apply_summary_delta(database, rsvp_dict["wedding_id"], delta)
+    if previous:
+        return previous["id"], True
+    return rsvp_dict["id"], False
+
+@api_router.post("/rsvp")
+async def submit_rsvp(rsvp_data: dict, idempotency_key_header: Optional[str] = Header(None, alias="Idempotency-Key")):
+    key = idempotency_key(idempotency_key_header, rsvp_data)
+    wedding_id = rsvp_data.get('wedding_id', '')
+    scope = f"rsvp:{wedding_id}"
+    replay = await get_stored_response(database, scope, key)
+    if replay is not None:
+        return replay
+    
+    rsvp_dict = build_rsvp(wedding_id, rsvp_data)
     
     # Store RSVP in separate collection
-    rsvps_collection = database.rsvps
-    await rsvps_collection.insert_one(rsvp_dict)
+    rsvp_id, updated = await store_rsvp(rsvp_dict)
     
-    return {"success": True, "message": "RSVP submitted successfully", "rsvp_id": rsvp_response.id}
+    response = {
+        "success": True,
+        "message": "RSVP updated successfully" if updated else "RSVP submitted successfully",
+        "rsvp_id": rsvp_id,
+        "updated": updated
+    }
+    return await store_response(database, scope, key, response)
+
+@api_router.get("/rsvp/{wedding_id}/summary")
+async def get_rsvp_summary(wedding_id: str):
+    """Attending/declined counts, headcount and dietary tallies for a wedding"""
+    summary = await get_summary(database, wedding_id)
+    return {"success": True, "summary": summary}
+
+RSVP_STREAM_BATCH_SIZE = 500
+RSVP_STREAM_MAX_BATCH_SIZE = 2000
+
+async def stream_rsvps(wedding_id: str, batch_size: int):
+    """Yield a wedding's RSVPs as NDJSON, one Mongo batch per chunk"""
+    cursor = database.rsvps.find(
+        {"wedding_id": wedding_id},
+        {"_id": 0}
+    ).sort(keyset_sort("submitted_at")).batch_size(batch_size)
+    
+    lines = []
+    async for rsvp in cursor:
+        lines.append(json.dumps(rsvp, default=str) + "\n")
+        if len(lines) >= batch_size:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+async def list_rsvps(wedding_id: str, limit: Optional[int], cursor: Optional[str],
+                     format: Optional[str], batch_size: int):
+    """One newest-first page of RSVPs, or all of them streamed with format=ndjson"""
+    if format == "ndjson":
+        batch_size = max(1, min(batch_size, RSVP_STREAM_MAX_BATCH_SIZE))
+        return StreamingResponse(stream_rsvps(wedding_id, batch_size), media_type="application/x-ndjson")
+    if format not in (None, "json"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be 'json' or 'ndjson'"
+        )
+    
+    page = await fetch_page(database.rsvps, {"wedding_id": wedding_id}, "submitted_at", limit, cursor)
+    return {
+        "success": True,
+        "rsvps": page["items"],
+        "total_count": page["total_count"],
+        "next_cursor": page["next_cursor"]
+    }
 
-@api_router.get("/rsvp/{wedding_id}")
-async def get_wedding_rsvps(wedding_id: str):
-    """Get all RSVPs for a specific wedding (for admin/couple view)"""
+# Bulk import / export (registered before /rsvp/{wedding_id} so "export" isn't taken for an id)
+RSVP_IMPORT_BATCH_SIZE = int(os.getenv("RSVP_IMPORT_BATCH_SIZE", "500"))
+RSVP_IMPORT_MAX_BYTES = int(os.getenv("RSVP_IMPORT_MAX_BYTES", str(10 * 1024 * 1024)))
+RSVP_IMPORT_MAX_ERRORS = 100
+
+async def get_user_wedding_id(session_id: str) -> str:
+    current_user = await get_current_user_simple(session_id)
     users_coll, weddings_coll = await get_collections()
+    wedding = await weddings_coll.find_one({"user_id": current_user.id}, {"_id": 0, "id": 1})
+    if not wedding:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User wedding not found"
+        )
+    return wedding["id"]
+
+async def write_rsvp_batch(batch: list) -> tuple:
+    """bulk_write one batch of (row_number, rsvp) pairs; returns (inserted, updated, errors)"""
+    requests = []
+    for _, rsvp_dict in batch:
+        if rsvp_dict["guest_email"]:
+            fields = {k: v for k, v in rsvp_dict.items() if k != "id"}
+            requests.append(UpdateOne(
+                rsvp_upsert_filter(rsvp_dict),
+                {"$set": fields, "$setOnInsert": {"id": rsvp_dict["id"]}},
+                upsert=True
+            ))
+        else:
+            requests.append(InsertOne(dict(rsvp_dict)))
     
-    # Get RSVPs for this wedding
-    rsvps_collection = database.rsvps
-    rsvps = await rsvps_collection.find({"wedding_id": wedding_id}).to_list(length=None)
+    try:
+        result = await database.rsvps.bulk_write(requests, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        # Unordered: every other row of the batch was still written
+        details = e.details
+    
+    errors = [
+        {"row": batch[error["index"]][0], "error": error.get("errmsg", "Write failed")}
+        for error in details.get("writeErrors", [])
+    ]
+    inserted = details.get("nInserted", 0) + details.get("nUpserted", 0)
+    return inserted, details.get("nMatched", 0), errors
+
+@api_router.post("/rsvp/import")
+async def import_rsvps(request: Request, session_id: str, format: Optional[str] = None):
+    """Bulk import RSVPs from a CSV (with header row) or NDJSON request body
+    
+    Rows are parsed as the body streams in and written in unordered batches;
+    rows for a guest email that already has an RSVP update it. Bad rows are
+    reported by row number without stopping the import.
+    
+    Batches written before a 413 stay committed and the error detail reports
+    how many; the batch still pending is dropped. A client disconnect stops
+    the import without writing anything further.
+    """
+    wedding_id = await get_user_wedding_id(session_id)
+    
+    content_type = request.headers.get("content-type", "")
+    format = format or ("ndjson" if "json" in content_type else "csv")
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be 'csv' or 'ndjson'"
+        )
+    lines = iter_lines(request.stream(), RSVP_IMPORT_MAX_BYTES)
+    rows = iter_csv_rows(lines) if format == "csv" else iter_ndjson_rows(lines)
+    
+    inserted = updated = failed = total = 0
+    errors = []
     
-    # Remove _id from response and format dates
-    response_data = []
-    for rsvp in rsvps:
-        clean_rsvp = {k: v for k, v in rsvp.items() if k != "_id"}
-        response_data.append(clean_rsvp)
+    def record_errors(new_errors):
+        nonlocal failed
+        failed += len(new_errors)
+        errors.extend(new_errors[:RSVP_IMPORT_MAX_ERRORS - len(errors)])
+    
+    async def flush(batch):
+        nonlocal inserted, updated
+        batch_inserted, batch_updated, batch_errors = await write_rsvp_batch(batch)
+        inserted, updated = inserted + batch_inserted, updated + batch_updated
+        record_errors(batch_errors)
+    
+    batch = []
+    batch_emails = set()
+    try:
+        async for row_number, row, error in rows:
+            total += 1
+            if row is not None:
+                try:
+                    rsvp_dict = build_rsvp(wedding_id, clean_row(row))
+                except ValueError as e:
+                    error = str(e)
+            if error:
+                record_errors([{"row": row_number, "error": error}])
+                continue
+            
+            # Two upserts for one guest in an unordered batch would race
+            if rsvp_dict["guest_email"] in batch_emails or len(batch) >= RSVP_IMPORT_BATCH_SIZE:
+                await flush(batch)
+                batch, batch_emails = [], set()
+            batch.append((row_number, rsvp_dict))
+            if rsvp_dict["guest_email"]:
+                batch_emails.add(rsvp_dict["guest_email"])
+    except ImportTooLarge as e:
+        if inserted or updated:
+            await rebuild_summaries(database, wedding_id)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail={"error": str(e), "imported": inserted, "updated": updated}
+        )
     
-    return {"success": True, "rsvps": response_data, "total_count": len(response_data)}
+    if batch:
+        await flush(batch)
+    if inserted or updated:
+        # Upserts don't report what they replaced, so recount this wedding
+        await rebuild_summaries(database, wedding_id)
+    
+    return {
+        "success": True,
+        "total_rows": total,
+        "imported": inserted,
+        "updated": updated,
+        "failed": failed,
+        "errors": errors
+    }
+
+@api_router.get("/rsvp/export")
+async def export_rsvps(session_id: str):
+    """Download the user's RSVPs as CSV, streamed from the cursor"""
+    wedding_id = await get_user_wedding_id(session_id)
+    
+    async def generate():
+        yield csv_chunk([], header=True)
+        cursor = database.rsvps.find(
+            {"wedding_id": wedding_id},
+            {"_id": 0}
+        ).sort(keyset_sort("submitted_at")).batch_size(RSVP_STREAM_BATCH_SIZE)
+        batch = []
+        async for rsvp in cursor:
+            batch.append(rsvp)
+            if len(batch) >= RSVP_STREAM_BATCH_SIZE:
+                yield csv_chunk(batch)
+                batch = []
+        if batch:
+            yield csv_chunk(batch)
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="rsvps.csv"'}
+    )
+
+@api_router.get("/rsvp/{wedding_id}")
+async def get_wedding_rsvps(
+    wedding_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    format: Optional[str] = None,
+    batch_size: int = RSVP_STREAM_BATCH_SIZE
+):
+    """Get RSVPs for a specific wedding (for admin/couple view), a page at a time"""
+    return await list_rsvps(wedding_id, limit, cursor, format, batch_size)
 
 @api_router.get("/rsvp/shareable/{shareable_id}")  
-async def get_rsvps_by_shareable_id(shareable_id: str):
+async def get_rsvps_by_shareable_id(
+    shareable_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    format: Optional[str] = None,
+    batch_size: int = RSVP_STREAM_BATCH_SIZE
+):
     """Get RSVPs using shareable ID (for dashboard admin view)"""
     users_coll, weddings_coll = await get_collections()
     
     # First find the wedding by shareable_id
-    wedding = await weddings_coll.find_one({"shareable_id": shareable_id})
+    wedding = await weddings_coll.find_one({"shareable_id": shareable_id}, {"_id": 0, "id": 1})
     
     if not wedding:
         raise HTTPException(
@@ -844,17 +1475,7 @@ async def get_rsvps_by_shareable_id(shareable_id: str):
             detail="Wedding not found"
         )
     
-    # Get RSVPs for this wedding
-    rsvps_collection = database.rsvps
-    rsvps = await rsvps_collection.find({"wedding_id": wedding["id"]}).to_list(length=None)
-    
-    # Remove _id from response
-    response_data = []
-    for rsvp in rsvps:
-        clean_rsvp = {k: v for k, v in rsvp.items() if k != "_id"}
-        response_data.append(clean_rsvp)
-    
-    return {"success": True, "rsvps": response_data, "total_count": len(response_data)}
+    return await list_rsvps(wedding["id"], limit, cursor, format, batch_size)
 
 # Guestbook Models
 class GuestbookMessage(BaseModel):
@@ -867,9 +1488,102 @@ class GuestbookMessage(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 # Guestbook Endpoints
+# Messages live in their own collection, indexed on (wedding_id, created_at).
+# Weddings created before that kept them embedded in guestbook_messages; those
+# are moved over by a background pass at startup and lazily on first read.
+# Weddings already checked are remembered in a bounded cache (a miss only
+# costs one indexed find_one).
+guestbook_migrated = TTLCache(maxsize=10000, ttl=3600)
+guestbook_migration_done = False
+guestbook_migration_task = None
+
+def new_guestbook_message(wedding_id: str, message_data: dict, is_public: bool) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "wedding_id": wedding_id,
+        "name": message_data.get('name', ''),
+        "relationship": message_data.get('relationship', ''),
+        "message": message_data.get('message', ''),
+        "is_public": is_public,
+        # ISO strings, like the embedded messages, so both sort together
+        "created_at": datetime.utcnow().isoformat()
+    }
+
+async def migrate_embedded_guestbook(wedding: dict) -> int:
+    """Copy a wedding's embedded guestbook_messages into the guestbook collection"""
+    wedding_id = wedding["id"]
+    embedded = wedding.get("guestbook_messages") or []
+    for message in embedded:
+        doc = {**message, "wedding_id": wedding_id}
+        doc.setdefault("is_public", True)
+        # Messages without an id get a stable one so a retried migration can't duplicate them
+        doc.setdefault("id", str(uuid.uuid5(uuid.NAMESPACE_URL, f"{wedding_id}/{json.dumps(message, sort_keys=True, default=str)}")))
+        await database.guestbook.update_one({"id": doc["id"]}, {"$setOnInsert": doc}, upsert=True)
+    
+    # Only drop the array once every message is copied and if nothing was pushed
+    # meanwhile; otherwise the next pass retries. Bumping updated_at and version
+    # changes the ETag, so clients drop bodies that still embed the messages.
+    updated_wedding = await database.weddings.find_one_and_update(
+        {"id": wedding_id, "guestbook_messages": wedding.get("guestbook_messages")},
+        {
+            "$unset": {"guestbook_messages": ""},
+            "$set": {"updated_at": datetime.utcnow().isoformat()},
+            "$inc": {"version": 1}
+        },
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if updated_wedding:
+        await weddings_backup.set(wedding_id, updated_wedding)
+        invalidate_public_wedding(wedding_id, wedding.get("user_id"))
+        guestbook_migrated.set(wedding_id, True)
+    return len(embedded)
+
+async def ensure_guestbook_migrated(wedding_id: str):
+    """Lazily migrate one wedding's embedded messages before reading the collection"""
+    if guestbook_migration_done or guestbook_migrated.get(wedding_id):
+        return
+    wedding = await database.weddings.find_one(
+        {"id": wedding_id, "guestbook_messages": {"$exists": True}},
+        {"_id": 0, "id": 1, "user_id": 1, "guestbook_messages": 1}
+    )
+    if wedding:
+        await migrate_embedded_guestbook(wedding)
+    else:
+        guestbook_migrated.set(wedding_id, True)
+
+async def migrate_guestbook_messages():
+    """Background pass moving every embedded guestbook into the collection"""
+    global guestbook_migration_done
+    try:
+        migrated = 0
+        cursor = database.weddings.find(
+            {"guestbook_messages": {"$exists": True}},
+            {"_id": 0, "id": 1, "user_id": 1, "guestbook_messages": 1}
+        )
+        async for wedding in cursor:
+            migrated += await migrate_embedded_guestbook(wedding)
+        remaining = await database.weddings.count_documents({"guestbook_messages": {"$exists": True}})
+        guestbook_migration_done = remaining == 0
+        if migrated:
+            logger.info(f"✅ Migrated {migrated} embedded guestbook messages")
+    except Exception as e:
+        logger.error(f"❌ Guestbook migration failed: {e}")
+
+async def list_guestbook_messages(wedding_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> dict:
+    """One newest-first page of a wedding's messages (pass next_cursor for the next)"""
+    await ensure_guestbook_migrated(wedding_id)
+    page = await fetch_page(database.guestbook, {"wedding_id": wedding_id}, "created_at", limit, cursor)
+    return {
+        "success": True,
+        "messages": page["items"],
+        "total_count": page["total_count"],
+        "next_cursor": page["next_cursor"]
+    }
+
 @api_router.post("/guestbook")
 async def create_guestbook_message(message_data: dict):
-    """Create a new guestbook message - stores in owner's wedding document"""
+    """Create a new guestbook message for a wedding"""
     users_coll, weddings_coll = await get_collections()
     
     wedding_id = message_data.get('wedding_id')
@@ -879,40 +1593,16 @@ async def create_guestbook_message(message_data: dict):
             detail="Valid wedding_id required to post guestbook message"
         )
     
-    # Find the wedding document
-    wedding = await weddings_coll.find_one({"id": wedding_id})
+    # Make sure the wedding exists
+    wedding = await weddings_coll.find_one({"id": wedding_id}, {"_id": 0, "id": 1})
     if not wedding:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Wedding not found"
         )
     
-    # Create guestbook message
-    guestbook_message = {
-        "id": str(uuid.uuid4()),
-        "name": message_data.get('name', ''),
-        "relationship": message_data.get('relationship', ''),
-        "message": message_data.get('message', ''),
-        "created_at": datetime.utcnow().isoformat()
-    }
-    
-    # Add message to wedding's guestbook_messages array
-    await weddings_coll.update_one(
-        {"id": wedding_id},
-        {
-            "$push": {"guestbook_messages": guestbook_message},
-            "$set": {"updated_at": datetime.utcnow().isoformat()}
-        }
-    )
-    
-    # Also update JSON backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    if wedding_id in weddings:
-        if 'guestbook_messages' not in weddings[wedding_id]:
-            weddings[wedding_id]['guestbook_messages'] = []
-        weddings[wedding_id]['guestbook_messages'].append(guestbook_message)
-        weddings[wedding_id]['updated_at'] = datetime.utcnow().isoformat()
-        save_json_file(WEDDINGS_FILE, weddings)
+    guestbook_message = new_guestbook_message(wedding_id, message_data, is_public=True)
+    await database.guestbook.insert_one(dict(guestbook_message))
     
     return {"success": True, "message": "Guestbook message added successfully", "message_id": guestbook_message["id"]}
 
@@ -930,65 +1620,27 @@ async def create_private_guestbook_message(message_data: dict):
     users_coll, weddings_coll = await get_collections()
     
     # Find user's wedding
-    user_wedding = await weddings_coll.find_one({"user_id": current_user.id})
+    user_wedding = await weddings_coll.find_one({"user_id": current_user.id}, {"_id": 0, "id": 1})
     if not user_wedding:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User wedding not found"
         )
     
-    # Create guestbook message
-    guestbook_message = {
-        "id": str(uuid.uuid4()),
-        "name": message_data.get('name', ''),
-        "relationship": message_data.get('relationship', ''),
-        "message": message_data.get('message', ''),
-        "created_at": datetime.utcnow().isoformat()
-    }
-    
-    # Add message to wedding's guestbook_messages array
-    await weddings_coll.update_one(
-        {"id": user_wedding["id"]},
-        {
-            "$push": {"guestbook_messages": guestbook_message},
-            "$set": {"updated_at": datetime.utcnow().isoformat()}
-        }
-    )
-    
-    # Also update JSON backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    wedding_id = user_wedding["id"]
-    if wedding_id in weddings:
-        if 'guestbook_messages' not in weddings[wedding_id]:
-            weddings[wedding_id]['guestbook_messages'] = []
-        weddings[wedding_id]['guestbook_messages'].append(guestbook_message)
-        weddings[wedding_id]['updated_at'] = datetime.utcnow().isoformat()
-        save_json_file(WEDDINGS_FILE, weddings)
+    guestbook_message = new_guestbook_message(user_wedding["id"], message_data, is_public=False)
+    await database.guestbook.insert_one(dict(guestbook_message))
     
     return {"success": True, "message": "Private guestbook message added successfully", "message_id": guestbook_message["id"]}
 
 @api_router.get("/guestbook/{wedding_id}")
-async def get_guestbook_messages(wedding_id: str):
-    """Get all guestbook messages for a specific wedding from wedding document"""
-    users_coll, weddings_coll = await get_collections()
-    
-    # Get wedding document
-    wedding = await weddings_coll.find_one({"id": wedding_id})
-    if not wedding:
-        return {"success": True, "messages": [], "total_count": 0}
-    
-    # Get guestbook messages from wedding document
-    messages = wedding.get('guestbook_messages', [])
-    
-    # Sort by created_at descending (newest first)
-    sorted_messages = sorted(messages, key=lambda x: x.get('created_at', ''), reverse=True)
-    
-    return {"success": True, "messages": sorted_messages, "total_count": len(sorted_messages)}
+async def get_guestbook_messages(wedding_id: str, limit: Optional[int] = None, cursor: Optional[str] = None):
+    """Get guestbook messages for a specific wedding, newest first, a page at a time"""
+    return await list_guestbook_messages(wedding_id, limit, cursor)
 
 @api_router.get("/guestbook/private/{wedding_id}")
-async def get_private_guestbook_messages(wedding_id: str):
+async def get_private_guestbook_messages(wedding_id: str, limit: Optional[int] = None, cursor: Optional[str] = None):
     """Get guestbook messages for authenticated user's wedding (alias for /guestbook/{wedding_id})"""
-    return await get_guestbook_messages(wedding_id)
+    return await get_guestbook_messages(wedding_id, limit, cursor)
 
 @api_router.get("/guestbook/public/messages")
 async def get_public_guestbook_messages():
@@ -1013,33 +1665,13 @@ async def get_public_guestbook_messages():
     
     return {"success": True, "messages": demo_messages, "total_count": len(demo_messages)}
 
-@api_router.get("/guestbook/private/{user_wedding_id}")
-async def get_private_guestbook_messages(user_wedding_id: str):
-    """Get private guestbook messages for a specific user's wedding (dashboard)"""
-    users_coll, weddings_coll = await get_collections()
-    
-    # Get private messages for this specific wedding
-    guestbook_collection = database.guestbook
-    messages = await guestbook_collection.find({
-        "wedding_id": user_wedding_id, 
-        "is_public": False
-    }).sort("created_at", -1).to_list(length=None)
-    
-    # Remove _id from response
-    response_data = []
-    for msg in messages:
-        clean_msg = {k: v for k, v in msg.items() if k != "_id"}
-        response_data.append(clean_msg)
-    
-    return {"success": True, "messages": response_data, "total_count": len(response_data)}
-
 @api_router.get("/guestbook/shareable/{shareable_id}")  
-async def get_guestbook_by_shareable_id(shareable_id: str):
+async def get_guestbook_by_shareable_id(shareable_id: str, limit: Optional[int] = None, cursor: Optional[str] = None):
     """Get guestbook messages using shareable ID"""
     users_coll, weddings_coll = await get_collections()
     
     # First find the wedding by shareable_id
-    wedding = await weddings_coll.find_one({"shareable_id": shareable_id})
+    wedding = await weddings_coll.find_one({"shareable_id": shareable_id}, {"_id": 0, "id": 1})
     
     if not wedding:
         raise HTTPException(
@@ -1047,17 +1679,7 @@ async def get_guestbook_by_shareable_id(shareable_id: str):
             detail="Wedding not found"
         )
     
-    # Get guestbook messages for this wedding
-    guestbook_collection = database.guestbook
-    messages = await guestbook_collection.find({"wedding_id": wedding["id"]}).sort("created_at", -1).to_list(length=None)
-    
-    # Remove _id from response
-    response_data = []
-    for msg in messages:
-        clean_msg = {k: v for k, v in msg.items() if k != "_id"}
-        response_data.append(clean_msg)
-    
-    return {"success": True, "messages": response_data, "total_count": len(response_data)}
+    return await list_guestbook_messages(wedding["id"], limit, cursor)
 
 # Wedding Party Management Endpoints
 @api_router.put("/wedding/party")
@@ -1073,14 +1695,6 @@ async def update_wedding_party(request_data: dict):
     current_user = await get_current_user_simple(session_id)
     users_coll, weddings_coll = await get_collections()
     
-    # Find existing wedding
-    existing_wedding = await weddings_coll.find_one({"user_id": current_user.id})
-    if not existing_wedding:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Wedding data not found"
-        )
-    
     # Prepare update data with only wedding party fields
     update_fields = {}
     if 'bridal_party' in request_data:
@@ -1092,23 +1706,14 @@ async def update_wedding_party(request_data: dict):
     
     update_fields["updated_at"] = datetime.utcnow().isoformat()
     
-    # Update in MongoDB
-    await weddings_coll.update_one(
-        {"user_id": current_user.id},
-        {"$set": update_fields}
-    )
-    
-    # Get updated wedding data
-    updated_wedding = await weddings_coll.find_one({"user_id": current_user.id})
+    # Update in MongoDB and get the updated wedding data in one round trip
+    updated_wedding = await update_user_wedding(current_user.id, update_fields)
     
     # Also update JSON backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    if updated_wedding["id"] in weddings:
-        weddings[updated_wedding["id"]].update(update_fields)
-        save_json_file(WEDDINGS_FILE, weddings)
-    
-    # Remove _id from response
     response_data = {k: v for k, v in updated_wedding.items() if k != "_id"}
+    await weddings_backup.set(updated_wedding["id"], response_data)
+    invalidate_public_wedding(updated_wedding["id"], current_user.id)
+    
     return {"success": True, "wedding_data": response_data}
 
 # FAQ Management Endpoints
@@ -1125,14 +1730,6 @@ async def update_wedding_faq(request_data: dict):
     current_user = await get_current_user_simple(session_id)
     users_coll, weddings_coll = await get_collections()
     
-    # Find existing wedding
-    existing_wedding = await weddings_coll.find_one({"user_id": current_user.id})
-    if not existing_wedding:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Wedding data not found"
-        )
-    
     # Prepare update data with FAQ fields
     update_fields = {}
     if 'faqs' in request_data:
@@ -1140,23 +1737,14 @@ async def update_wedding_faq(request_data: dict):
     
     update_fields["updated_at"] = datetime.utcnow().isoformat()
     
-    # Update in MongoDB
-    await weddings_coll.update_one(
-        {"user_id": current_user.id},
-        {"$set": update_fields}
-    )
-    
-    # Get updated wedding data
-    updated_wedding = await weddings_coll.find_one({"user_id": current_user.id})
+    # Update in MongoDB and get the updated wedding data in one round trip
+    updated_wedding = await update_user_wedding(current_user.id, update_fields)
     
     # Also update JSON backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    if updated_wedding["id"] in weddings:
-        weddings[updated_wedding["id"]].update(update_fields)
-        save_json_file(WEDDINGS_FILE, weddings)
-    
-    # Remove _id from response
     response_data = {k: v for k, v in updated_wedding.items() if k != "_id"}
+    await weddings_backup.set(updated_wedding["id"], response_data)
+    invalidate_public_wedding(updated_wedding["id"], current_user.id)
+    
     return {"success": True, "wedding_data": response_data}
 
 # Theme Management Endpoints
@@ -1173,14 +1761,6 @@ async def update_wedding_theme(request_data: dict):
     current_user = await get_current_user_simple(session_id)
     users_coll, weddings_coll = await get_collections()
     
-    # Find existing wedding
-    existing_wedding = await weddings_coll.find_one({"user_id": current_user.id})
-    if not existing_wedding:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Wedding data not found"
-        )
-    
     # Prepare update data with theme field
     update_fields = {}
     if 'theme' in request_data:
@@ -1196,23 +1776,14 @@ async def update_wedding_theme(request_data: dict):
     
     update_fields["updated_at"] = datetime.utcnow().isoformat()
     
-    # Update in MongoDB
-    await weddings_coll.update_one(
-        {"user_id": current_user.id},
-        {"$set": update_fields}
-    )
-    
-    # Get updated wedding data
-    updated_wedding = await weddings_coll.find_one({"user_id": current_user.id})
+    # Update in MongoDB and get the updated wedding data in one round trip
+    updated_wedding = await update_user_wedding(current_user.id, update_fields)
     
     # Also update JSON backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    if updated_wedding["id"] in weddings:
-        weddings[updated_wedding["id"]].update(update_fields)
-        save_json_file(WEDDINGS_FILE, weddings)
-    
-    # Remove _id from response
     response_data = {k: v for k, v in updated_wedding.items() if k != "_id"}
+    await weddings_backup.set(updated_wedding["id"], response_data)
+    invalidate_public_wedding(updated_wedding["id"], current_user.id)
+    
     return {"success": True, "wedding_data": response_data}
 
 # Registry/Payment Endpoints
@@ -1232,24 +1803,14 @@ async def update_honeymoon_fund(
     current_user = await get_current_user_simple(session_id)
     users_coll, weddings_coll = await get_collections()
     
-    # Find existing wedding
-    existing_wedding = await weddings_coll.find_one({"user_id": current_user.id})
-    if not existing_wedding:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Wedding data not found"
-        )
-    
     # Update honeymoon fund configuration
     update_data = {
         "honeymoon_fund": honeymoon_config.dict(),
         "updated_at": datetime.utcnow().isoformat()
     }
     
-    await weddings_coll.update_one(
-        {"user_id": current_user.id},
-        {"$set": update_data}
-    )
+    updated_wedding = await update_user_wedding(current_user.id, update_data, projection={"_id": 0, "id": 1})
+    invalidate_public_wedding(updated_wedding["id"], current_user.id)
     
     return {"success": True, "message": "Honeymoon fund configuration updated successfully"}
 
@@ -1289,7 +1850,7 @@ async def create_payment_intent(payment_request: PaymentRequest):
     try:
         # Verify wedding exists
         users_coll, weddings_coll = await get_collections()
-        wedding = await weddings_coll.find_one({"id": payment_request.wedding_id})
+        wedding = await weddings_coll.find_one({"id": payment_request.wedding_id}, {"_id": 0, "id": 1})
         if not wedding:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -1297,7 +1858,7 @@ async def create_payment_intent(payment_request: PaymentRequest):
             )
         
         # Create Stripe payment intent
-        intent = stripe.PaymentIntent.create(
+        intent = await stripe_gateway.create_payment_intent(
             amount=int(payment_request.amount * 100),  # Convert to cents/paisa
             currency=payment_request.currency,
             metadata={
@@ -1332,6 +1893,10 @@ async def create_payment_intent(payment_request: PaymentRequest):
             "contribution_id": contribution.id
         }
         
+    except HTTPException:
+        raise
+    except StripeGatewayBusy as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except stripe.error.StripeError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1346,23 +1911,36 @@ async def create_payment_intent(payment_request: PaymentRequest):
 @api_router.post("/payment/confirm")
 async def confirm_payment(payment_intent_id: str):
     """Confirm payment and update contribution status"""
+    # Usually the webhook has already completed it; answer without calling Stripe
+    contribution = await database.contributions.find_one(
+        {"stripe_payment_intent_id": payment_intent_id, "payment_status": "completed"},
+        {"_id": 0, "amount": 1, "amount_received": 1}
+    )
+    if contribution:
+        return {
+            "success": True,
+            "payment_status": "succeeded",
+            "amount_received": contribution.get("amount_received", contribution.get("amount"))
+        }
+    
     try:
         # Retrieve payment intent from Stripe
-        intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        intent = await stripe_gateway.retrieve_payment_intent(payment_intent_id)
         
-        # Update contribution status in database
+        # Update contribution status in database; only the call that actually
+        # completes the contribution adds it to the wedding's running total
         contributions_collection = database.contributions
-        update_result = await contributions_collection.update_one(
-            {"stripe_payment_intent_id": payment_intent_id},
-            {
-                "$set": {
-                    "payment_status": "completed" if intent.status == "succeeded" else "failed",
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
+        query = {"stripe_payment_intent_id": payment_intent_id}
+        if intent.status == "succeeded":
+            updated = await complete_contribution(database, query) is not None
+        else:
+            update_result = await contributions_collection.update_one(
+                {**query, "payment_status": {"$ne": "completed"}},
+                {"$set": {"payment_status": "failed", "updated_at": datetime.utcnow()}}
+            )
+            updated = update_result.matched_count > 0
         
-        if update_result.modified_count == 0:
+        if not updated and not await contributions_collection.find_one(query, {"_id": 0, "id": 1}):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Payment contribution not found"
@@ -1374,12 +1952,47 @@ async def confirm_payment(payment_intent_id: str):
             "amount_received": intent.amount_received / 100  # Convert back from cents
         }
         
+    except StripeGatewayBusy as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except stripe.error.StripeError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Stripe error: {str(e)}"
         )
 
+@api_router.post("/payment/webhook")
+async def stripe_webhook(request: Request, stripe_signature: Optional[str] = Header(None, alias="Stripe-Signature")):
+    """Receive signed Stripe events; payment_intent.* events are applied in the background"""
+    if not STRIPE_WEBHOOK_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Webhook secret not configured"
+        )
+    
+    payload = await request.body()
+    try:
+        stripe.Webhook.construct_event(payload, stripe_signature or "", STRIPE_WEBHOOK_SECRET)
+        # Verified; work on the plain JSON rather than the StripeObject
+        event = json.loads(payload)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payload")
+    except stripe.error.SignatureVerificationError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid signature")
+    
+    if not event["type"].startswith(STRIPE_EVENT_PREFIX):
+        return {"received": True, "handled": False}
+    
+    # Stored before acknowledging so an accepted event is never lost;
+    # redeliveries of the same event id stop here
+    record = event_record(event)
+    try:
+        await database.stripe_events.insert_one(dict(record))
+    except DuplicateKeyError:
+        return {"received": True, "duplicate": True}
+    
+    stripe_event_processor.enqueue(record)
+    return {"received": True}
+
 @api_router.post("/payment/upi-contribution")
 async def create_upi_contribution(request_data: dict):
     """Create UPI contribution record (non-Stripe payment)"""
@@ -1413,7 +2026,8 @@ async def create_upi_contribution(request_data: dict):
         contribution_dict["payment_method"] = "upi"
         contribution_dict["upi_reference"] = request_data.get("upi_reference", "")
         
-        await contributions_collection.insert_one(contribution_dict)
+        await contributions_collection.insert_one(dict(contribution_dict))
+        await add_to_totals(database, contribution_dict)
         
         return {
             "success": True,
@@ -1440,7 +2054,7 @@ async def get_contributions(wedding_id: str, session_id: str = None):
     users_coll, weddings_coll = await get_collections()
     
     # Verify user owns this wedding
-    wedding = await weddings_coll.find_one({"id": wedding_id, "user_id": current_user.id})
+    wedding = await weddings_coll.find_one({"id": wedding_id, "user_id": current_user.id}, {"_id": 0, "id": 1})
     if not wedding:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -1449,19 +2063,18 @@ async def get_contributions(wedding_id: str, session_id: str = None):
     
     # Get all completed contributions
     contributions_collection = database.contributions
-    contributions = await contributions_collection.find({
-        "wedding_id": wedding_id,
-        "payment_status": "completed"
-    }).to_list(length=None)
+    contributions = await contributions_collection.find(
+        {"wedding_id": wedding_id, "payment_status": "completed"},
+        {"_id": 0}
+    ).sort("created_at", -1).to_list(length=None)
     
-    # Calculate total amount
-    total_amount = sum(contrib.get("amount", 0) for contrib in contributions)
+    totals = await get_totals(database, wedding_id)
     
     return {
         "contributions": contributions,
-        "total_amount": total_amount,
-        "currency": contributions[0].get("currency", "inr") if contributions else "inr",
-        "count": len(contributions)
+        "total_amount": totals["total_amount"],
+        "currency": totals["currency"],
+        "count": totals["count"]
     }
 
 @api_router.get("/payment/total/{wedding_id}")
@@ -1470,26 +2083,149 @@ async def get_contributions_total(wedding_id: str):
     users_coll, weddings_coll = await get_collections()
     
     # Verify wedding exists
-    wedding = await weddings_coll.find_one({"id": wedding_id})
+    wedding = await weddings_coll.find_one({"id": wedding_id}, {"_id": 0, "id": 1})
     if not wedding:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Wedding not found"
         )
     
-    # Get total from completed contributions
-    contributions_collection = database.contributions
-    contributions = await contributions_collection.find({
-        "wedding_id": wedding_id,
-        "payment_status": "completed"
-    }).to_list(length=None)
+    # Single-document read of the running total
+    totals = await get_totals(database, wedding_id)
+    
+    return {
+        "total_amount": totals["total_amount"],
+        "currency": totals["currency"],
+        "count": totals["count"]
+    }
+
+# Media Endpoints
+@api_router.post("/media")
+async def upload_media(request_data: dict):
+    """Store a base64 image data URL once and return its media reference"""
+    session_id = request_data.get('session_id')
+    if not session_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Session ID required"
+        )
+    await get_current_user_simple(session_id)
+    
+    data_url = request_data.get('data_url')
+    if not is_data_url(data_url):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="data_url must be a base64 image data URL"
+        )
+    try:
+        media_id, created = await media_store.store_data_url(data_url)
+    except MediaTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except MediaError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    total_amount = sum(contrib.get("amount", 0) for contrib in contributions)
+    media_derivatives.schedule(media_id)
+    return {
+        "success": True,
+        "id": media_id,
+        "url": media_store.url(media_id),
+        "variants": media_derivatives.variants(media_id),
+        "deduplicated": not created
+    }
+
+@api_router.post("/media/upload")
+async def upload_media_files(request: Request, session_id: str):
+    """Store the image files of a multipart/form-data body
     
+    The body is streamed to disk and hashed as it arrives instead of being
+    parsed into memory, so a batch of large photos costs a few chunks of RAM.
+    """
+    await get_current_user_simple(session_id)
+    
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MEDIA_UPLOAD_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Upload exceeds {MEDIA_UPLOAD_MAX_BYTES} bytes"
+        )
+    try:
+        upload = MultipartImageUpload(
+            media_store,
+            request.headers.get("content-type", ""),
+            max_files=MEDIA_UPLOAD_MAX_FILES,
+            max_total_bytes=MEDIA_UPLOAD_MAX_BYTES
+        )
+        files = await upload.receive(request.stream())
+    except MediaTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except MediaError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if not files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No files in upload"
+        )
+    for media in files:
+        media_derivatives.schedule(media["id"])
+        media["variants"] = media_derivatives.variants(media["id"])
+    logger.info(f"📷 Stored {len(files)} uploaded images ({upload.received} bytes)")
+    return {"success": True, "files": files}
+
+@api_router.get("/media/{media_id}")
+async def get_media(media_id: str, if_none_match: Optional[str] = Header(None)):
+    """Serve a stored image; the id is its content hash, so it never changes
+    
+    Derivatives (<hash>-thumb.webp, ...) are rendered on first request if the
+    upload-time job hasn't made them yet; images that can't be resized
+    redirect to the original.
+    """
+    path = media_store.path(media_id)
+    if path is not None and not path.exists():
+        source_id = media_derivatives.source_of(media_id)
+        if source_id is not None and not await media_derivatives.ensure(source_id):
+            return RedirectResponse(media_store.url(source_id), status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    if path is None or not path.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Media not found"
+        )
+    etag = f'"{media_id}"'
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return FileResponse(
+        path,
+        media_type=media_store.media_type(media_id),
+        headers={"Cache-Control": MEDIA_CACHE_CONTROL, "ETag": etag}
+    )
+
+# Operational metrics, only served when METRICS_TOKEN is set and sent as X-Metrics-Token
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@api_router.get("/metrics")
+async def get_metrics(x_metrics_token: Optional[str] = Header(None, alias="X-Metrics-Token")):
+    """Internal counters for monitoring"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_metrics_token or not hmac.compare_digest(x_metrics_token, METRICS_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token"
+        )
     return {
-        "total_amount": total_amount,
-        "currency": contributions[0].get("currency", "inr") if contributions else "inr",
-        "count": len(contributions)
+        "sessions": active_sessions.stats(),
+        "public_wedding_cache": public_wedding_cache.stats(),
+        "indexes": index_report,
+        "persistence": persistence_executor.stats(),
+        "stripe": stripe_gateway.stats(),
+        "media": media_store.stats(),
+        "media_derivatives": media_derivatives.stats(),
+        "stripe_events": stripe_event_processor.stats(),
+        "reconciliation": last_reconcile_report,
+        "backups": {
+            "users": users_backup.stats(),
+            "weddings": weddings_backup.stats()
+        }
     }
 
 # Test endpoint to verify connectivity
@@ -1509,7 +2245,7 @@ app.add_middleware(
     CORSMiddleware,
     allow_origin_regex=r"https?://(.*\.emergentagent\.com|localhost|127\.0\.0\.1)(:[0-9]+)?",
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
     expose_headers=["*"],
 )
@@ -1554,12 +2290,33 @@ logger = logging.getLogger(__name__)
 # Startup and shutdown events for MongoDB
 @app.on_event("startup")
 async def startup_event():
+    global session_sweep_task, guestbook_migration_task, reconcile_task
     await connect_to_mongo()
+    session_sweep_task = asyncio.create_task(sweep_sessions_periodically())
+    guestbook_migration_task = asyncio.create_task(migrate_guestbook_messages())
+    await persistence_executor.start()
+    stripe_gateway.configure()
+    await stripe_event_processor.start()
+    if RECONCILE_INTERVAL_SECONDS > 0:
+        reconcile_task = asyncio.create_task(reconcile_payments_periodically())
+    await users_backup.start()
+    await weddings_backup.start()
     logger.info("✅ Wedding Card API started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if session_sweep_task is not None:
+        session_sweep_task.cancel()
+    if guestbook_migration_task is not None:
+        guestbook_migration_task.cancel()
+    await stripe_event_processor.stop()
+    if reconcile_task is not None:
+        reconcile_task.cancel()
+    # Flush queued backup writes before the worker exits
+    await persistence_executor.close()
     await close_mongo_connection()
+    stripe_gateway.close()
+    media_derivatives.close()
     active_sessions.clear()
     # Note: Sessions are persisted in MongoDB and will be restored on restart
     logger.info("👋 Wedding Card API shutdown complete")
@@ -0,0 +1,136 @@
+"""
+In-process caching utilities
+"""
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from typing import Hashable, Iterable
+
+
+class TTLCache:
+    """Bounded LRU cache with TTL expiry (extended on hits if sliding) and tag invalidation"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, sliding: bool = False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sliding = sliding
+        # key -> (expires_at, value, tags, seq), in LRU order
+        self._entries = OrderedDict()
+        # (expires_at, seq, key) min-heap for sweep(); an item is stale once its
+        # entry is gone or replaced (seq differs) and may lag a sliding expiry
+        self._expiries = []
+        self._seq = itertools.count()
+        # tag -> set of keys
+        self._tags = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value, tags, seq = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            self._remove(key)
+            self.misses += 1
+            self.expirations += 1
+            return default
+        if self.sliding:
+            self._entries[key] = (now + self.ttl, value, tags, seq)
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value, tags: Iterable[Hashable] = ()):
+        if key in self._entries:
+            self._remove(key)
+        tags = tuple(tag for tag in tags if tag is not None)
+        expires_at = time.monotonic() + self.ttl
+        seq = next(self._seq)
+        self._entries[key] = (expires_at, value, tags, seq)
+        heapq.heappush(self._expiries, (expires_at, seq, key))
+        if len(self._expiries) > 2 * len(self._entries) + 64:
+            self._rebuild_expiries()
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        self._remove(key)
+        return entry[1]
+
+    def invalidate(self, *tags: Hashable):
+        """Drop every entry carrying any of the given tags"""
+        for tag in tags:
+            for key in self._tags.pop(tag, set()):
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def sweep(self) -> int:
+        """Remove expired entries and return how many were dropped"""
+        # LRU order is not expiry order (a hit reorders an entry without
+        # extending it unless sliding), so walk the expiry heap; it only
+        # under-estimates, so stopping at the first future item is safe
+        now = time.monotonic()
+        removed = 0
+        while self._expiries and self._expiries[0][0] <= now:
+            _, seq, key = heapq.heappop(self._expiries)
+            entry = self._entries.get(key)
+            if entry is None or entry[3] != seq:
+                continue
+            if entry[0] > now:
+                # Extended by a hit since it was pushed
+                heapq.heappush(self._expiries, (entry[0], seq, key))
+                continue
+            self._remove(key)
+            removed += 1
+        self.expirations += removed
+        return removed
+
+    def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+        self._expiries.clear()
+
+    def _rebuild_expiries(self):
+        """Drop stale heap items left behind by removed or replaced entries"""
+        self._expiries = [(entry[0], entry[3], key) for key, entry in self._entries.items()]
+        heapq.heapify(self._expiries)
+
+    def _remove(self, key: Hashable):
+        tags = self._entries.pop(key)[2]
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,93 @@
+"""
+Per-wedding running totals of completed contributions
+"""
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+COMPLETED = "completed"
+
+
+def _totals_pipeline(match: dict) -> list:
+    return [
+        {"$match": {**match, "payment_status": COMPLETED}},
+        {"$sort": {"created_at": 1}},
+        {"$group": {
+            "_id": "$wedding_id",
+            "total_amount": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+            "currency": {"$first": "$currency"},
+        }},
+    ]
+
+
+def _empty_totals(wedding_id: str) -> dict:
+    return {"wedding_id": wedding_id, "total_amount": 0, "count": 0, "currency": "inr"}
+
+
+async def get_totals(database, wedding_id: str) -> dict:
+    totals = await database.contribution_totals.find_one({"wedding_id": wedding_id}, {"_id": 0})
+    if totals is None:
+        # Contributions completed before totals existed only show up after rebuild_totals()
+        return _empty_totals(wedding_id)
+    totals["total_amount"] = round(totals.get("total_amount", 0), 2)
+    return totals
+
+
+async def add_to_totals(database, contribution: dict):
+    """Count one newly completed contribution in its wedding's running total"""
+    # A single upsert, so concurrent first contributions both land in one document
+    await database.contribution_totals.update_one(
+        {"wedding_id": contribution["wedding_id"]},
+        {
+            "$inc": {"total_amount": contribution.get("amount", 0), "count": 1},
+            "$set": {"updated_at": datetime.utcnow().isoformat()},
+            "$setOnInsert": {"currency": contribution.get("currency") or "inr"}
+        },
+        upsert=True
+    )
+
+
+async def complete_contribution(database, query: dict, fields: Optional[dict] = None) -> Optional[dict]:
+    """Atomically mark a not-yet-completed contribution completed and count it
+
+    Returns the completed contribution, or None if nothing matched (already
+    completed or unknown), in which case the totals are left untouched.
+    """
+    contribution = await database.contributions.find_one_and_update(
+        {**query, "payment_status": {"$ne": COMPLETED}},
+        {"$set": {**(fields or {}), "payment_status": COMPLETED, "updated_at": datetime.utcnow()}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if contribution is not None:
+        await add_to_totals(database, contribution)
+    return contribution
+
+
+async def rebuild_totals(database, wedding_id: Optional[str] = None) -> int:
+    """Recompute totals documents from the contributions collection"""
+    match = {"wedding_id": wedding_id} if wedding_id else {}
+    now = datetime.utcnow().isoformat()
+    seen = set()
+    async for row in database.contributions.aggregate(_totals_pipeline(match), allowDiskUse=True):
+        seen.add(row["_id"])
+        await database.contribution_totals.replace_one(
+            {"wedding_id": row["_id"]},
+            {
+                "wedding_id": row["_id"],
+                "total_amount": row["total_amount"],
+                "count": row["count"],
+                "currency": row.get("currency") or "inr",
+                "updated_at": now,
+            },
+            upsert=True
+        )
+
+    # Weddings left without completed contributions
+    if wedding_id is None:
+        await database.contribution_totals.delete_many({"wedding_id": {"$nin": list(seen)}})
+    elif not seen:
+        await database.contribution_totals.delete_many({"wedding_id": wedding_id})
+    return len(seen)
@@ -0,0 +1,57 @@
+"""
+HTTP conditional request helpers (ETag / If-None-Match)
+"""
+import hashlib
+import json
+from typing import Optional
+
+from fastapi import Response, status
+
+# Bump when the shape of a cached payload changes so old validators stop matching
+PAYLOAD_VERSION = "2"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over the given version parts"""
+    digest = hashlib.sha256(
+        "\x1f".join(str(part) for part in (PAYLOAD_VERSION, *parts)).encode()
+    ).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def wedding_etag(kind: str, wedding: dict) -> Optional[str]:
+    """ETag derived from a wedding's id and updated_at (None if it has no updated_at)
+
+    Only these two fields are needed, so callers can validate against a
+    projection without loading the document body.
+    """
+    updated_at = wedding.get("updated_at")
+    if not updated_at:
+        return None
+    return make_etag(kind, wedding.get("id"), updated_at)
+
+
+def content_etag(kind: str, payload: dict) -> str:
+    """ETag over the payload itself, for records without updated_at"""
+    body = json.dumps(payload, sort_keys=True, default=str)
+    return make_etag(kind, hashlib.sha256(body.encode()).hexdigest())
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Weak comparison as required for If-None-Match (RFC 9110 13.1.2)"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
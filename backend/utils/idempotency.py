@@ -0,0 +1,43 @@
+"""
+Idempotency keys for retried POSTs
+"""
+from datetime import datetime
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError
+
+# How long a key is remembered (enforced by the idempotency_keys TTL index)
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+MAX_KEY_LENGTH = 255
+
+
+def idempotency_key(header_value: Optional[str], body: dict) -> Optional[str]:
+    """Key from the Idempotency-Key header, falling back to an idempotency_key body field"""
+    key = header_value or body.get("idempotency_key")
+    if not key or not isinstance(key, str):
+        return None
+    return key.strip()[:MAX_KEY_LENGTH] or None
+
+
+async def get_stored_response(database, scope: str, key: Optional[str]) -> Optional[dict]:
+    if not key:
+        return None
+    stored = await database.idempotency_keys.find_one({"key": f"{scope}:{key}"}, {"_id": 0, "response": 1})
+    return stored["response"] if stored else None
+
+
+async def store_response(database, scope: str, key: Optional[str], response: dict) -> dict:
+    """Remember response for key and return whichever response was stored first"""
+    if not key:
+        return response
+    try:
+        await database.idempotency_keys.insert_one({
+            "key": f"{scope}:{key}",
+            "response": response,
+            # A BSON date, as the TTL index requires
+            "created_at": datetime.utcnow(),
+        })
+    except DuplicateKeyError:
+        # A concurrent retry finished first; answer consistently with it
+        return await get_stored_response(database, scope, key) or response
+    return response
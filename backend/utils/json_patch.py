@@ -0,0 +1,123 @@
+"""
+JSON-patch style add/remove/replace/move operations for partial wedding updates
+"""
+import copy
+from typing import List
+
+SUPPORTED_OPS = ("add", "remove", "replace", "move")
+
+
+class PatchError(ValueError):
+    """Raised when an operation is malformed or does not apply to the document"""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise PatchError(f"Invalid path: {pointer!r}")
+    tokens = [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+    if "" in tokens:
+        raise PatchError(f"Empty path segment in {pointer!r}")
+    # The top-level field becomes a MongoDB $set key
+    if "." in tokens[0] or tokens[0].startswith("$"):
+        raise PatchError(f"Invalid field name in {pointer!r}")
+    return tokens
+
+
+def top_level_field(pointer: str) -> str:
+    return parse_pointer(pointer)[0]
+
+
+def _resolve_parent(doc, tokens: List[str], pointer: str):
+    target = doc
+    for token in tokens[:-1]:
+        if isinstance(target, list):
+            target = target[_list_index(target, token, pointer)]
+        elif isinstance(target, dict) and token in target:
+            target = target[token]
+        else:
+            raise PatchError(f"Path not found: {pointer}")
+    return target, tokens[-1]
+
+
+def _list_index(target: list, token: str, pointer: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(target)
+    if not token.isdigit():
+        raise PatchError(f"Invalid array index in {pointer}")
+    index = int(token)
+    upper = len(target) if allow_end else len(target) - 1
+    if index > upper:
+        raise PatchError(f"Array index out of range in {pointer}")
+    return index
+
+
+def _get(doc, pointer: str):
+    tokens = parse_pointer(pointer)
+    parent, last = _resolve_parent(doc, tokens, pointer)
+    if isinstance(parent, list):
+        return parent[_list_index(parent, last, pointer)]
+    if isinstance(parent, dict) and last in parent:
+        return parent[last]
+    raise PatchError(f"Path not found: {pointer}")
+
+
+def _add(doc, pointer: str, value):
+    tokens = parse_pointer(pointer)
+    parent, last = _resolve_parent(doc, tokens, pointer)
+    if isinstance(parent, list):
+        parent.insert(_list_index(parent, last, pointer, allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[last] = value
+    else:
+        raise PatchError(f"Cannot add at {pointer}")
+
+
+def _remove(doc, pointer: str):
+    tokens = parse_pointer(pointer)
+    parent, last = _resolve_parent(doc, tokens, pointer)
+    if isinstance(parent, list):
+        return parent.pop(_list_index(parent, last, pointer))
+    if isinstance(parent, dict) and last in parent:
+        return parent.pop(last)
+    raise PatchError(f"Path not found: {pointer}")
+
+
+def apply_operations(doc: dict, operations: list) -> dict:
+    """Apply operations to a copy of doc and return it"""
+    doc = copy.deepcopy(doc)
+    for operation in operations:
+        op = operation.get("op")
+        path = operation.get("path")
+        if op not in SUPPORTED_OPS:
+            raise PatchError(f"Unsupported op: {op!r}")
+        if op in ("add", "replace") and "value" not in operation:
+            raise PatchError(f"'{op}' at {path} requires a value")
+
+        if op == "add":
+            _add(doc, path, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _remove(doc, path)
+        elif op == "replace":
+            _get(doc, path)
+            _remove(doc, path)
+            _add(doc, path, copy.deepcopy(operation["value"]))
+        elif op == "move":
+            source = operation.get("from")
+            if path == source:
+                continue
+            if isinstance(source, str) and path.startswith(source + "/"):
+                raise PatchError(f"Cannot move {source} into itself")
+            _add(doc, path, _remove(doc, source))
+    return doc
+
+
+def touched_fields(operations: list) -> set:
+    """Top-level document fields read or written by the operations"""
+    fields = set()
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise PatchError("Each operation must be an object")
+        fields.add(top_level_field(operation.get("path")))
+        if operation.get("op") == "move":
+            fields.add(top_level_field(operation.get("from")))
+    return fields
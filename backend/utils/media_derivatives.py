@@ -0,0 +1,194 @@
+"""
+Resized WebP derivatives of stored images (needs Pillow; skipped without it)
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from utils.media_store import MediaStore
+from utils.metrics import LatencyHistogram
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow not installed; derivatives are disabled
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+# Derivative name -> longest edge in pixels (never upscaled)
+DERIVATIVES = {"thumb": 320, "medium": 1024, "large": 2048}
+WEBP_QUALITY = 80
+# Animated GIFs would lose their animation
+SKIPPED_EXTENSIONS = {"gif"}
+
+_DERIVATIVE_ID = re.compile(r"^([0-9a-f]{64})-(%s)\.webp$" % "|".join(DERIVATIVES))
+
+
+def derivative_id(media_id: str, name: str) -> str:
+    return f"{media_id.split('.', 1)[0]}-{name}.webp"
+
+
+def parse_derivative_id(media_id: str) -> Optional[tuple]:
+    """(digest, name) of a derivative id, None for anything else"""
+    match = _DERIVATIVE_ID.match(media_id)
+    return (match.group(1), match.group(2)) if match else None
+
+
+def render_derivatives(source_path: str, targets: Dict[str, str]) -> Dict[str, int]:
+    """Write each {name: path} derivative of source_path; returns their sizes in bytes
+
+    Runs in a worker process, so it only takes and returns plain values.
+    """
+    written = {}
+    with Image.open(source_path) as image:
+        # JPEG can decode straight at a reduced scale, much cheaper than full size
+        largest = max(DERIVATIVES[name] for name in targets)
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        for name, path in sorted(targets.items(), key=lambda item: -DERIVATIVES[item[0]]):
+            edge = DERIVATIVES[name]
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                resized.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+            written[name] = os.path.getsize(path)
+            # Resize the next (smaller) one from this, not from the original
+            image = resized
+    return written
+
+
+class DerivativePipeline:
+    """Generates and locates the derivatives of a MediaStore's images"""
+
+    def __init__(self, store: MediaStore, max_workers: int = 2):
+        self.store = store
+        self.max_workers = max_workers
+        self.enabled = Image is not None and max_workers > 0
+        self._pool = None
+        self._inflight = {}
+        self._tasks = set()
+        self.generated = 0
+        self.bytes_generated = 0
+        self.failed = 0
+        self.render_latency = LatencyHistogram()
+
+    def supports(self, media_id: str) -> bool:
+        return self.enabled and media_id.rsplit(".", 1)[-1] not in SKIPPED_EXTENSIONS
+
+    def variants(self, media_id: str) -> Dict[str, str]:
+        """{name: url} of the derivatives of an original (empty if it has none)"""
+        if parse_derivative_id(media_id) or not self.supports(media_id):
+            return {}
+        return {name: self.store.url(derivative_id(media_id, name)) for name in DERIVATIVES}
+
+    def variant_map(self, value, found: Optional[dict] = None) -> dict:
+        """{original url: {name: url}} for every media URL inside value"""
+        found = {} if found is None else found
+        if isinstance(value, str):
+            media_id = self.store.media_id_from_url(value)
+            variants = self.variants(media_id) if media_id else None
+            if variants:
+                found[value] = variants
+        elif isinstance(value, dict):
+            for item in value.values():
+                self.variant_map(item, found)
+        elif isinstance(value, list):
+            for item in value:
+                self.variant_map(item, found)
+        return found
+
+    def source_of(self, media_id: str) -> Optional[str]:
+        """Original media id behind a derivative id (None if unknown)"""
+        parsed = parse_derivative_id(media_id)
+        return self.store.find(parsed[0]) if parsed else None
+
+    # Generation
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def ensure(self, media_id: str) -> bool:
+        """Generate any missing derivatives of an original; True if they all exist"""
+        if not self.supports(media_id):
+            return False
+        source = self.store.path(media_id)
+        paths = {name: self.store.path(derivative_id(media_id, name)) for name in DERIVATIVES}
+        targets = {name: str(path) for name, path in paths.items() if not path.exists()}
+        if not targets:
+            return True
+        if source is None or not source.exists():
+            return False
+
+        # Concurrent requests for the same image share one render
+        future = self._inflight.get(media_id)
+        if future is None:
+            future = asyncio.ensure_future(self._render(media_id, str(source), targets))
+            self._inflight[media_id] = future
+            future.add_done_callback(lambda _: self._inflight.pop(media_id, None))
+        return await asyncio.shield(future)
+
+    async def _render(self, media_id: str, source: str, targets: dict) -> bool:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            written = await loop.run_in_executor(self._get_pool(), render_derivatives, source, targets)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool next time
+            self._pool = None
+            self.failed += 1
+            self.render_latency.observe(time.perf_counter() - started, error=True)
+            logger.error(f"❌ Derivative worker crashed on {media_id}")
+            return False
+        except Exception as e:
+            self.failed += 1
+            self.render_latency.observe(time.perf_counter() - started, error=True)
+            logger.warning(f"⚠️ Could not create derivatives of {media_id}: {e}")
+            return False
+        self.render_latency.observe(time.perf_counter() - started)
+        self.generated += len(written)
+        self.bytes_generated += sum(written.values())
+        return True
+
+    def schedule(self, media_id: str):
+        """Generate derivatives in the background, e.g. right after an upload"""
+        if not self.supports(media_id):
+            return
+        task = asyncio.create_task(self.ensure(media_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "generated": self.generated,
+            "bytes_generated": self.bytes_generated,
+            "failed": self.failed,
+            "in_flight": len(self._inflight),
+            "render": self.render_latency.stats(),
+        }
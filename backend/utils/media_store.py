@@ -0,0 +1,211 @@
+"""
+Content-addressed image store
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Extension by MIME type; SVG is deliberately absent (it can carry script)
+IMAGE_TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+MEDIA_TYPES = {ext: mime for mime, ext in IMAGE_TYPES.items()}
+
+# Originals are <sha256>.<ext>; resized derivatives sit next to them as <sha256>-<name>.webp
+_MEDIA_ID = re.compile(r"^([0-9a-f]{64})(?:-[a-z]+)?\.(jpg|png|gif|webp)$")
+_DATA_URL = re.compile(r"^data:(image/[\w.+-]+)(;[\w=-]+)*;base64,", re.IGNORECASE)
+
+
+class MediaError(ValueError):
+    """Raised for uploads that are not a supported image"""
+
+
+class MediaTooLarge(MediaError):
+    """Raised when an upload exceeds the size limit"""
+
+
+def sniff_image_type(data: bytes) -> Optional[str]:
+    """MIME type from the file signature, so the declared type can't be trusted blindly"""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def is_data_url(value) -> bool:
+    return isinstance(value, str) and value[:11].lower() == "data:image/" and _DATA_URL.match(value) is not None
+
+
+class MediaStore:
+    """Deduplicating on-disk image store keyed by content hash"""
+
+    def __init__(self, root: Path, url_prefix: str = "/api/media", max_bytes: int = 10 * 1024 * 1024):
+        self.root = Path(root)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.max_bytes = max_bytes
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_stored = 0
+
+    # Ids and paths
+
+    def path(self, media_id: str) -> Optional[Path]:
+        """Path of a stored media id (None if the id is malformed)"""
+        match = _MEDIA_ID.match(media_id)
+        if not match:
+            return None
+        return self.root / match.group(1)[:2] / media_id
+
+    def url(self, media_id: str) -> str:
+        return f"{self.url_prefix}/{media_id}"
+
+    def media_id_from_url(self, value) -> Optional[str]:
+        """Media id of one of our URLs (None for anything else)"""
+        if not isinstance(value, str) or not value.startswith(self.url_prefix + "/"):
+            return None
+        media_id = value[len(self.url_prefix) + 1:]
+        return media_id if _MEDIA_ID.match(media_id) else None
+
+    def find(self, digest: str) -> Optional[str]:
+        """Id of the stored original with this digest, whatever its type"""
+        for ext in MEDIA_TYPES:
+            media_id = f"{digest}.{ext}"
+            path = self.path(media_id)
+            if path is not None and path.exists():
+                return media_id
+        return None
+
+    @staticmethod
+    def media_type(media_id: str) -> str:
+        return MEDIA_TYPES[media_id.rsplit(".", 1)[-1]]
+
+    # Writes
+
+    def _store(self, digest: str, mime: str, write) -> Tuple[str, bool]:
+        media_id = f"{digest}.{IMAGE_TYPES[mime]}"
+        path = self.path(media_id)
+        if path.exists():
+            self.deduplicated += 1
+            return media_id, False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        write(tmp_path)
+        os.replace(tmp_path, path)
+        self.stored += 1
+        self.bytes_stored += path.stat().st_size
+        return media_id, True
+
+    def put_bytes(self, data: bytes) -> Tuple[str, bool]:
+        """Store image bytes; returns (media_id, created). Blocking: run off the loop"""
+        if len(data) > self.max_bytes:
+            raise MediaTooLarge(f"Image exceeds {self.max_bytes} bytes")
+        mime = sniff_image_type(data)
+        if mime is None:
+            raise MediaError("Unsupported image type (JPEG, PNG, GIF or WebP only)")
+
+        def write(tmp_path: Path):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+
+        return self._store(hashlib.sha256(data).hexdigest(), mime, write)
+
+    def put_data_url(self, data_url: str) -> Tuple[str, bool]:
+        if not is_data_url(data_url):
+            raise MediaError("Expected a base64 image data URL")
+        encoded = data_url.split(",", 1)[1]
+        # Base64 is 4/3 the size of the data; reject before decoding
+        if len(encoded) * 3 // 4 > self.max_bytes + 2:
+            raise MediaTooLarge(f"Image exceeds {self.max_bytes} bytes")
+        try:
+            data = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError):
+            raise MediaError("Invalid base64 image data")
+        return self.put_bytes(data)
+
+    def begin_upload(self) -> "PendingUpload":
+        """Start a streamed upload that is hashed and written chunk by chunk"""
+        return PendingUpload(self)
+
+    async def store_data_url(self, data_url: str) -> Tuple[str, bool]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.put_data_url, data_url)
+
+    async def externalize(self, value, stored: Optional[list] = None):
+        """Return value with every inline image data URL replaced by a media URL
+
+        The ids of the images moved out are appended to ``stored`` if given.
+        """
+        if is_data_url(value):
+            media_id, _ = await self.store_data_url(value)
+            if stored is not None:
+                stored.append(media_id)
+            return self.url(media_id)
+        if isinstance(value, dict):
+            return {key: await self.externalize(item, stored) for key, item in value.items()}
+        if isinstance(value, list):
+            return [await self.externalize(item, stored) for item in value]
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "bytes_stored": self.bytes_stored,
+        }
+
+
+class PendingUpload:
+    """An upload being streamed to a temporary file (methods block: run off the loop)"""
+
+    def __init__(self, store: MediaStore):
+        self.store = store
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._head = b""
+        store.root.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = store.root / f"upload-{uuid.uuid4().hex}.tmp"
+        self._file = open(self._tmp_path, "wb")
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.store.max_bytes:
+            raise MediaTooLarge(f"Image exceeds {self.store.max_bytes} bytes")
+        if len(self._head) < 16:
+            self._head += data[:16 - len(self._head)]
+        self._hash.update(data)
+        self._file.write(data)
+
+    def commit(self) -> Tuple[str, bool]:
+        """Move the finished upload to its content address; returns (media_id, created)"""
+        self._file.close()
+        mime = sniff_image_type(self._head)
+        if mime is None:
+            self.abort()
+            raise MediaError("Unsupported image type (JPEG, PNG, GIF or WebP only)")
+        media_id, created = self.store._store(
+            self._hash.hexdigest(), mime, lambda tmp_path: os.replace(self._tmp_path, tmp_path)
+        )
+        if not created:
+            self.abort()
+        return media_id, created
+
+    def abort(self):
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
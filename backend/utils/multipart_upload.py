@@ -0,0 +1,132 @@
+"""
+Streaming multipart/form-data image uploads into the media store
+"""
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from utils.media_store import MediaError, MediaStore, MediaTooLarge, PendingUpload
+
+MAX_FIELD_BYTES = 1024
+
+
+class MultipartImageUpload:
+    """Receives one multipart body and stores every file part in a MediaStore"""
+
+    def __init__(self, store: MediaStore, content_type: str, max_files: int = 20, max_total_bytes: Optional[int] = None):
+        mime, params = parse_options_header(content_type or "")
+        boundary = params.get(b"boundary")
+        if mime != b"multipart/form-data" or not boundary:
+            raise MediaError("Expected a multipart/form-data body")
+
+        self.store = store
+        self.max_files = max_files
+        self.max_total_bytes = max_total_bytes
+        self.received = 0
+        self.files: List[dict] = []
+
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+        self._upload: Optional[PendingUpload] = None
+        self._field_name = None
+        self._field_size = 0
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    # Parser callbacks (run on the worker thread)
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._upload = None
+        self._field_name = None
+        self._field_size = 0
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, disposition = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._filename = disposition.get(b"filename", b"").decode("utf-8", "replace")
+        if b"filename" in disposition:
+            if len(self.files) >= self.max_files:
+                raise MediaError(f"At most {self.max_files} files per upload")
+            self._upload = self.store.begin_upload()
+        else:
+            self._field_name = disposition.get(b"name", b"").decode("utf-8", "replace")
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._upload is not None:
+            self._upload.write(data[start:end])
+        elif self._field_name is not None:
+            # Plain form fields are not used; only their size is checked
+            self._field_size += end - start
+            if self._field_size > MAX_FIELD_BYTES:
+                raise MediaError(f"Form field {self._field_name!r} is too long")
+
+    def _on_part_end(self):
+        if self._upload is not None:
+            upload, self._upload = self._upload, None
+            media_id, created = upload.commit()
+            self.files.append({
+                "filename": self._filename,
+                "id": media_id,
+                "url": self.store.url(media_id),
+                "size": upload.size,
+                "deduplicated": not created,
+            })
+
+    # Feeding
+
+    def _write(self, chunk: bytes):
+        self._parser.write(chunk)
+
+    async def receive(self, chunks: AsyncIterator[bytes]) -> List[dict]:
+        """Consume the body stream; returns the stored files"""
+        loop = asyncio.get_running_loop()
+        try:
+            async for chunk in chunks:
+                self.received += len(chunk)
+                if self.max_total_bytes is not None and self.received > self.max_total_bytes:
+                    raise MediaTooLarge(f"Upload exceeds {self.max_total_bytes} bytes")
+                if chunk:
+                    await loop.run_in_executor(None, self._write, chunk)
+            await loop.run_in_executor(None, self._parser.finalize)
+        except MediaError:
+            self.abort()
+            raise
+        except ValueError as e:
+            # python-multipart's parse errors
+            self.abort()
+            raise MediaError(f"Malformed multipart body: {e}")
+        except BaseException:
+            self.abort()
+            raise
+        if self._upload is not None:
+            # The body ended in the middle of a file
+            self.abort()
+            raise MediaError("Incomplete multipart body")
+        return self.files
+
+    def abort(self):
+        if self._upload is not None:
+            self._upload.abort()
+            self._upload = None
@@ -0,0 +1,81 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+import base64
+import json
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(sort_value, record_id: str) -> str:
+    raw = json.dumps([sort_value, record_id], default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return sort_value, record_id
+
+
+def page_size(limit: Optional[int]) -> int:
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    if limit < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="limit must be at least 1"
+        )
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def keyset_filter(query: dict, cursor: Optional[str], sort_field: str) -> dict:
+    """Restrict query to the rows after cursor in (sort_field, id) descending order"""
+    if not cursor:
+        return query
+    sort_value, record_id = decode_cursor(cursor)
+    return {
+        **query,
+        "$or": [
+            {sort_field: {"$lt": sort_value}},
+            {sort_field: sort_value, "id": {"$lt": record_id}},
+        ],
+    }
+
+
+def keyset_sort(sort_field: str) -> list:
+    return [(sort_field, -1), ("id", -1)]
+
+
+async def fetch_page(collection, query: dict, sort_field: str, limit: Optional[int] = None,
+                     cursor: Optional[str] = None, projection: Optional[dict] = None) -> dict:
+    """Return one newest-first page of collection rows matching query
+
+    The result holds ``items``, ``next_cursor`` (None on the last page) and
+    ``total_count`` for the whole (unpaged) query.
+    """
+    size = page_size(limit)
+    projection = projection if projection is not None else {"_id": 0}
+    # One extra row tells us whether another page exists
+    rows = await collection.find(
+        keyset_filter(query, cursor, sort_field), projection
+    ).sort(keyset_sort(sort_field)).limit(size + 1).to_list(length=size + 1)
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last.get("id"))
+
+    total_count = await collection.count_documents(query)
+    return {"items": rows, "next_cursor": next_cursor, "total_count": total_count}
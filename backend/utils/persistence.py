@@ -0,0 +1,142 @@
+"""
+Persistence executor for the JSON backup files
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class PersistenceExecutor:
+    """Single writer thread with a bounded, per-key coalescing queue"""
+
+    def __init__(self, max_pending: int = 1024, flush_interval: float = 0.05):
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persistence")
+        # (journal, key) -> None, kept in insertion order so flushes preserve edit order
+        self._dirty = {}
+        self._task = None
+        self._wakeup = None
+        self._drained = None
+        self._flush_lock = None
+
+        self._stats = {
+            "submitted": 0,
+            "coalesced": 0,
+            "records_written": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "compaction_errors": 0,
+            "backpressure_waits": 0,
+            "max_queue_depth": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    def _ensure_primitives(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+            self._drained = asyncio.Condition()
+            self._flush_lock = asyncio.Lock()
+
+    async def run(self, fn, *args):
+        """Run a blocking file operation on the writer thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, fn, *args)
+
+    async def submit(self, journal, key: str):
+        """Queue the current state of journal[key] to be written"""
+        self._ensure_primitives()
+        self._stats["submitted"] += 1
+        item = (journal, key)
+        if item in self._dirty:
+            self._stats["coalesced"] += 1
+            return
+
+        if len(self._dirty) >= self.max_pending:
+            self._stats["backpressure_waits"] += 1
+            self._wakeup.set()
+            async with self._drained:
+                await self._drained.wait_for(lambda: len(self._dirty) < self.max_pending)
+
+        self._dirty[item] = None
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._dirty))
+        self._wakeup.set()
+
+    async def start(self):
+        """Start the background flush task"""
+        self._ensure_primitives()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Let a burst of edits accumulate so they share one write + fsync
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                self._stats["flush_errors"] += 1
+                logger.error(f"❌ Persistence flush failed: {e}")
+
+    async def flush(self):
+        """Write every queued record, one batch per journal"""
+        self._ensure_primitives()
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            started = time.perf_counter()
+            batch, self._dirty = self._dirty, {}
+            async with self._drained:
+                self._drained.notify_all()
+
+            by_journal = {}
+            for journal, key in batch:
+                by_journal.setdefault(journal, []).append(key)
+
+            pending = list(by_journal.items())
+            for index, (journal, keys) in enumerate(pending):
+                # Serialize on the loop so the writer thread never sees a dict mid-mutation
+                lines = journal.encode_records(keys)
+                try:
+                    await self.run(journal.write_lines, lines)
+                except Exception:
+                    # Requeue everything unwritten ahead of anything submitted meanwhile
+                    unwritten = {(j, k): None for j, ks in pending[index:] for k in ks}
+                    self._dirty = {**unwritten, **self._dirty}
+                    raise
+                self._stats["records_written"] += len(keys)
+                if journal.should_compact():
+                    try:
+                        await journal.compact()
+                    except Exception as e:
+                        # The records are safe in the journal; keep flushing the other journals
+                        self._stats["compaction_errors"] += 1
+                        logger.error(f"❌ Journal compaction failed: {e}")
+
+            self._stats["flushes"] += 1
+            self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    def stats(self) -> dict:
+        return {**self._stats, "queue_depth": len(self._dirty), "max_pending": self.max_pending}
+
+    async def close(self):
+        """Flush everything still queued and stop the writer"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        self._pool.shutdown(wait=True)
+
+
+# Shared executor for all JSON backup I/O
+persistence_executor = PersistenceExecutor()
@@ -0,0 +1,133 @@
+"""
+Streaming CSV / NDJSON parsing for bulk RSVP import and CSV export
+"""
+import codecs
+import csv
+import io
+import json
+from typing import AsyncIterator, Iterable, Optional, Tuple
+
+# Columns accepted on import and written on export, in export order
+RSVP_COLUMNS = (
+    "guest_name",
+    "guest_email",
+    "guest_phone",
+    "attendance",
+    "guest_count",
+    "dietary_restrictions",
+    "special_message",
+)
+EXPORT_COLUMNS = ("id",) + RSVP_COLUMNS + ("submitted_at",)
+ATTENDANCE_VALUES = ("yes", "no", "")
+
+
+class ImportTooLarge(Exception):
+    """Raised when the request body exceeds the configured limit"""
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[str]:
+    """Decode a byte stream as UTF-8 and yield it line by line (newlines kept)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    received = 0
+    buffer = ""
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise ImportTooLarge(f"Import exceeds {max_bytes} bytes")
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (row_number, row, error) for each CSV record after the header
+
+    Lines are gathered until the quotes balance, so quoted fields may span
+    lines without buffering the rest of the file.
+    """
+    header = None
+    record = ""
+    row_number = 0
+    async for line in lines:
+        record += line
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [value.strip().lower() for value in values]
+            continue
+        row_number += 1
+        if len(values) > len(header):
+            yield row_number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield row_number, dict(zip(header, values)), None
+    if record.strip():
+        row_number += 1
+        yield row_number, None, "Unterminated quoted field"
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (row_number, row, error) for each JSON object line"""
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, "Each line must be a JSON object"
+            continue
+        yield row_number, row, None
+
+
+def clean_row(row: dict) -> dict:
+    """Validate an imported row and return the RSVP fields (raises ValueError)"""
+    fields = {}
+    for column in RSVP_COLUMNS:
+        value = row.get(column)
+        fields[column] = "" if value is None else str(value).strip()
+
+    if not fields["guest_name"]:
+        raise ValueError("guest_name is required")
+    fields["attendance"] = fields["attendance"].lower()
+    if fields["attendance"] not in ATTENDANCE_VALUES:
+        raise ValueError("attendance must be 'yes', 'no' or empty")
+    try:
+        fields["guest_count"] = int(fields["guest_count"] or 1)
+    except ValueError:
+        raise ValueError("guest_count must be a whole number")
+    if fields["guest_count"] < 0:
+        raise ValueError("guest_count cannot be negative")
+    return fields
+
+
+def _export_cell(value) -> str:
+    if value is None:
+        return ""
+    value = str(value)
+    # Guest-supplied text must not be evaluated as a formula by spreadsheets
+    if value[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        return "'" + value
+    return value
+
+
+def csv_chunk(rows: Iterable[dict], header: bool = False) -> str:
+    """Encode rows (and optionally the header) as CSV text"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([_export_cell(row.get(column)) for column in EXPORT_COLUMNS])
+    return out.getvalue()
@@ -0,0 +1,144 @@
+"""
+Per-wedding RSVP summary counters
+"""
+import re
+from datetime import datetime
+from typing import Optional
+
+COUNTER_FIELDS = ("responses", "attending", "declined", "attending_guests")
+
+_SEPARATORS = re.compile(r"[,;/]|\band\b")
+_UNSAFE_KEY_CHARS = re.compile(r"[.$\x00]")
+MAX_DIETARY_KEY_LENGTH = 64
+NO_RESTRICTIONS = ("none", "n/a", "na", "no")
+
+
+def dietary_keys(dietary_restrictions) -> list:
+    """Normalise free-text restrictions into counter keys ("Vegan, nut-free" -> ["vegan", "nut-free"])"""
+    if not dietary_restrictions or not isinstance(dietary_restrictions, str):
+        return []
+    text = dietary_restrictions.lower()
+    # Checked before splitting, which would turn "n/a" into "n" and "a"
+    if text.strip() in NO_RESTRICTIONS:
+        return []
+    keys = []
+    for part in _SEPARATORS.split(text):
+        # Field names may not contain "." or "$"
+        key = " ".join(_UNSAFE_KEY_CHARS.sub(" ", part).split())[:MAX_DIETARY_KEY_LENGTH]
+        if key and key not in NO_RESTRICTIONS and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def guest_count(rsvp: dict) -> int:
+    """guest_count as counted by the rebuild pipeline (missing means 1)"""
+    value = rsvp.get("guest_count")
+    if value is None:
+        return 1
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 1
+
+
+def summary_delta(rsvp: Optional[dict], sign: int = 1) -> dict:
+    """Counter increments contributed by one RSVP (sign=-1 to retract it)"""
+    if not rsvp:
+        return {}
+    attendance = rsvp.get("attendance")
+    delta = {"responses": sign}
+    if attendance == "yes":
+        delta["attending"] = sign
+        delta["attending_guests"] = sign * guest_count(rsvp)
+        for key in dietary_keys(rsvp.get("dietary_restrictions")):
+            delta[f"dietary.{key}"] = sign
+    elif attendance == "no":
+        delta["declined"] = sign
+    return delta
+
+
+def merge_deltas(*deltas: dict) -> dict:
+    merged = {}
+    for delta in deltas:
+        for field, amount in delta.items():
+            merged[field] = merged.get(field, 0) + amount
+    return {field: amount for field, amount in merged.items() if amount}
+
+
+async def apply_summary_delta(database, wedding_id: str, delta: dict):
+    """Atomically add delta to the wedding's summary (creating it on first use)"""
+    if not delta:
+        return
+    await database.rsvp_summaries.update_one(
+        {"wedding_id": wedding_id},
+        {"$inc": delta, "$set": {"updated_at": datetime.utcnow().isoformat()}},
+        upsert=True
+    )
+
+
+def empty_summary(wedding_id: str) -> dict:
+    return {"wedding_id": wedding_id, **{field: 0 for field in COUNTER_FIELDS}, "dietary": {}}
+
+
+async def get_summary(database, wedding_id: str) -> dict:
+    summary = await database.rsvp_summaries.find_one({"wedding_id": wedding_id}, {"_id": 0})
+    if not summary:
+        return empty_summary(wedding_id)
+    # Retracted dietary keys can be left at zero
+    summary["dietary"] = {key: count for key, count in summary.get("dietary", {}).items() if count > 0}
+    return {**empty_summary(wedding_id), **summary}
+
+
+async def rebuild_summaries(database, wedding_id: Optional[str] = None) -> int:
+    """Recompute summaries from the rsvps collection; returns how many were written
+
+    The counters are grouped in the database; only the dietary free text is
+    normalised here, one distinct value per wedding.
+    """
+    match = {"wedding_id": wedding_id} if wedding_id else {}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$wedding_id",
+            "responses": {"$sum": 1},
+            "attending": {"$sum": {"$cond": [{"$eq": ["$attendance", "yes"]}, 1, 0]}},
+            "declined": {"$sum": {"$cond": [{"$eq": ["$attendance", "no"]}, 1, 0]}},
+            "attending_guests": {"$sum": {"$cond": [
+                {"$eq": ["$attendance", "yes"]},
+                {"$max": [{"$ifNull": ["$guest_count", 1]}, 0]},
+                0
+            ]}},
+        }},
+    ]
+    dietary_pipeline = [
+        {"$match": {**match, "attendance": "yes", "dietary_restrictions": {"$nin": [None, ""]}}},
+        {"$group": {"_id": {"wedding_id": "$wedding_id", "text": "$dietary_restrictions"}, "count": {"$sum": 1}}},
+    ]
+
+    dietary = {}
+    async for row in database.rsvps.aggregate(dietary_pipeline):
+        tallies = dietary.setdefault(row["_id"]["wedding_id"], {})
+        for key in dietary_keys(row["_id"]["text"]):
+            tallies[key] = tallies.get(key, 0) + row["count"]
+
+    now = datetime.utcnow().isoformat()
+    seen = set()
+    async for row in database.rsvps.aggregate(pipeline):
+        seen.add(row["_id"])
+        await database.rsvp_summaries.replace_one(
+            {"wedding_id": row["_id"]},
+            {
+                "wedding_id": row["_id"],
+                **{field: row[field] for field in COUNTER_FIELDS},
+                "dietary": dietary.get(row["_id"], {}),
+                "updated_at": now,
+            },
+            upsert=True
+        )
+
+    # Drop summaries of weddings that no longer have any RSVPs
+    if wedding_id is None:
+        await database.rsvp_summaries.delete_many({"wedding_id": {"$nin": list(seen)}})
+    elif not seen:
+        await database.rsvp_summaries.delete_many({"wedding_id": wedding_id})
+    return len(seen)
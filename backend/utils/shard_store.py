@@ -0,0 +1,384 @@
+"""
+Sharded JSON backup store (records/<id>.json, index.json and journal.log)
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Optional
+
+from utils.persistence import PersistenceExecutor, persistence_executor
+
+try:
+    import fcntl
+except ImportError:  # Windows: only safe with a single server process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_SAFE_KEY = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def _write_atomic(path: Path, payload: str):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ShardedJsonStore:
+    """One-file-per-record JSON store with secondary key index and write-behind journal"""
+
+    def __init__(
+        self,
+        root: Path,
+        index_fields: Iterable[str] = (),
+        legacy_file: Optional[Path] = None,
+        executor: PersistenceExecutor = persistence_executor,
+        compact_bytes: int = 1024 * 1024,
+        compact_interval: float = 300.0,
+        refresh_interval: float = 1.0,
+    ):
+        self.root = Path(root)
+        self.records_dir = self.root / "records"
+        self.index_path = self.root / "index.json"
+        self.journal_path = self.root / "journal.log"
+        self.index_fields = tuple(index_fields)
+        self.legacy_file = Path(legacy_file) if legacy_file else None
+        self.executor = executor
+        self.compact_bytes = compact_bytes
+        self.compact_interval = compact_interval
+        self.refresh_interval = refresh_interval
+
+        # id -> {field: value} for every stored record
+        self._index = {}
+        # field -> {value: id}
+        self._lookup = {field: {} for field in self.index_fields}
+        # Records changed since the last compaction: id -> record (None when deleted).
+        # Our own changes also have an entry in _versions; the rest were read
+        # from another process's journal lines
+        self._overlay = {}
+        self._versions = {}
+        # Version of each of our records as last encoded into the journal
+        self._journaled = {}
+        # Per-record locks for read-modify-write updates
+        self._locks = {}
+        self._loaded = False
+        self._journal_bytes = 0
+        self._last_compaction = time.monotonic()
+        # mtime/size of index.json + journal.log as last loaded or written by us
+        self._disk_stamp = None
+        self._last_refresh_check = 0.0
+        self._refreshing = False
+        self._reloads = 0
+
+    # Loading
+
+    @contextmanager
+    def _lock(self):
+        """Exclusive lock shared by every process using this directory"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read_disk(self) -> tuple:
+        """Read the index and the journal (blocking: runs on the persistence thread)"""
+        with self._lock():
+            if not self.index_path.exists():
+                self._migrate_legacy()
+            index = self._read_index()
+            records, journal_bytes = self._read_journal()
+            stamp = self._stamp()
+        return index, records, journal_bytes, stamp
+
+    def _read_index(self) -> dict:
+        if not self.index_path.exists():
+            return {}
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"❌ Failed to read index {self.index_path}: {e}")
+            return {}
+
+    def _read_journal(self) -> tuple:
+        """[(key, record)] in append order, and the journal size"""
+        records = []
+        if not self.journal_path.exists():
+            return records, 0
+        with open(self.journal_path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final write after a crash; everything before it is intact
+                    logger.warning(f"⚠️ Skipping corrupt journal record in {self.journal_path}")
+                    continue
+                records.append((record["key"], record.get("value")))
+        return records, self.journal_path.stat().st_size
+
+    def _apply_disk(self, index: dict, records: list, journal_bytes: int, stamp: tuple):
+        """Replace the in-memory view with what was read from disk (on the loop)"""
+        # Our own changes not yet compacted win over whatever other writers left behind
+        ours = {key: self._overlay.get(key) for key in self._versions}
+        self._index = index
+        self._rebuild_lookup()
+        self._overlay = {}
+        for key, record in records:
+            self._set_entry(key, record)
+        for key, record in ours.items():
+            self._set_entry(key, record)
+        self._journal_bytes = journal_bytes
+        self._disk_stamp = stamp
+        self._loaded = True
+
+    def _migrate_legacy(self):
+        """Split a monolithic ``{id: record}`` JSON file into shards"""
+        self.records_dir.mkdir(parents=True, exist_ok=True)
+        legacy = {}
+        if self.legacy_file is not None and self.legacy_file.exists():
+            try:
+                with open(self.legacy_file, "r") as f:
+                    legacy = json.load(f)
+            except Exception as e:
+                logger.error(f"❌ Failed to read legacy backup {self.legacy_file}: {e}")
+                return
+
+        index = {}
+        for key, record in legacy.items():
+            _write_atomic(self._shard_path(key), json.dumps(record, indent=2, default=str))
+            index[key] = self._index_entry(record)
+        # Written last: its presence marks the migration as complete
+        _write_atomic(self.index_path, json.dumps(index, default=str))
+        if index:
+            logger.info(f"✅ Migrated {len(index)} records from {self.legacy_file.name} into {self.root}")
+
+    async def start(self):
+        """Load the index and replay the journal off the event loop"""
+        if self._loaded:
+            return
+        index, records, journal_bytes, stamp = await self.executor.run(self._read_disk)
+        self._apply_disk(index, records, journal_bytes, stamp)
+        if records:
+            logger.info(f"✅ Replayed {len(records)} journal records into {self.root.name}")
+
+    def _stamp(self) -> tuple:
+        stamp = []
+        for path in (self.index_path, self.journal_path):
+            try:
+                stat = path.stat()
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    async def refresh(self):
+        """Reload the index if another process changed the files on disk"""
+        if not self._loaded:
+            await self.start()
+            return
+        now = time.monotonic()
+        if self._refreshing or now - self._last_refresh_check < self.refresh_interval:
+            return
+        self._last_refresh_check = now
+        if self._stamp() == self._disk_stamp:
+            return
+
+        self._refreshing = True
+        try:
+            self._apply_disk(*await self.executor.run(self._read_disk))
+        finally:
+            self._refreshing = False
+        self._reloads += 1
+        logger.info(f"🔄 Reloaded {self.root.name} index after an external change")
+
+    def _shard_path(self, key: str) -> Path:
+        name = key if _SAFE_KEY.match(key) else hashlib.sha1(key.encode()).hexdigest()
+        return self.records_dir / f"{name}.json"
+
+    def _index_entry(self, record: dict) -> dict:
+        return {field: record.get(field) for field in self.index_fields if record.get(field) is not None}
+
+    def _rebuild_lookup(self):
+        self._lookup = {field: {} for field in self.index_fields}
+        for key, entry in self._index.items():
+            for field, value in entry.items():
+                if field in self._lookup:
+                    self._lookup[field][value] = key
+
+    def _set_entry(self, key: str, record: Optional[dict]):
+        """Put a record into the overlay and the secondary index"""
+        for field, value in self._index.pop(key, {}).items():
+            if self._lookup.get(field, {}).get(value) == key:
+                del self._lookup[field][value]
+        if record is not None:
+            entry = self._index_entry(record)
+            self._index[key] = entry
+            for field, value in entry.items():
+                self._lookup[field][value] = key
+        self._overlay[key] = record
+
+    def _remember(self, key: str, record: Optional[dict]):
+        """Apply one of our own changes"""
+        self._set_entry(key, record)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    # Reads
+
+    def resolve(self, field: str, value) -> Optional[str]:
+        """Return the id of the record whose secondary key ``field`` equals value"""
+        return self._lookup[field].get(value)
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Return the record stored under key (one small file read on a miss)"""
+        await self.refresh()
+        if key in self._overlay:
+            record = self._overlay[key]
+            return copy.deepcopy(record) if record is not None else None
+        if key not in self._index:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read_shard, key)
+
+    async def get_by(self, field: str, value) -> Optional[dict]:
+        """Return the record whose secondary key ``field`` equals value"""
+        await self.refresh()
+        key = self.resolve(field, value)
+        if key is None:
+            return None
+        return await self.get(key)
+
+    def _read_shard(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._shard_path(key), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"❌ Failed to read shard for {key}: {e}")
+            return None
+
+    # Writes
+
+    async def set(self, key: str, value: dict):
+        """Replace the whole record stored under key"""
+        await self.start()
+        # Copy through JSON so later mutation of the caller's objects can't leak in
+        self._remember(key, json.loads(json.dumps(value, default=str)))
+        await self.executor.submit(self, key)
+
+    async def update(self, key: str, fields: dict):
+        """Merge fields into an existing record (no-op if the record is missing)"""
+        await self._modify(key, lambda record: record.update(fields))
+
+    async def append(self, key: str, field: str, item):
+        """Append item to a list field of an existing record"""
+        await self._modify(key, lambda record: record.setdefault(field, []).append(item))
+
+    async def _modify(self, key: str, change):
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            record = await self.get(key)
+            if record is None:
+                return
+            change(record)
+            await self.set(key, record)
+
+    async def delete(self, key: str):
+        await self.start()
+        self._remember(key, None)
+        await self.executor.submit(self, key)
+
+    # Persistence (driven by the executor)
+
+    def encode_records(self, keys: list) -> str:
+        """Encode the latest state of each key as journal lines"""
+        lines = []
+        for key in keys:
+            if key in self._versions:
+                record = self._overlay.get(key)
+                self._journaled[key] = self._versions[key]
+            elif key in self._index:
+                # Already folded into its shard by a compaction
+                continue
+            else:
+                record = None
+            lines.append(json.dumps({"key": key, "value": record}, default=str) + "\n")
+        return "".join(lines)
+
+    def write_lines(self, lines: str):
+        """Append encoded records with a single fsync (runs on the writer thread)"""
+        with self._lock():
+            before = self._stamp()
+            with open(self.journal_path, "a") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            # Only skip the next reload if nobody else wrote since we last looked
+            if before == self._disk_stamp:
+                self._disk_stamp = self._stamp()
+        self._journal_bytes += len(lines.encode())
+
+    def should_compact(self) -> bool:
+        if self._journal_bytes >= self.compact_bytes:
+            return True
+        elapsed = time.monotonic() - self._last_compaction
+        return self._journal_bytes > 0 and elapsed >= self.compact_interval
+
+    async def compact(self):
+        """Fold the journal into the shards and index.json, then truncate it"""
+        journaled = dict(self._journaled)
+        index, stamp = await self.executor.run(self._fold_journal)
+        for key, version in journaled.items():
+            # Keep anything edited again since it was journaled
+            if self._versions.get(key) == version:
+                self._versions.pop(key)
+                self._journaled.pop(key)
+        self._apply_disk(index, [], 0, stamp)
+        self._last_compaction = time.monotonic()
+
+    def _fold_journal(self) -> tuple:
+        """Write every journaled record (from any process) to its shard (blocking)"""
+        with self._lock():
+            index = self._read_index()
+            records, _ = self._read_journal()
+            self.records_dir.mkdir(parents=True, exist_ok=True)
+            for key, record in dict(records).items():
+                path = self._shard_path(key)
+                if record is None:
+                    path.unlink(missing_ok=True)
+                    index.pop(key, None)
+                else:
+                    _write_atomic(path, json.dumps(record, indent=2, default=str))
+                    index[key] = self._index_entry(record)
+            _write_atomic(self.index_path, json.dumps(index, default=str))
+            with open(self.journal_path, "w") as f:
+                f.flush()
+                os.fsync(f.fileno())
+            stamp = self._stamp()
+        return index, stamp
+
+    def stats(self) -> dict:
+        return {
+            "records": len(self._index),
+            "pending_records": len(self._overlay),
+            "journal_bytes": self._journal_bytes,
+            "index_reloads": self._reloads,
+        }
+
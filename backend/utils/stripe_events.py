@@ -0,0 +1,183 @@
+"""
+Background processing of Stripe webhook events
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+from pymongo import UpdateOne
+
+from utils.contribution_totals import complete_contribution
+
+logger = logging.getLogger(__name__)
+
+HANDLED_PREFIX = "payment_intent."
+FAILED_EVENTS = ("payment_intent.payment_failed", "payment_intent.canceled")
+SUCCEEDED_EVENT = "payment_intent.succeeded"
+
+
+def event_record(event: dict) -> dict:
+    """The parts of a Stripe event worth storing
+
+    Takes the decoded JSON payload rather than a stripe.Event: StripeObject
+    has no dict methods on recent stripe-python releases.
+    """
+    intent = event["data"]["object"]
+    return {
+        "id": event["id"],
+        "type": event["type"],
+        "created": event.get("created"),
+        "payment_intent_id": intent.get("id"),
+        "payment_status": intent.get("status"),
+        "amount_received": intent.get("amount_received"),
+        "received_at": datetime.utcnow(),
+        "processed_at": None,
+    }
+
+
+class StripeEventProcessor:
+    """Queue + batch worker applying payment_intent events to contributions"""
+
+    def __init__(
+        self,
+        get_database: Callable,
+        batch_size: int = 100,
+        batch_wait: float = 0.2,
+        max_queue: int = 10000,
+        recovery_interval: float = 60.0,
+        stale_after: float = 30.0,
+    ):
+        self.get_database = get_database
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.recovery_interval = recovery_interval
+        self.stale_after = stale_after
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self._recovery_task = None
+        self.processed = 0
+        self.batches = 0
+        self.completed = 0
+        self.failed = 0
+        self.overflowed = 0
+        self.last_batch_seconds = None
+
+    def enqueue(self, record: dict) -> bool:
+        """Queue a stored event; when full it stays in the collection for recovery"""
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            self.overflowed += 1
+            return False
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._recovery_task = asyncio.create_task(self._recover_periodically())
+
+    async def stop(self):
+        for task in (self._task, self._recovery_task):
+            if task is not None:
+                task.cancel()
+        self._task = self._recovery_task = None
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self.process_batch(batch)
+            except Exception as e:
+                # Left unprocessed in the collection; recovery retries them
+                logger.error(f"❌ Failed to apply {len(batch)} Stripe events: {e}")
+
+    async def process_batch(self, batch: list):
+        database = self.get_database()
+        started = time.perf_counter()
+
+        # Only the newest event per PaymentIntent matters
+        latest = {}
+        for record in sorted(batch, key=lambda r: r.get("created") or 0):
+            if record.get("payment_intent_id"):
+                latest[record["payment_intent_id"]] = record
+
+        failed_updates = []
+        for intent_id, record in latest.items():
+            if record["type"] == SUCCEEDED_EVENT:
+                # Per intent: the pending->completed transition also bumps the running total
+                fields = {}
+                if record.get("amount_received") is not None:
+                    fields["amount_received"] = record["amount_received"] / 100
+                if await complete_contribution(database, {"stripe_payment_intent_id": intent_id}, fields):
+                    self.completed += 1
+            elif record["type"] in FAILED_EVENTS:
+                failed_updates.append(UpdateOne(
+                    {"stripe_payment_intent_id": intent_id, "payment_status": "pending"},
+                    {"$set": {"payment_status": "failed", "updated_at": datetime.utcnow()}}
+                ))
+        if failed_updates:
+            result = await database.contributions.bulk_write(failed_updates, ordered=False)
+            self.failed += result.modified_count
+
+        await database.stripe_events.update_many(
+            {"id": {"$in": [record["id"] for record in batch]}},
+            {"$set": {"processed_at": datetime.utcnow()}}
+        )
+        self.processed += len(batch)
+        self.batches += 1
+        self.last_batch_seconds = round(time.perf_counter() - started, 4)
+
+    async def recover(self) -> int:
+        """Queue stored events that were never processed"""
+        database = self.get_database()
+        if database is None:
+            return 0
+        room = self.queue.maxsize - self.queue.qsize()
+        if room <= 0:
+            return 0
+        queued = 0
+        # Recent events are most likely still in the worker's hands
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        cursor = database.stripe_events.find(
+            {"processed_at": None, "received_at": {"$lt": cutoff}},
+            {"_id": 0}
+        ).sort("received_at", 1).limit(room)
+        async for record in cursor:
+            if not self.enqueue(record):
+                break
+            queued += 1
+        if queued:
+            logger.info(f"🔄 Requeued {queued} unprocessed Stripe events")
+        return queued
+
+    async def _recover_periodically(self):
+        while True:
+            try:
+                # Skip while the worker is still busy with the queue
+                if self.queue.empty():
+                    await self.recover()
+            except Exception as e:
+                logger.error(f"❌ Stripe event recovery failed: {e}")
+            await asyncio.sleep(self.recovery_interval)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "processed": self.processed,
+            "batches": self.batches,
+            "completed_contributions": self.completed,
+            "failed_contributions": self.failed,
+            "overflowed": self.overflowed,
+            "last_batch_seconds": self.last_batch_seconds,
+        }
@@ -0,0 +1,104 @@
+"""
+Non-blocking, bounded access to the synchronous Stripe client
+"""
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import stripe
+
+from utils.metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class StripeGatewayBusy(Exception):
+    """Raised when no Stripe call slot frees up within the queue timeout"""
+
+
+class StripeGateway:
+    """Bounded, instrumented executor for Stripe API calls"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        timeout: float = 10.0,
+        queue_timeout: float = 5.0,
+        max_network_retries: int = 1,
+        api_base: Optional[str] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_network_retries = max_network_retries
+        self.api_base = api_base
+        self._executor = None
+        self._semaphore = None
+        self._histograms = {}
+        self.rejected = 0
+        self.in_flight = 0
+
+    def configure(self):
+        """Install the pooled HTTP client and create the worker threads"""
+        # One requests.Session per thread keeps connections to Stripe alive
+        stripe.default_http_client = stripe.RequestsClient(timeout=self.timeout)
+        stripe.max_network_retries = self.max_network_retries
+        if self.api_base:
+            stripe.api_base = self.api_base
+            logger.info(f"🔧 Stripe API base set to {self.api_base}")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="stripe")
+        return self
+
+    async def call(self, operation: str, fn, *args, **kwargs):
+        """Run a blocking Stripe call off the event loop and record its latency"""
+        if self._executor is None:
+            self.configure()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise StripeGatewayBusy("Payment provider is busy, please retry")
+
+        histogram = self._histograms.setdefault(operation, LatencyHistogram())
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self.in_flight += 1
+        try:
+            result = await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        except Exception:
+            histogram.observe(time.perf_counter() - started, error=True)
+            raise
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+        histogram.observe(time.perf_counter() - started)
+        return result
+
+    async def create_payment_intent(self, **params):
+        return await self.call("payment_intents.create", stripe.PaymentIntent.create, **params)
+
+    async def retrieve_payment_intent(self, payment_intent_id: str):
+        return await self.call("payment_intents.retrieve", stripe.PaymentIntent.retrieve, payment_intent_id)
+
+    async def list_payment_intents(self, **params):
+        return await self.call("payment_intents.list", stripe.PaymentIntent.list, **params)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "latency": {operation: histogram.stats() for operation, histogram in self._histograms.items()},
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
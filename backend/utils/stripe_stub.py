@@ -0,0 +1,174 @@
+"""
+Local stand-in for the Stripe PaymentIntents API (python -m utils.stripe_stub --port 12111)
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+_BRACKETED = re.compile(r"^(\w+)\[(\w+)\]$")
+
+
+def _parse_params(query: str) -> dict:
+    """Decode Stripe's form encoding (``metadata[key]=value`` becomes a nested dict)"""
+    params = {}
+    for key, value in parse_qsl(query, keep_blank_values=True):
+        match = _BRACKETED.match(key)
+        if match:
+            params.setdefault(match.group(1), {})[match.group(2)] = value
+        else:
+            params[key] = value
+    return params
+
+
+class StubStripeServer:
+    """In-memory PaymentIntents API served from a background thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 12111, latency: float = 0.0):
+        self.latency = latency
+        self.intents = {}
+        self._order = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                stub._dispatch(self, "GET")
+
+            def do_POST(self):
+                stub._dispatch(self, "POST")
+
+        return Handler
+
+    # Request handling
+
+    def _dispatch(self, handler, method: str):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlsplit(handler.path)
+        params = _parse_params(url.query)
+        if method == "POST":
+            length = int(handler.headers.get("Content-Length") or 0)
+            params.update(_parse_params(handler.rfile.read(length).decode()))
+
+        parts = [part for part in url.path.split("/") if part]
+        if parts[:2] != ["v1", "payment_intents"]:
+            return self._error(handler, 404, f"Unrecognized request URL ({method}: {url.path})")
+
+        if method == "POST" and len(parts) == 2:
+            return self._send(handler, 200, self.create(params))
+        if method == "GET" and len(parts) == 2:
+            return self._send(handler, 200, self.list(params))
+
+        intent = self.intents.get(parts[2]) if len(parts) > 2 else None
+        if intent is None:
+            return self._error(handler, 404, f"No such payment_intent: '{parts[2] if len(parts) > 2 else ''}'")
+        if method == "GET" and len(parts) == 3:
+            return self._send(handler, 200, intent)
+        if method == "POST" and parts[3:] == ["confirm"]:
+            return self._send(handler, 200, self.succeed(intent["id"]))
+        return self._error(handler, 404, f"Unrecognized request URL ({method}: {url.path})")
+
+    def _send(self, handler, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.send_header("Request-Id", f"req_stub_{uuid.uuid4().hex[:14]}")
+        try:
+            handler.end_headers()
+            handler.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up first, e.g. its timeout is below the latency
+            pass
+
+    def _error(self, handler, status: int, message: str):
+        self._send(handler, status, {"error": {"type": "invalid_request_error", "message": message}})
+
+    # PaymentIntents
+
+    def create(self, params: dict) -> dict:
+        intent_id = f"pi_stub_{uuid.uuid4().hex[:24]}"
+        intent = {
+            "id": intent_id,
+            "object": "payment_intent",
+            "amount": int(params.get("amount", 0)),
+            "amount_received": 0,
+            "currency": params.get("currency", "usd"),
+            "status": "requires_payment_method",
+            "client_secret": f"{intent_id}_secret_{uuid.uuid4().hex[:16]}",
+            "metadata": params.get("metadata", {}),
+            "created": int(time.time()),
+            "livemode": False,
+        }
+        with self._lock:
+            self.intents[intent_id] = intent
+            self._order.append(intent_id)
+        return intent
+
+    def succeed(self, intent_id: str) -> dict:
+        with self._lock:
+            intent = self.intents[intent_id]
+            intent.update(status="succeeded", amount_received=intent["amount"])
+        return intent
+
+    def list(self, params: dict) -> dict:
+        limit = min(int(params.get("limit", 10)), 100)
+        created_gte = int(params.get("created", {}).get("gte", 0)) if isinstance(params.get("created"), dict) else 0
+        with self._lock:
+            # Newest first, like the real API
+            ids = list(reversed(self._order))
+        starting_after = params.get("starting_after")
+        if starting_after in ids:
+            ids = ids[ids.index(starting_after) + 1:]
+        matching = [self.intents[i] for i in ids if self.intents[i]["created"] >= created_gte]
+        return {
+            "object": "list",
+            "url": "/v1/payment_intents",
+            "has_more": len(matching) > limit,
+            "data": matching[:limit],
+        }
+
+    # Lifecycle
+
+    def start(self) -> "StubStripeServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Stripe PaymentIntents stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12111)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    args = parser.parse_args()
+
+    stub = StubStripeServer(args.host, args.port, args.latency)
+    print(f"🧪 Stripe stub listening on {stub.url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
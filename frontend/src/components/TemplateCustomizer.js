@@ -1,5 +1,6 @@
 import React, { useState, useRef } from 'react';
 import { useAppTheme } from '../App';
+import { uploadMediaFiles } from '../utils/api';
 import { 
   X, Upload, Crop, Save, Heart, Calendar, MapPin, User, Phone, Mail, 
   Camera, Scissors, RotateCcw, Plus, Trash2, ChevronLeft, ChevronRight,
@@ -661,8 +662,21 @@ const TemplateCustomizer = ({ isOpen, onClose, onSave }) => {
                       input.type = 'file';
                       input.accept = 'image/*';
                       input.multiple = true;
-                      input.onchange = (e) => {
+                      input.onchange = async (e) => {
                         const files = Array.from(e.target.files);
+                        const sessionId = localStorage.getItem('sessionId');
+                        if (sessionId && files.length) {
+                          try {
+                            const uploaded = await uploadMediaFiles(files, sessionId);
+                            setFormData(prev => ({
+                              ...prev,
+                              galleryPhotos: [...prev.galleryPhotos, ...uploaded.map(media => media.url)]
+                            }));
+                            return;
+                          } catch (error) {
+                            console.error('Photo upload failed, keeping photos inline:', error);
+                          }
+                        }
                         files.forEach(file => {
                           const reader = new FileReader();
                           reader.onload = (event) => {
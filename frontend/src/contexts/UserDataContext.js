@@ -1,6 +1,7 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
 import { useParams, useLocation } from 'react-router-dom';
 import { getBackendUrl } from '../utils/api';
+import { applyOperations } from '../utils/jsonPatch';
 
 const UserDataContext = createContext();
 
@@ -165,10 +166,41 @@ export const UserDataProvider = ({ children }) => {
     }
   };
 
+  // Apply JSON-patch style operations (e.g. add/move/remove one timeline entry);
+  // only the operations go over the wire and only the new version comes back
+  const patchWeddingData = async (operations) => {
+    if (!isAuthenticated || !userInfo?.sessionId) {
+      throw new Error('User not authenticated - please login first');
+    }
+    
+    const updatedData = applyOperations(weddingData || getDefaultWeddingData(), operations);
+    const backendUrl = getBackendUrl();
+    const response = await fetch(`${backendUrl}/api/wedding`, {
+      method: 'PATCH',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        operations,
+        session_id: userInfo.sessionId
+      })
+    });
+    
+    if (!response.ok) {
+      // No wedding yet or the patch no longer applies: fall back to a full save
+      console.warn('Patch failed, falling back to full save:', response.status);
+      return await saveWeddingData(updatedData);
+    }
+    
+    const { version, updated_at } = await response.json();
+    const savedData = { ...updatedData, version, updated_at };
+    setWeddingData(savedData);
+    return savedData;
+  };
+
   // Update specific field in wedding data
   const updateWeddingData = async (field, value) => {
-    const updatedData = { ...weddingData, [field]: value };
-    return await saveWeddingData(updatedData);
+    return await patchWeddingData([{ op: 'add', path: `/${field}`, value }]);
   };
 
   // Login function
@@ -253,6 +285,7 @@ export const UserDataProvider = ({ children }) => {
     logout,
     saveWeddingData,
     updateWeddingData,
+    patchWeddingData,
     getWeddingUrl,
     getSectionUrl,
     
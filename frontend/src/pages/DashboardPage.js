@@ -1621,22 +1621,33 @@ const RSVPAdminContent = ({ weddingData, theme }) => {
         return;
       }
       
-      const response = await fetch(`${backendUrl}/api/rsvp/shareable/${weddingId}`);
-      const data = await response.json();
+      // RSVPs come back a page at a time; follow next_cursor to collect them all
+      let data = { success: true, rsvps: [] };
+      let cursor = null;
+      do {
+        const query = cursor ? `?limit=200&cursor=${encodeURIComponent(cursor)}` : '?limit=200';
+        const response = await fetch(`${backendUrl}/api/rsvp/shareable/${weddingId}${query}`);
+        const page = await response.json();
+        if (!page.success) {
+          data = page;
+          break;
+        }
+        data.rsvps = [...data.rsvps, ...page.rsvps];
+        cursor = page.next_cursor;
+      } while (cursor);
       
       if (data.success) {
         setRsvps(data.rsvps);
         
-        // Calculate statistics
-        const attending = data.rsvps.filter(rsvp => rsvp.attendance === 'yes');
-        const notAttending = data.rsvps.filter(rsvp => rsvp.attendance === 'no');
-        const totalGuests = attending.reduce((sum, rsvp) => sum + (rsvp.guest_count || 1), 0);
+        // Statistics come precomputed from the summary counters
+        const summaryResponse = await fetch(`${backendUrl}/api/rsvp/${weddingData.id}/summary`);
+        const { summary } = await summaryResponse.json();
         
         setStats({
-          total: data.rsvps.length,
-          attending: attending.length,
-          notAttending: notAttending.length,
-          totalGuests: totalGuests
+          total: summary.responses,
+          attending: summary.attending,
+          notAttending: summary.declined,
+          totalGuests: summary.attending_guests
         });
       } else {
         setError(data.message || 'Failed to fetch RSVPs');
@@ -15,6 +15,9 @@ const GuestbookPage = ({ isPrivate = false, isDashboard = false }) => {
   });
 
   const [messages, setMessages] = useState([]);
+  const [totalCount, setTotalCount] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [submitting, setSubmitting] = useState(false);
   const [error, setError] = useState('');
@@ -27,6 +30,37 @@ const GuestbookPage = ({ isPrivate = false, isDashboard = false }) => {
     fetchMessages();
   }, [weddingId]);
 
+  const messagesUrl = (backendUrl, cursor = null) => {
+    // Private dashboard guestbook uses the private alias; public pages the plain route
+    const path = isPrivate && isDashboard
+      ? `/api/guestbook/private/${weddingId}`
+      : `/api/guestbook/${weddingId}`;
+    return cursor
+      ? `${backendUrl}${path}?cursor=${encodeURIComponent(cursor)}`
+      : `${backendUrl}${path}`;
+  };
+
+  const loadMoreMessages = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    
+    try {
+      const backendUrl = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
+      const response = await fetch(messagesUrl(backendUrl, nextCursor));
+      const data = await response.json();
+      
+      if (data.success) {
+        setMessages(prev => [...prev, ...(data.messages || [])]);
+        setTotalCount(data.total_count || 0);
+        setNextCursor(data.next_cursor || null);
+      }
+    } catch (err) {
+      console.error('Error loading more messages:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchMessages = async () => {
     setLoading(true);
     setError('');
@@ -45,20 +79,14 @@ const GuestbookPage = ({ isPrivate = false, isDashboard = false }) => {
         return;
       }
       
-      // Get messages for this specific wedding
-      let response;
-      if (isPrivate && isDashboard) {
-        // Private dashboard guestbook - get messages for user's specific wedding
-        response = await fetch(`${backendUrl}/api/guestbook/private/${weddingId}`);
-      } else {
-        // Public wedding page or dashboard - get messages for specific wedding
-        response = await fetch(`${backendUrl}/api/guestbook/${weddingId}`);
-      }
-      
+      // Get the first page of messages for this specific wedding
+      const response = await fetch(messagesUrl(backendUrl));
       const data = await response.json();
       
       if (data.success) {
         setMessages(data.messages || []);
+        setTotalCount(data.total_count || 0);
+        setNextCursor(data.next_cursor || null);
       } else {
         setError('Failed to load messages');
       }
@@ -420,6 +448,23 @@ const GuestbookPage = ({ isPrivate = false, isDashboard = false }) => {
               ))
             )}
           </div>
+
+          {!loading && !error && nextCursor && (
+            <div className="text-center mt-8">
+              <button
+                onClick={loadMoreMessages}
+                disabled={loadingMore}
+                className="inline-flex items-center gap-2 px-6 py-3 rounded-xl font-semibold transition-all duration-300 hover:scale-105 disabled:opacity-50"
+                style={{
+                  background: theme.gradientAccent,
+                  color: theme.primary
+                }}
+              >
+                {loadingMore && <Loader className="w-5 h-5 animate-spin" />}
+                {loadingMore ? 'Loading...' : `Show More Messages (${messages.length} of ${totalCount})`}
+              </button>
+            </div>
+          )}
         </div>
 
         {/* Thank You Note */}
@@ -3,6 +3,10 @@ import { useParams, useNavigate } from 'react-router-dom';
 import { useAppTheme } from '../App';
 import { Calendar, MapPin, Heart, Clock, User, MessageCircle, Camera, ArrowLeft, Home, BookOpen, Mail, Users, Gift, HelpCircle, Star, Menu, X } from 'lucide-react';
 import FloatingNavbar from '../components/FloatingNavbar';
+import { responsiveImageProps } from '../utils/media';
+
+// Gallery grid: 2 columns on phones, 3 on tablets, 4 on desktop
+const GALLERY_IMAGE_SIZES = '(min-width: 1024px) 25vw, (min-width: 768px) 33vw, 50vw';
 
 // Default wedding data for fallback
 const defaultWeddingData = {
@@ -420,7 +424,8 @@ const PublicWeddingPage = () => {
               {weddingData.gallery_photos.map((photo, index) => (
                 <div key={index} className="bg-white/50 backdrop-blur-lg rounded-2xl p-2 border border-white/40">
                   <img
-                    src={photo.url}
+                    {...responsiveImageProps(photo.url, weddingData.media_variants, GALLERY_IMAGE_SIZES)}
+                    loading="lazy"
                     alt={`Memory ${index + 1}`}
                     className="w-full h-40 object-cover rounded-xl"
                   />
@@ -660,7 +665,8 @@ const PublicWeddingPage = () => {
               {weddingData.gallery_photos.map((photo, index) => (
                 <div key={index} className="bg-white/50 backdrop-blur-lg rounded-2xl p-2 border border-white/40">
                   <img
-                    src={photo.url}
+                    {...responsiveImageProps(photo.url, weddingData.media_variants, GALLERY_IMAGE_SIZES)}
+                    loading="lazy"
                     alt={`Memory ${index + 1}`}
                     className="w-full h-40 object-cover rounded-xl"
                   />
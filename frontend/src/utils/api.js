@@ -39,3 +39,23 @@ export const apiCall = async (endpoint, options = {}) => {
     throw error;
   }
 };
+
+/**
+ * Upload image files as multipart/form-data
+ * Returns the stored media ({ filename, id, url, size, deduplicated }) in upload order
+ */
+export const uploadMediaFiles = async (files, sessionId) => {
+  const body = new FormData();
+  Array.from(files).forEach(file => body.append('files', file, file.name));
+
+  // No Content-Type header: the browser adds the multipart boundary
+  const response = await fetch(
+    `${getBackendUrl()}/api/media/upload?session_id=${encodeURIComponent(sessionId)}`,
+    { method: 'POST', body }
+  );
+  if (!response.ok) {
+    throw new Error(`Upload failed with status ${response.status}`);
+  }
+  const result = await response.json();
+  return result.files;
+};
@@ -0,0 +1,53 @@
+// Minimal JSON-patch helpers mirroring backend/utils/json_patch.py
+// Supports add / remove / replace / move with RFC 6901 pointers ("-" appends)
+
+const parsePointer = (pointer) =>
+  pointer.slice(1).split('/').map((token) => token.replace(/~1/g, '/').replace(/~0/g, '~'));
+
+const resolveParent = (doc, tokens) => {
+  let target = doc;
+  for (const token of tokens.slice(0, -1)) {
+    target = target[Array.isArray(target) ? Number(token) : token];
+  }
+  return [target, tokens[tokens.length - 1]];
+};
+
+const addAt = (doc, pointer, value) => {
+  const [parent, last] = resolveParent(doc, parsePointer(pointer));
+  if (Array.isArray(parent)) {
+    parent.splice(last === '-' ? parent.length : Number(last), 0, value);
+  } else {
+    parent[last] = value;
+  }
+};
+
+const removeAt = (doc, pointer) => {
+  const [parent, last] = resolveParent(doc, parsePointer(pointer));
+  if (Array.isArray(parent)) {
+    return parent.splice(Number(last), 1)[0];
+  }
+  const value = parent[last];
+  delete parent[last];
+  return value;
+};
+
+/**
+ * Apply operations to a deep copy of doc and return it
+ */
+export const applyOperations = (doc, operations) => {
+  const result = JSON.parse(JSON.stringify(doc));
+  for (const operation of operations) {
+    const { op, path } = operation;
+    if (op === 'add') {
+      addAt(result, path, operation.value);
+    } else if (op === 'remove') {
+      removeAt(result, path);
+    } else if (op === 'replace') {
+      removeAt(result, path);
+      addAt(result, path, operation.value);
+    } else if (op === 'move' && operation.from !== path) {
+      addAt(result, path, removeAt(result, operation.from));
+    }
+  }
+  return result;
+};
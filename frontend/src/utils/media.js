@@ -0,0 +1,22 @@
+// Responsive image helpers for the media_variants map of public wedding payloads
+
+// Longest edge of each server-side derivative, used as its srcset width
+const VARIANT_WIDTHS = { thumb: 320, medium: 1024, large: 2048 };
+
+/**
+ * <img> props for a stored image: src stays the original, srcSet lists the
+ * resized copies so phones download a fraction of the bytes
+ */
+export const responsiveImageProps = (url, mediaVariants, sizes) => {
+  const variants = mediaVariants?.[url];
+  if (!variants) {
+    return { src: url };
+  }
+
+  const srcSet = Object.entries(VARIANT_WIDTHS)
+    .filter(([name]) => variants[name])
+    .map(([name, width]) => `${variants[name]} ${width}w`)
+    .join(', ');
+
+  return { src: url, srcSet, sizes };
+};
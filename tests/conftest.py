@@ -0,0 +1,12 @@
+"""
+Shared test setup
+
+The backend modules are imported the way the server runs them, from the
+backend directory (``utils.*``, ``config.*``).
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
@@ -0,0 +1,120 @@
+"""
+Tests for the in-process TTL cache (utils/cache.py)
+"""
+import pytest
+
+from utils import cache
+from utils.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    entries = TTLCache(maxsize=2, ttl=60)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    assert entries.get("a") == 1
+    entries.set("c", 3)
+
+    assert entries.get("b") is None
+    assert entries.get("a") == 1 and entries.get("c") == 3
+    assert entries.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    entries = TTLCache(ttl=60)
+    entries.set("a", 1)
+    clock.now += 59
+    assert entries.get("a") == 1
+    clock.now += 1
+    assert entries.get("a", "missing") == "missing"
+    assert entries.stats()["expirations"] == 1
+
+
+def test_invalidate_drops_every_entry_with_the_tag(clock):
+    entries = TTLCache()
+    entries.set("public:s1", {"title": "a"}, tags=("w1", None))
+    entries.set("user:u1", {"title": "a"}, tags=("w1", "u1"))
+    entries.set("public:s2", {"title": "b"}, tags=("w2",))
+
+    entries.invalidate("w1")
+    assert len(entries) == 1
+    assert entries.get("public:s2") == {"title": "b"}
+    # The other tags of a dropped entry no longer reference it
+    entries.invalidate("u1")
+    assert entries.stats()["invalidations"] == 2
+
+
+def test_sliding_entries_live_while_they_are_used(clock):
+    sessions = TTLCache(ttl=60, sliding=True)
+    sessions.set("s1", "alice")
+    for _ in range(3):
+        clock.now += 50
+        assert sessions.get("s1") == "alice"
+    clock.now += 61
+    assert sessions.get("s1") is None
+
+
+def test_sweep_removes_expired_entries(clock):
+    sessions = TTLCache(ttl=60, sliding=True)
+    sessions.set("idle", 1)
+    sessions.set("active", 2)
+    clock.now += 30
+    sessions.get("active")
+    clock.now += 40
+
+    assert sessions.sweep() == 1
+    assert sessions.get("idle") is None
+    assert sessions.get("active") == 2
+    assert sessions.stats()["expirations"] == 1
+
+
+def test_sweep_is_not_fooled_by_lru_order(clock):
+    entries = TTLCache(ttl=60)
+    entries.set("old", 1)
+    clock.now += 30
+    entries.set("new", 2)
+    # A hit moves "old" behind "new" in LRU order without extending it
+    entries.get("old")
+    clock.now += 40
+
+    assert entries.sweep() == 1
+    assert entries.get("new") == 2
+
+
+def test_sweep_keeps_sliding_entries_extended_since_they_were_queued(clock):
+    sessions = TTLCache(ttl=60, sliding=True)
+    sessions.set("active", 1)
+    sessions.set("idle", 2)
+    clock.now += 50
+    sessions.get("active")
+    clock.now += 20
+
+    # "active" is due in the heap at 60s but was extended to 110s
+    assert sessions.sweep() == 1
+    assert sessions.get("active") == 1
+    clock.now += 1000
+    assert sessions.sweep() == 1
+
+
+def test_expiry_heap_stays_bounded_under_rewrites(clock):
+    entries = TTLCache(ttl=60)
+    for i in range(1000):
+        entries.set("key", i)
+    assert len(entries._expiries) <= 2 * len(entries) + 64
+    clock.now += 61
+    assert entries.sweep() == 1
+    assert len(entries) == 0
@@ -0,0 +1,139 @@
+"""
+Tests for the per-wedding contribution totals (utils/contribution_totals.py)
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from utils.contribution_totals import COMPLETED, complete_contribution, get_totals, rebuild_totals
+
+
+class Cursor:
+    def __init__(self, rows):
+        self.rows = iter(rows)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        try:
+            return next(self.rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeContributions:
+    def __init__(self, *documents):
+        self.documents = [dict(document) for document in documents]
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        await asyncio.sleep(0)
+        for document in self.documents:
+            if document["id"] == query["id"] and document["payment_status"] != query["payment_status"]["$ne"]:
+                document.update(update["$set"])
+                return dict(document)
+        return None
+
+    def aggregate(self, pipeline, **options):
+        match = pipeline[0]["$match"]
+        groups = {}
+        for document in self.documents:
+            if all(document.get(field) == value for field, value in match.items()):
+                group = groups.setdefault(document["wedding_id"], {
+                    "_id": document["wedding_id"], "total_amount": 0, "count": 0,
+                    "currency": document.get("currency"),
+                })
+                group["total_amount"] += document["amount"]
+                group["count"] += 1
+        return Cursor(groups.values())
+
+
+class FakeTotals:
+    def __init__(self):
+        self.documents = {}
+
+    async def find_one(self, query, projection=None):
+        document = self.documents.get(query["wedding_id"])
+        return dict(document) if document else None
+
+    async def update_one(self, query, update, upsert=False):
+        document = self.documents.get(query["wedding_id"])
+        if document is None:
+            if not upsert:
+                return SimpleNamespace(matched_count=0)
+            document = self.documents[query["wedding_id"]] = {**query, **update.get("$setOnInsert", {})}
+        for field, amount in update["$inc"].items():
+            document[field] = document.get(field, 0) + amount
+        document.update(update.get("$set", {}))
+        return SimpleNamespace(matched_count=1)
+
+    async def replace_one(self, query, document, upsert=False):
+        self.documents[query["wedding_id"]] = dict(document)
+
+    async def delete_many(self, query):
+        for wedding_id in list(self.documents):
+            if wedding_id not in query["wedding_id"]["$nin"]:
+                del self.documents[wedding_id]
+
+
+def make_database():
+    return SimpleNamespace(
+        contributions=FakeContributions(
+            {"id": "c1", "wedding_id": "w1", "amount": 100.5, "currency": "inr", "payment_status": "pending"},
+            {"id": "c2", "wedding_id": "w1", "amount": 50.25, "currency": "inr", "payment_status": "pending"},
+            {"id": "c3", "wedding_id": "w2", "amount": 10, "currency": "inr", "payment_status": COMPLETED},
+        ),
+        contribution_totals=FakeTotals(),
+    )
+
+
+def test_a_contribution_is_counted_once_even_if_completed_twice():
+    database = make_database()
+
+    async def scenario():
+        # First completion creates the document with an upsert
+        assert await complete_contribution(database, {"id": "c1"}) is not None
+        assert await complete_contribution(database, {"id": "c2"}, {"stripe_payment_intent_id": "pi_2"}) is not None
+        # The webhook and the client confirm racing on the same contribution
+        assert await complete_contribution(database, {"id": "c2"}) is None
+        return await get_totals(database, "w1")
+
+    totals = asyncio.run(scenario())
+    assert totals["total_amount"] == 150.75
+    assert totals["count"] == 2
+
+
+def test_concurrent_first_contributions_are_both_counted():
+    database = make_database()
+
+    async def scenario():
+        await asyncio.gather(
+            complete_contribution(database, {"id": "c1"}),
+            complete_contribution(database, {"id": "c2"}),
+        )
+        return await get_totals(database, "w1")
+
+    totals = asyncio.run(scenario())
+    assert (totals["total_amount"], totals["count"], totals["currency"]) == (150.75, 2, "inr")
+
+
+def test_missing_totals_read_as_empty_until_rebuilt():
+    database = make_database()
+    assert asyncio.run(get_totals(database, "w2"))["count"] == 0
+    assert database.contribution_totals.documents == {}
+
+    asyncio.run(rebuild_totals(database, "w2"))
+    totals = asyncio.run(get_totals(database, "w2"))
+    assert (totals["total_amount"], totals["count"], totals["currency"]) == (10, 1, "inr")
+
+
+def test_rebuild_drops_weddings_without_completed_contributions():
+    database = make_database()
+    database.contribution_totals.documents["gone"] = {"wedding_id": "gone", "total_amount": 5, "count": 1}
+
+    assert asyncio.run(rebuild_totals(database)) == 1
+    assert list(database.contribution_totals.documents) == ["w2"]
@@ -0,0 +1,62 @@
+"""
+Tests for the externalize-media maintenance command (manage.py)
+"""
+import asyncio
+import base64
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("typer")
+pytest.importorskip("motor")
+
+import manage
+from utils.media_store import MediaStore
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+DATA_URL = f"data:image/png;base64,{base64.b64encode(PNG).decode()}"
+
+
+class FakeWeddings:
+    def __init__(self, *weddings, edited_meanwhile=()):
+        self.weddings = {wedding["id"]: dict(wedding) for wedding in weddings}
+        self.edited_meanwhile = set(edited_meanwhile)
+
+    async def _iterate(self):
+        for wedding in list(self.weddings.values()):
+            read = dict(wedding)
+            if wedding["id"] in self.edited_meanwhile:
+                wedding["version"] += 1
+            yield read
+
+    def find(self, query, projection):
+        return self._iterate()
+
+    async def update_one(self, query, update):
+        wedding = self.weddings[query["id"]]
+        if wedding.get("version") != query["version"]:
+            return SimpleNamespace(modified_count=0)
+        wedding.update(update["$set"])
+        wedding["version"] = wedding.get("version", 0) + update["$inc"]["version"]
+        return SimpleNamespace(modified_count=1)
+
+
+def test_externalized_weddings_get_a_new_version_and_updated_at(tmp_path):
+    weddings = FakeWeddings(
+        {"id": "w1", "version": 3, "updated_at": "2024-01-01T00:00:00", "couple_photo": DATA_URL},
+        {"id": "w2", "version": 1, "updated_at": "2024-01-01T00:00:00", "couple_photo": "/api/media/x.png"},
+    )
+    store = MediaStore(tmp_path)
+
+    assert asyncio.run(manage.externalize_wedding_media(SimpleNamespace(weddings=weddings), store)) == (2, 1)
+    w1, w2 = weddings.weddings["w1"], weddings.weddings["w2"]
+    assert w1["couple_photo"].startswith("/api/media/")
+    assert w1["version"] == 4 and w1["updated_at"] > "2024-01-01T00:00:00"
+    assert (w2["version"], w2["updated_at"]) == (1, "2024-01-01T00:00:00")
+
+
+def test_an_edit_saved_during_the_run_is_not_overwritten(tmp_path):
+    weddings = FakeWeddings({"id": "w1", "version": 3, "couple_photo": DATA_URL}, edited_meanwhile=["w1"])
+
+    assert asyncio.run(manage.externalize_wedding_media(SimpleNamespace(weddings=weddings), MediaStore(tmp_path))) == (1, 0)
+    assert weddings.weddings["w1"]["couple_photo"] == DATA_URL
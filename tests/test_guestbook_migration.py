@@ -0,0 +1,108 @@
+"""
+Tests for moving embedded guestbook messages into the guestbook collection (server.py)
+"""
+import asyncio
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("fastapi", "motor", "stripe", "python_multipart"):
+    pytest.importorskip(module)
+
+import server
+from utils.persistence import PersistenceExecutor
+from utils.shard_store import ShardedJsonStore
+
+EMBEDDED = [
+    {"name": "Ana", "message": "Congrats!", "created_at": "2024-01-01T10:00:00"},
+    {"id": "m2", "name": "Ben", "message": "Cheers", "created_at": "2024-01-02T10:00:00", "is_public": False},
+]
+
+
+class FakeGuestbook:
+    def __init__(self, fail_after=None):
+        self.documents = {}
+        self.fail_after = fail_after
+
+    async def update_one(self, query, update, upsert=False):
+        if self.fail_after is not None and len(self.documents) >= self.fail_after:
+            raise RuntimeError("connection reset")
+        self.documents.setdefault(query["id"], update["$setOnInsert"])
+
+
+class FakeWeddings:
+    def __init__(self, document):
+        self.document = document
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        if self.document.get("guestbook_messages") != query["guestbook_messages"]:
+            return None
+        for field in update["$unset"]:
+            self.document.pop(field, None)
+        self.document.update(update["$set"])
+        self.document["version"] = self.document.get("version", 0) + update["$inc"]["version"]
+        return {k: v for k, v in self.document.items() if k != "_id"}
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    wedding = {
+        "_id": "oid", "id": "w1", "user_id": "u1", "version": 2,
+        "updated_at": "2024-01-01T00:00:00", "guestbook_messages": copy.deepcopy(EMBEDDED),
+    }
+    database = SimpleNamespace(guestbook=FakeGuestbook(), weddings=FakeWeddings(wedding))
+    monkeypatch.setattr(server, "database", database)
+    monkeypatch.setattr(server, "weddings_backup", ShardedJsonStore(tmp_path, executor=PersistenceExecutor()))
+    monkeypatch.setattr(server, "guestbook_migrated", server.TTLCache(maxsize=2))
+    return database
+
+
+def migrate(database):
+    snapshot = copy.deepcopy(database.weddings.document)
+    return asyncio.run(server.migrate_embedded_guestbook(snapshot))
+
+
+def test_messages_are_copied_then_unset_with_a_new_version(env):
+    assert migrate(env) == 2
+    assert {doc["name"] for doc in env.guestbook.documents.values()} == {"Ana", "Ben"}
+    assert all(doc["wedding_id"] == "w1" for doc in env.guestbook.documents.values())
+    assert env.guestbook.documents["m2"]["is_public"] is False
+
+    wedding = env.weddings.document
+    assert "guestbook_messages" not in wedding
+    assert wedding["version"] == 3
+    assert wedding["updated_at"] > "2024-01-01T00:00:00"
+    assert server.guestbook_migrated.get("w1")
+    backup = asyncio.run(server.weddings_backup.get("w1"))
+    assert "guestbook_messages" not in backup and backup["version"] == 3
+
+
+def test_a_failed_copy_leaves_the_embedded_messages_in_place(env):
+    env.guestbook.fail_after = 1
+    with pytest.raises(RuntimeError):
+        migrate(env)
+    assert env.weddings.document["guestbook_messages"] == EMBEDDED
+    assert env.weddings.document["version"] == 2
+
+
+def test_retried_migration_keeps_message_ids(env):
+    env.guestbook.fail_after = 1
+    with pytest.raises(RuntimeError):
+        migrate(env)
+    first_ids = set(env.guestbook.documents)
+
+    env.guestbook.fail_after = None
+    migrate(env)
+    assert first_ids <= set(env.guestbook.documents)
+    assert len(env.guestbook.documents) == 2
+
+
+def test_migrated_weddings_are_remembered_in_a_bounded_cache(env):
+    for wedding_id in ("w1", "w2", "w3"):
+        server.guestbook_migrated.set(wedding_id, True)
+    assert len(server.guestbook_migrated) == 2
+
+
+def test_guestbook_messages_cannot_be_written_back():
+    assert "guestbook_messages" in server.PATCH_PROTECTED_FIELDS
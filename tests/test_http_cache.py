@@ -0,0 +1,43 @@
+"""
+Tests for the ETag helpers (utils/http_cache.py)
+"""
+import pytest
+
+pytest.importorskip("fastapi")
+
+from utils.http_cache import content_etag, etag_matches, not_modified, wedding_etag
+
+
+def test_wedding_etag_follows_updated_at():
+    wedding = {"id": "w1", "updated_at": "2024-01-01T00:00:00"}
+    etag = wedding_etag("public", wedding)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert wedding_etag("public", dict(wedding)) == etag
+    assert wedding_etag("owner", wedding) != etag
+    assert wedding_etag("public", {**wedding, "updated_at": "2024-01-02T00:00:00"}) != etag
+    assert wedding_etag("public", {"id": "w1"}) is None
+
+
+def test_content_etag_ignores_key_order():
+    assert content_etag("guestbook", {"a": 1, "b": 2}) == content_etag("guestbook", {"b": 2, "a": 1})
+    assert content_etag("guestbook", {"a": 1}) != content_etag("guestbook", {"a": 2})
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", "abc"', True),
+    ('"xyz"', False),
+    ("abc", False),
+])
+def test_if_none_match_uses_weak_comparison(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+def test_not_modified_response_carries_the_etag():
+    response = not_modified('"abc"')
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"abc"'
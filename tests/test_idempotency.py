@@ -0,0 +1,62 @@
+"""
+Tests for idempotency keys on retried POSTs (utils/idempotency.py)
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from pymongo.errors import DuplicateKeyError
+from utils.idempotency import MAX_KEY_LENGTH, get_stored_response, idempotency_key, store_response
+
+
+class FakeKeys:
+    def __init__(self):
+        self.documents = {}
+
+    async def insert_one(self, document):
+        if document["key"] in self.documents:
+            raise DuplicateKeyError("E11000 duplicate key")
+        self.documents[document["key"]] = document
+
+    async def find_one(self, query, projection):
+        return self.documents.get(query["key"])
+
+
+def test_header_wins_over_body_field():
+    assert idempotency_key("header-key", {"idempotency_key": "body-key"}) == "header-key"
+    assert idempotency_key(None, {"idempotency_key": " body-key "}) == "body-key"
+    assert idempotency_key(None, {"idempotency_key": 42}) is None
+    assert idempotency_key("   ", {}) is None
+    assert len(idempotency_key("k" * 1000, {})) == MAX_KEY_LENGTH
+
+
+def test_first_stored_response_is_replayed():
+    database = SimpleNamespace(idempotency_keys=FakeKeys())
+
+    async def scenario():
+        first = await store_response(database, "rsvp", "k1", {"id": "r1"})
+        # A concurrent retry that raced past the lookup
+        second = await store_response(database, "rsvp", "k1", {"id": "r2"})
+        return first, second, await get_stored_response(database, "rsvp", "k1")
+
+    first, second, stored = asyncio.run(scenario())
+    assert first == second == stored == {"id": "r1"}
+
+
+def test_keys_are_scoped_and_optional():
+    database = SimpleNamespace(idempotency_keys=FakeKeys())
+
+    async def scenario():
+        await store_response(database, "rsvp", "k1", {"id": "r1"})
+        return (
+            await get_stored_response(database, "guestbook", "k1"),
+            await store_response(database, "rsvp", None, {"id": "r3"}),
+        )
+
+    other_scope, unkeyed = asyncio.run(scenario())
+    assert other_scope is None
+    assert unkeyed == {"id": "r3"}
+    assert list(database.idempotency_keys.documents) == ["rsvp:k1"]
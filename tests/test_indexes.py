@@ -0,0 +1,119 @@
+"""
+Tests for startup index provisioning (config/indexes.py)
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from config.indexes import INDEX_SPECS, ensure_indexes
+
+
+class FakeCollection:
+    def __init__(self, existing=None):
+        self.existing = dict(existing or {"_id_": {"key": [("_id", 1)]}})
+        self.created = []
+
+    async def index_information(self):
+        return dict(self.existing)
+
+    async def create_index(self, keys, **options):
+        self.created.append(options["name"])
+        self.existing[options["name"]] = {"key": keys, **options}
+
+
+class FakeAdmin:
+    async def command(self, *args, **kwargs):
+        return {"inprog": []}
+
+
+class FakeClient:
+    admin = FakeAdmin()
+
+
+class FakeDatabase:
+    name = "test"
+    client = FakeClient()
+
+    def __init__(self, collections=None):
+        self.collections = collections or {}
+        self.commands = []
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    async def command(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+
+def test_index_names_are_unique_per_collection():
+    for collection, specs in INDEX_SPECS.items():
+        names = [spec["name"] for spec in specs]
+        assert len(names) == len(set(names)), collection
+
+
+def test_missing_indexes_are_created_and_existing_ones_kept():
+    database = FakeDatabase()
+    report = asyncio.run(ensure_indexes(database))
+    assert report["status"] == "ok"
+    for collection, specs in INDEX_SPECS.items():
+        assert report["collections"][collection]["created"] == [spec["name"] for spec in specs]
+
+    report = asyncio.run(ensure_indexes(database))
+    assert all(not result["created"] for result in report["collections"].values())
+    assert report["collections"]["users"]["existing"] == ["id_unique", "username_unique"]
+
+
+def test_ttl_drift_is_fixed_in_place():
+    spec = next(spec for spec in INDEX_SPECS["stripe_events"] if spec["name"] == "received_at_ttl")
+    events = FakeCollection({"old_name": {"key": spec["keys"], "expireAfterSeconds": 60}})
+    database = FakeDatabase({"stripe_events": events})
+
+    report = asyncio.run(ensure_indexes(database))
+    assert report["collections"]["stripe_events"]["updated"] == ["old_name"]
+    assert "received_at_ttl" not in events.created
+    (args, kwargs), = database.commands
+    assert args == ("collMod", "stripe_events")
+    assert kwargs["index"] == {"name": "old_name", "expireAfterSeconds": spec["expireAfterSeconds"]}
+
+
+def test_cli_commands_do_not_start_index_builds(monkeypatch):
+    pytest.importorskip("typer")
+    import manage
+    from config import database as db
+
+    class FakeMongoClient:
+        def __init__(self, url):
+            self.database = FakeDatabase()
+
+        def __getitem__(self, name):
+            return self.database
+
+        def close(self):
+            pass
+
+    async def ping(*args, **kwargs):
+        return {"ok": 1}
+
+    monkeypatch.setattr(db, "AsyncIOMotorClient", FakeMongoClient)
+    monkeypatch.setattr(FakeDatabase, "command", ping)
+
+    async def command(database):
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    assert manage.run(command) == set()
+
+
+def test_ensure_indexes_command_builds_and_reports(monkeypatch):
+    pytest.importorskip("typer")
+    import manage
+    from typer.testing import CliRunner
+
+    database = FakeDatabase()
+    monkeypatch.setattr(manage, "run", lambda command: asyncio.run(command(database)))
+
+    result = CliRunner().invoke(manage.app, ["ensure-indexes"])
+    assert result.exit_code == 0
+    assert "Index provisioning finished (ok)" in result.output
+    assert "rsvps" in database.collections
@@ -0,0 +1,64 @@
+"""
+Tests for the JSON-patch operations behind PATCH /api/wedding (utils/json_patch.py)
+"""
+import pytest
+
+from utils.json_patch import PatchError, apply_operations, parse_pointer, touched_fields
+
+DOC = {
+    "couple_name_1": "Sarah",
+    "story_timeline": [{"title": "met"}, {"title": "engaged"}],
+    "theme": {"colors": {"primary": "#fff"}},
+}
+
+
+def test_pointer_tokens_are_unescaped():
+    assert parse_pointer("/a~1b/c~0d/0") == ["a/b", "c~d", "0"]
+
+
+def test_operations_apply_to_a_copy():
+    result = apply_operations(DOC, [
+        {"op": "replace", "path": "/couple_name_1", "value": "Sara"},
+        {"op": "add", "path": "/story_timeline/-", "value": {"title": "married"}},
+        {"op": "move", "from": "/story_timeline/2", "path": "/story_timeline/0"},
+        {"op": "remove", "path": "/theme/colors/primary"},
+    ])
+    assert result["couple_name_1"] == "Sara"
+    assert [item["title"] for item in result["story_timeline"]] == ["married", "met", "engaged"]
+    assert result["theme"] == {"colors": {}}
+    assert DOC["couple_name_1"] == "Sarah" and len(DOC["story_timeline"]) == 2
+
+
+@pytest.mark.parametrize("operation", [
+    {"op": "copy", "from": "/a", "path": "/b"},
+    {"op": "add", "path": "/couple_name_2"},
+    {"op": "replace", "path": "/missing", "value": 1},
+    {"op": "remove", "path": "/story_timeline/5"},
+    {"op": "add", "path": "/story_timeline/x", "value": {}},
+    {"op": "move", "from": "/theme", "path": "/theme/colors"},
+])
+def test_invalid_operations_are_rejected(operation):
+    with pytest.raises(PatchError):
+        apply_operations(DOC, [operation])
+
+
+def test_touched_fields_include_move_sources():
+    assert touched_fields([
+        {"op": "move", "from": "/story_timeline/0", "path": "/theme/story"},
+        {"op": "remove", "path": "/couple_name_1"},
+    ]) == {"story_timeline", "theme", "couple_name_1"}
+
+
+@pytest.mark.parametrize("path", [
+    None,
+    "",
+    "couple_name_1",
+    "/",
+    "/a//b",
+    "/story_timeline/",
+    "/theme.colors",
+    "/$set",
+])
+def test_paths_that_cannot_be_written_are_rejected(path):
+    with pytest.raises(PatchError):
+        touched_fields([{"op": "remove", "path": path}])
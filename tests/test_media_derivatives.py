@@ -0,0 +1,75 @@
+"""
+Tests for resized WebP derivatives (utils/media_derivatives.py)
+"""
+import asyncio
+import io
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from utils.media_derivatives import DERIVATIVES, DerivativePipeline, derivative_id, parse_derivative_id
+from utils.media_store import MediaStore
+
+
+def store_image(store, size=(3000, 1500), fmt="JPEG"):
+    out = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 90)).save(out, fmt)
+    media_id, _ = store.put_bytes(out.getvalue())
+    return media_id
+
+
+def test_derivative_ids_round_trip():
+    digest = "a" * 64
+    assert derivative_id(f"{digest}.jpg", "thumb") == f"{digest}-thumb.webp"
+    assert parse_derivative_id(f"{digest}-thumb.webp") == (digest, "thumb")
+    assert parse_derivative_id(f"{digest}-huge.webp") is None
+    assert parse_derivative_id(f"{digest}.jpg") is None
+
+
+def test_variants_are_advertised_for_stored_originals_only(tmp_path):
+    store = MediaStore(tmp_path)
+    pipeline = DerivativePipeline(store)
+    media_id = store_image(store)
+    url = store.url(media_id)
+
+    found = pipeline.variant_map({"cover": url, "gallery": [url, "https://example.com/a.jpg"]})
+    assert list(found) == [url]
+    assert set(found[url]) == set(DERIVATIVES)
+    assert pipeline.variants(derivative_id(media_id, "thumb")) == {}
+    assert pipeline.variants("b" * 64 + ".gif") == {}
+    assert pipeline.source_of(derivative_id(media_id, "medium")) == media_id
+
+
+def test_ensure_renders_each_size_without_upscaling(tmp_path):
+    store = MediaStore(tmp_path)
+    pipeline = DerivativePipeline(store, max_workers=1)
+    media_id = store_image(store)
+
+    try:
+        assert asyncio.run(pipeline.ensure(media_id))
+        # Already rendered: no second round trip to the pool
+        assert asyncio.run(pipeline.ensure(media_id))
+    finally:
+        pipeline.close()
+
+    sizes = {}
+    for name in DERIVATIVES:
+        with Image.open(store.path(derivative_id(media_id, name))) as image:
+            assert image.format == "WEBP"
+            sizes[name] = image.size
+    assert sizes == {"thumb": (320, 160), "medium": (1024, 512), "large": (2048, 1024)}
+    assert pipeline.stats()["generated"] == 3
+
+
+def test_unreadable_source_is_counted_as_a_failure(tmp_path):
+    store = MediaStore(tmp_path)
+    pipeline = DerivativePipeline(store, max_workers=1)
+    # Valid PNG signature, truncated image data
+    media_id, _ = store.put_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 64)
+
+    try:
+        assert not asyncio.run(pipeline.ensure(media_id))
+    finally:
+        pipeline.close()
+    assert pipeline.stats()["failed"] == 1
@@ -0,0 +1,61 @@
+"""
+Tests for the content-addressed image store (utils/media_store.py)
+"""
+import asyncio
+import base64
+import hashlib
+
+import pytest
+
+from utils.media_store import MediaError, MediaStore, MediaTooLarge, is_data_url
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+def data_url(data, mime="image/png"):
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+
+
+def test_identical_images_are_stored_once(tmp_path):
+    store = MediaStore(tmp_path)
+    media_id, created = store.put_bytes(PNG)
+    assert media_id == hashlib.sha256(PNG).hexdigest() + ".png"
+    assert created
+    assert store.put_bytes(PNG) == (media_id, False)
+    assert store.path(media_id).read_bytes() == PNG
+    assert store.stats()["deduplicated"] == 1
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_type_comes_from_the_bytes_not_the_declared_mime(tmp_path):
+    store = MediaStore(tmp_path)
+    media_id, _ = store.put_data_url(data_url(PNG, mime="image/jpeg"))
+    assert media_id.endswith(".png")
+    with pytest.raises(MediaError):
+        store.put_data_url(data_url(b"<svg onload=alert(1)>", mime="image/png"))
+    with pytest.raises(MediaError):
+        store.put_data_url("data:image/png;base64,!!!")
+
+
+def test_oversized_images_are_rejected_before_decoding(tmp_path):
+    store = MediaStore(tmp_path, max_bytes=16)
+    with pytest.raises(MediaTooLarge):
+        store.put_data_url(data_url(PNG))
+    assert not any(tmp_path.iterdir())
+
+
+def test_externalize_replaces_nested_data_urls(tmp_path):
+    store = MediaStore(tmp_path)
+    stored = []
+    value = {"cover": data_url(PNG), "gallery": [{"url": data_url(PNG)}, "https://example.com/a.jpg"], "n": 1}
+
+    result = asyncio.run(store.externalize(value, stored))
+    url = store.url(stored[0])
+    assert result == {"cover": url, "gallery": [{"url": url}, "https://example.com/a.jpg"], "n": 1}
+    assert stored == [stored[0]] * 2
+    assert not is_data_url(result["cover"])
+
+
+@pytest.mark.parametrize("media_id", ["../../etc/passwd", "abc.png", "a" * 64 + ".svg", "A" * 64 + ".png"])
+def test_malformed_ids_have_no_path(tmp_path, media_id):
+    assert MediaStore(tmp_path).path(media_id) is None
@@ -0,0 +1,18 @@
+"""
+Tests for the latency histogram (utils/metrics.py)
+"""
+from utils.metrics import LatencyHistogram
+
+
+def test_histogram_percentiles_use_bucket_upper_bounds():
+    histogram = LatencyHistogram(buckets_ms=(10, 100))
+    for seconds in (0.001, 0.002, 0.05, 0.5):
+        histogram.observe(seconds)
+    histogram.observe(0.003, error=True)
+
+    stats = histogram.stats()
+    assert stats["count"] == 5 and stats["errors"] == 1
+    assert stats["p50_ms"] == 10
+    assert stats["p95_ms"] == stats["max_ms"] == 500.0
+    assert stats["buckets_ms"] == {"le_10": 3, "le_100": 1, "overflow": 1}
+    assert LatencyHistogram().percentile(0.5) is None
@@ -0,0 +1,27 @@
+"""
+Tests for access to GET /api/metrics in server.py
+"""
+import pytest
+
+for module in ("fastapi", "httpx", "motor", "stripe", "python_multipart"):
+    pytest.importorskip(module)
+
+import server
+from fastapi.testclient import TestClient
+
+
+def test_metrics_are_hidden_without_a_configured_token(monkeypatch):
+    monkeypatch.setattr(server, "METRICS_TOKEN", None)
+    response = TestClient(server.app).get("/api/metrics", headers={"X-Metrics-Token": "anything"})
+    assert response.status_code == 404
+
+
+def test_metrics_require_the_token(monkeypatch):
+    monkeypatch.setattr(server, "METRICS_TOKEN", "s3cret")
+    client = TestClient(server.app)
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"X-Metrics-Token": "wrong"}).status_code == 401
+
+    response = client.get("/api/metrics", headers={"X-Metrics-Token": "s3cret"})
+    assert response.status_code == 200
+    assert "persistence" in response.json()
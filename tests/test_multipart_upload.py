@@ -0,0 +1,81 @@
+"""
+Tests for streaming multipart image uploads (utils/multipart_upload.py)
+"""
+import asyncio
+import hashlib
+
+import pytest
+
+pytest.importorskip("python_multipart")
+
+from utils.media_store import MediaError, MediaStore, MediaTooLarge
+from utils.multipart_upload import MultipartImageUpload
+
+BOUNDARY = "----formboundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+
+
+def part(name, data, filename=None):
+    disposition = f'form-data; name="{name}"'
+    if filename:
+        disposition += f'; filename="{filename}"'
+    return f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+
+
+def body(*parts):
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def chunked(data, size=1000):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def receive(store, data, **options):
+    upload = MultipartImageUpload(store, CONTENT_TYPE, **options)
+    return upload, asyncio.run(upload.receive(chunked(data)))
+
+
+def leftovers(root):
+    return list(root.rglob("*.tmp"))
+
+
+def test_files_are_streamed_into_the_store(tmp_path):
+    store = MediaStore(tmp_path)
+    _, files = receive(store, body(
+        part("session_id", b"abc"),
+        part("files", PNG, filename="one.png"),
+        part("files", PNG, filename="copy.png"),
+    ))
+    media_id = hashlib.sha256(PNG).hexdigest() + ".png"
+    assert [(f["filename"], f["id"], f["size"], f["deduplicated"]) for f in files] == [
+        ("one.png", media_id, len(PNG), False),
+        ("copy.png", media_id, len(PNG), True),
+    ]
+    assert store.path(media_id).read_bytes() == PNG
+    assert not leftovers(tmp_path)
+
+
+@pytest.mark.parametrize("data, options, error", [
+    (body(part("files", b"not an image", filename="x.txt")), {}, MediaError),
+    (body(part("files", PNG, filename="a.png"), part("files", PNG, filename="b.png")), {"max_files": 1}, MediaError),
+    (body(part("files", PNG, filename="a.png")), {"max_total_bytes": 1000}, MediaTooLarge),
+    (body(part("files", PNG, filename="a.png"))[:5000], {}, MediaError),
+    (body(part("note", b"x" * 2000)), {}, MediaError),
+])
+def test_rejected_uploads_leave_no_temporary_files(tmp_path, data, options, error):
+    with pytest.raises(error):
+        receive(MediaStore(tmp_path), data, **options)
+    assert not leftovers(tmp_path)
+
+
+def test_oversized_file_is_rejected(tmp_path):
+    with pytest.raises(MediaTooLarge):
+        receive(MediaStore(tmp_path, max_bytes=1024), body(part("files", PNG, filename="a.png")))
+    assert not leftovers(tmp_path)
+
+
+def test_non_multipart_body_is_rejected(tmp_path):
+    with pytest.raises(MediaError):
+        MultipartImageUpload(MediaStore(tmp_path), "application/json")
@@ -0,0 +1,95 @@
+"""
+Tests for keyset pagination (utils/pagination.py)
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+from utils.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, fetch_page, page_size
+
+
+def matches(row, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(row, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not row[field] < condition["$lt"]:
+                return False
+        elif row.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.rows.sort(key=lambda row: row[field], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.rows = self.rows[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.rows[:length]
+
+
+class FakeCollection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def find(self, query, projection):
+        return FakeCursor([dict(row) for row in self.rows if matches(row, query)])
+
+    async def count_documents(self, query):
+        return sum(matches(row, query) for row in self.rows)
+
+
+def test_cursor_round_trips():
+    cursor = encode_cursor("2024-05-01T10:00:00", "abc")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2024-05-01T10:00:00", "abc")
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor("x", "y")[:-3], "W10"])
+def test_malformed_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+def test_page_size_is_clamped():
+    assert page_size(10_000) == MAX_PAGE_SIZE
+    with pytest.raises(HTTPException):
+        page_size(0)
+
+
+def test_pages_cover_every_row_once_despite_equal_timestamps():
+    rows = [
+        {"id": f"m{i:02d}", "wedding_id": "w1", "created_at": f"2024-05-0{i // 4 + 1}"}
+        for i in range(10)
+    ]
+    rows.append({"id": "other", "wedding_id": "w2", "created_at": "2024-05-09"})
+    collection = FakeCollection(rows)
+
+    async def read_all():
+        seen, cursor = [], None
+        while True:
+            page = await fetch_page(collection, {"wedding_id": "w1"}, "created_at", limit=3, cursor=cursor)
+            assert page["total_count"] == 10
+            seen.extend(item["id"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return seen
+
+    seen = asyncio.run(read_all())
+    expected = sorted((row for row in rows if row["wedding_id"] == "w1"),
+                      key=lambda row: (row["created_at"], row["id"]), reverse=True)
+    assert seen == [row["id"] for row in expected]
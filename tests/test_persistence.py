@@ -0,0 +1,98 @@
+"""
+Tests for the backup persistence executor (utils/persistence.py)
+"""
+import asyncio
+
+import pytest
+
+from utils.persistence import PersistenceExecutor
+
+
+class RecordingJournal:
+    """Minimal journal: records what the executor asks it to write"""
+
+    def __init__(self, fail_writes: int = 0, fail_compaction: bool = False):
+        self.fail_writes = fail_writes
+        self.fail_compaction = fail_compaction
+        self.batches = []
+
+    def encode_records(self, keys):
+        return list(keys)
+
+    def write_lines(self, lines):
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise OSError("disk full")
+        self.batches.append(lines)
+
+    def should_compact(self):
+        return self.fail_compaction
+
+    async def compact(self):
+        raise OSError("disk full")
+
+
+def test_repeated_edits_of_one_record_are_written_once():
+    async def scenario():
+        executor = PersistenceExecutor()
+        journal = RecordingJournal()
+        for _ in range(5):
+            await executor.submit(journal, "w1")
+        await executor.submit(journal, "w2")
+        await executor.flush()
+        return executor, journal
+
+    executor, journal = asyncio.run(scenario())
+    assert journal.batches == [["w1", "w2"]]
+    stats = executor.stats()
+    assert stats["coalesced"] == 4
+    assert stats["records_written"] == 2
+
+
+def test_full_queue_waits_for_a_flush():
+    async def scenario():
+        executor = PersistenceExecutor(max_pending=2, flush_interval=0)
+        journal = RecordingJournal()
+        await executor.start()
+        for key in ("a", "b", "c", "d"):
+            await executor.submit(journal, key)
+        await executor.close()
+        return executor, journal
+
+    executor, journal = asyncio.run(scenario())
+    assert sorted(key for batch in journal.batches for key in batch) == ["a", "b", "c", "d"]
+    assert executor.stats()["backpressure_waits"] >= 1
+
+
+def test_failed_write_is_requeued():
+    async def scenario():
+        executor = PersistenceExecutor()
+        journal = RecordingJournal(fail_writes=1)
+        await executor.submit(journal, "w1")
+        with pytest.raises(OSError):
+            await executor.flush()
+        queued = executor.stats()["queue_depth"]
+        await executor.flush()
+        return queued, journal
+
+    queued, journal = asyncio.run(scenario())
+    assert queued == 1
+    assert journal.batches == [["w1"]]
+
+
+def test_failed_compaction_does_not_drop_other_journals():
+    async def scenario():
+        executor = PersistenceExecutor()
+        users = RecordingJournal(fail_compaction=True)
+        weddings = RecordingJournal()
+        await executor.submit(users, "u1")
+        await executor.submit(weddings, "w1")
+        await executor.flush()
+        return executor, users, weddings
+
+    executor, users, weddings = asyncio.run(scenario())
+    assert users.batches == [["u1"]]
+    assert weddings.batches == [["w1"]]
+    stats = executor.stats()
+    assert stats["compaction_errors"] == 1
+    assert stats["queue_depth"] == 0
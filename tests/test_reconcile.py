@@ -0,0 +1,150 @@
+"""
+Tests for the pending contribution reconciliation job (utils/reconcile.py)
+"""
+import asyncio
+import calendar
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from utils.reconcile import reconcile_pending
+
+
+class FakeGateway:
+    """Serves a fixed list of PaymentIntents in pages, like PaymentIntent.list"""
+
+    def __init__(self, intents):
+        self.intents = intents
+        self.calls = []
+
+    async def list_payment_intents(self, limit, created, starting_after=None):
+        self.calls.append({"limit": limit, "created": created, "starting_after": starting_after})
+        start = 0
+        if starting_after:
+            start = [intent["id"] for intent in self.intents].index(starting_after) + 1
+        page = self.intents[start:start + limit]
+        return {"data": page, "has_more": start + limit < len(self.intents)}
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def to_list(self, length):
+        return self.rows
+
+
+class FakeContributions:
+    def __init__(self, rows, settled_elsewhere=()):
+        self.rows = rows
+        # Intents a webhook completes between the page lookup and our update
+        self.settled_elsewhere = set(settled_elsewhere)
+
+    def row(self, intent_id):
+        return next(row for row in self.rows if row["stripe_payment_intent_id"] == intent_id)
+
+    async def find_one(self, query, projection, sort):
+        pending = [row for row in self.rows if row["payment_status"] == "pending"]
+        return min(pending, key=lambda row: row["created_at"]) if pending else None
+
+    def find(self, query, projection):
+        wanted = query["stripe_payment_intent_id"]["$in"]
+        found = [
+            dict(row) for row in self.rows
+            if row["payment_status"] == "pending" and row["stripe_payment_intent_id"] in wanted
+        ]
+        for intent_id in self.settled_elsewhere & set(wanted):
+            self.row(intent_id)["payment_status"] = "completed"
+        return FakeCursor(found)
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        row = self.row(query["stripe_payment_intent_id"])
+        if row["payment_status"] == query["payment_status"]["$ne"]:
+            return None
+        row.update(update["$set"])
+        return dict(row)
+
+    async def bulk_write(self, requests, ordered=True):
+        modified = 0
+        for request in requests:
+            row = self.row(request._filter["stripe_payment_intent_id"])
+            if row["payment_status"] == request._filter["payment_status"]:
+                row.update(request._doc["$set"])
+                modified += 1
+        return SimpleNamespace(modified_count=modified)
+
+
+class FakeTotals:
+    def __init__(self):
+        self.added = []
+
+    async def update_one(self, query, update, upsert=False):
+        self.added.append((query["wedding_id"], update["$inc"]["total_amount"]))
+
+
+def make_database(contributions):
+    return SimpleNamespace(contributions=contributions, contribution_totals=FakeTotals())
+
+
+def test_settled_intents_are_applied_page_by_page():
+    created_at = datetime.utcnow() - timedelta(days=1)
+    contributions = FakeContributions([
+        {"stripe_payment_intent_id": "pi_1", "wedding_id": "w1", "amount": 25, "payment_status": "pending", "created_at": created_at},
+        {"stripe_payment_intent_id": "pi_2", "wedding_id": "w2", "amount": 10, "payment_status": "pending", "created_at": created_at},
+        {"stripe_payment_intent_id": "pi_4", "wedding_id": "w1", "amount": 10, "payment_status": "pending", "created_at": created_at},
+    ])
+    gateway = FakeGateway([
+        {"id": "pi_1", "status": "succeeded", "amount_received": 2500},
+        {"id": "pi_2", "status": "canceled", "amount_received": 0},
+        {"id": "pi_3", "status": "succeeded", "amount_received": 100},
+        {"id": "pi_4", "status": "requires_payment_method", "amount_received": 0},
+    ])
+    database = make_database(contributions)
+
+    report = asyncio.run(reconcile_pending(database, gateway, page_size=2))
+    assert [call["starting_after"] for call in gateway.calls] == [None, "pi_2"]
+    assert report["pages"] == 2 and report["intents_scanned"] == 4
+    assert (report["matched"], report["completed"], report["failed"]) == (2, 1, 1)
+    assert contributions.row("pi_1")["payment_status"] == "completed"
+    assert contributions.row("pi_1")["amount_received"] == 25.0
+    assert contributions.row("pi_2")["payment_status"] == "failed"
+    assert contributions.row("pi_4")["payment_status"] == "pending"
+    assert database.contribution_totals.added == [("w1", 25)]
+
+
+def test_rows_completed_by_a_webhook_meanwhile_are_not_counted_again():
+    created_at = datetime.utcnow() - timedelta(days=1)
+    contributions = FakeContributions([
+        {"stripe_payment_intent_id": "pi_1", "wedding_id": "w1", "amount": 25, "payment_status": "pending", "created_at": created_at},
+        {"stripe_payment_intent_id": "pi_2", "wedding_id": "w1", "amount": 40, "payment_status": "pending", "created_at": created_at},
+    ], settled_elsewhere=["pi_1"])
+    gateway = FakeGateway([
+        {"id": "pi_1", "status": "succeeded", "amount_received": 2500},
+        {"id": "pi_2", "status": "succeeded", "amount_received": 4000},
+    ])
+    database = make_database(contributions)
+
+    report = asyncio.run(reconcile_pending(database, gateway))
+    assert (report["matched"], report["completed"]) == (1, 1)
+    assert database.contribution_totals.added == [("w1", 40)]
+
+
+def test_listing_starts_at_the_lookback_floor():
+    contributions = FakeContributions([{
+        "stripe_payment_intent_id": "pi_1", "wedding_id": "w1", "payment_status": "pending",
+        "created_at": (datetime.utcnow() - timedelta(days=90)).isoformat(),
+    }])
+    gateway = FakeGateway([])
+
+    asyncio.run(reconcile_pending(SimpleNamespace(contributions=contributions), gateway, lookback_days=30))
+    floor = calendar.timegm((datetime.utcnow() - timedelta(days=30)).utctimetuple())
+    assert abs(gateway.calls[0]["created"]["gte"] - floor) < 5
+
+
+def test_nothing_pending_makes_no_stripe_calls():
+    gateway = FakeGateway([])
+    report = asyncio.run(reconcile_pending(SimpleNamespace(contributions=FakeContributions([])), gateway))
+    assert gateway.calls == [] and report["pages"] == 0
@@ -0,0 +1,75 @@
+"""
+Tests for bulk RSVP import parsing and CSV export (utils/rsvp_import.py)
+"""
+import asyncio
+
+import pytest
+
+from utils.rsvp_import import ImportTooLarge, clean_row, csv_chunk, iter_csv_rows, iter_lines, iter_ndjson_rows
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(rows):
+    return [row async for row in rows]
+
+
+def parse_csv(*chunks):
+    return asyncio.run(collect(iter_csv_rows(iter_lines(stream(*chunks), max_bytes=1 << 20))))
+
+
+def test_lines_survive_multibyte_characters_split_across_chunks():
+    body = "﻿guest_name\nJosé\n".encode()
+    split = body.index("é".encode()) + 1
+    lines = asyncio.run(collect(iter_lines(stream(body[:split], body[split:]), max_bytes=100)))
+    assert lines == ["guest_name\n", "José\n"]
+
+
+def test_body_over_the_limit_is_rejected():
+    with pytest.raises(ImportTooLarge):
+        asyncio.run(collect(iter_lines(stream(b"a" * 60, b"b" * 60), max_bytes=100)))
+
+
+def test_csv_quoted_fields_may_span_lines():
+    rows = parse_csv(
+        b"Guest_Name,special_message\r\n",
+        b'Ana,"Congrats,\nyou two"\r\n',
+        b"\r\n",
+        b"Ben,hi,extra\n",
+        b'Cy,"never closed\n',
+    )
+    assert rows == [
+        (1, {"guest_name": "Ana", "special_message": "Congrats,\nyou two"}, None),
+        (2, None, "Expected 2 columns, got 3"),
+        (3, None, "Unterminated quoted field"),
+    ]
+
+
+def test_ndjson_rows_report_bad_lines():
+    lines = stream('{"guest_name": "Ana"}\n', "\n", "[1]\n", "{oops\n")
+    rows = asyncio.run(collect(iter_ndjson_rows(lines)))
+    assert rows[0] == (1, {"guest_name": "Ana"}, None)
+    assert rows[1] == (2, None, "Each line must be a JSON object")
+    assert rows[2][0] == 3 and rows[2][2].startswith("Invalid JSON")
+
+
+def test_clean_row_normalises_and_validates():
+    fields = clean_row({"guest_name": " Ana ", "attendance": "YES", "guest_count": "", "extra": "x"})
+    assert fields["guest_name"] == "Ana"
+    assert fields["attendance"] == "yes"
+    assert fields["guest_count"] == 1
+    assert "extra" not in fields
+    for row in ({"guest_name": ""}, {"guest_name": "A", "attendance": "maybe"},
+                {"guest_name": "A", "guest_count": "two"}, {"guest_name": "A", "guest_count": -1}):
+        with pytest.raises(ValueError):
+            clean_row(row)
+
+
+def test_export_neutralises_spreadsheet_formulas():
+    text = csv_chunk([{"id": "r1", "guest_name": "=HYPERLINK(\"x\")", "guest_count": 2}], header=True)
+    header, row = text.splitlines()
+    assert header.startswith("id,guest_name,")
+    assert row.startswith("r1,\"'=HYPERLINK(\"\"x\"\")\",")
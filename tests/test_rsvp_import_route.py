@@ -0,0 +1,85 @@
+"""
+Tests for the batched RSVP import route in server.py
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("fastapi", "httpx", "motor", "stripe", "python_multipart"):
+    pytest.importorskip(module)
+
+import server
+from fastapi.testclient import TestClient
+
+
+class FakeRsvps:
+    def __init__(self):
+        self.batches = []
+
+    async def bulk_write(self, requests, ordered):
+        self.batches.append(len(requests))
+        return SimpleNamespace(bulk_api_result={"nInserted": len(requests), "nUpserted": 0, "nMatched": 0})
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    rebuilt = []
+
+    async def wedding_id(session_id):
+        return "w1"
+
+    async def rebuild(database, wedding_id):
+        rebuilt.append(wedding_id)
+
+    rsvps = FakeRsvps()
+    monkeypatch.setattr(server, "get_user_wedding_id", wedding_id)
+    monkeypatch.setattr(server, "rebuild_summaries", rebuild)
+    monkeypatch.setattr(server, "database", SimpleNamespace(rsvps=rsvps))
+    monkeypatch.setattr(server, "RSVP_IMPORT_BATCH_SIZE", 2)
+    return SimpleNamespace(client=TestClient(server.app), rsvps=rsvps, rebuilt=rebuilt)
+
+
+def body(count):
+    return "guest_name,attendance\n" + "".join(f"Guest {i},yes\n" for i in range(count))
+
+
+class StreamedRequest:
+    """Request whose body arrives one line per chunk (TestClient sends it whole)"""
+
+    headers = {"content-type": "text/csv"}
+
+    def __init__(self, text):
+        self.lines = text.splitlines(keepends=True)
+
+    async def stream(self):
+        for line in self.lines:
+            yield line.encode()
+
+
+def test_import_writes_every_batch_and_rebuilds_once(fake):
+    response = fake.client.post("/api/rsvp/import?session_id=s", content=body(5), headers={"content-type": "text/csv"})
+    assert response.status_code == 200
+    assert response.json()["imported"] == 5
+    assert fake.rsvps.batches == [2, 2, 1]
+    assert fake.rebuilt == ["w1"]
+
+
+def test_oversized_import_drops_the_pending_batch_and_reports_what_was_committed(fake, monkeypatch):
+    data = body(5)
+    # The limit trips on the fifth row's chunk, leaving the fourth row pending
+    monkeypatch.setattr(server, "RSVP_IMPORT_MAX_BYTES", len(data) - 3)
+    with pytest.raises(server.HTTPException) as raised:
+        asyncio.run(server.import_rsvps(StreamedRequest(data), session_id="s"))
+    assert raised.value.status_code == 413
+    assert (raised.value.detail["imported"], raised.value.detail["updated"]) == (2, 0)
+    assert fake.rsvps.batches == [2]
+    assert fake.rebuilt == ["w1"]
+
+
+def test_oversized_import_without_committed_batches_writes_nothing(fake, monkeypatch):
+    monkeypatch.setattr(server, "RSVP_IMPORT_MAX_BYTES", 30)
+    response = fake.client.post("/api/rsvp/import?session_id=s", content=body(5), headers={"content-type": "text/csv"})
+    assert response.status_code == 413
+    assert fake.rsvps.batches == []
+    assert fake.rebuilt == []
@@ -0,0 +1,108 @@
+"""
+Tests for the paginated and streamed RSVP listing routes in server.py
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("fastapi", "httpx", "motor", "stripe", "python_multipart"):
+    pytest.importorskip(module)
+
+import server
+from fastapi.testclient import TestClient
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.batch = None
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.rows.sort(key=lambda row: row[field], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.rows = self.rows[:count]
+        return self
+
+    def batch_size(self, size):
+        self.batch = size
+        return self
+
+    async def to_list(self, length):
+        return self.rows[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in self.rows:
+            yield row
+
+
+def matches(row, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(row, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not row[field] < condition["$lt"]:
+                return False
+        elif row.get(field) != condition:
+            return False
+    return True
+
+
+class FakeRsvps:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def find(self, query, projection):
+        assert projection == {"_id": 0}
+        return FakeCursor([
+            {k: v for k, v in row.items() if k != "_id"} for row in self.rows if matches(row, query)
+        ])
+
+    async def count_documents(self, query):
+        return sum(matches(row, query) for row in self.rows)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    rows = [
+        {"_id": i, "id": f"r{i}", "wedding_id": "w1", "guest_name": f"Guest {i}",
+         "submitted_at": f"2024-05-0{i // 2 + 1}T10:00:00"}
+        for i in range(5)
+    ]
+    rows.append({"_id": 9, "id": "x", "wedding_id": "w2", "guest_name": "Other", "submitted_at": "2024-06-01"})
+    monkeypatch.setattr(server, "database", SimpleNamespace(rsvps=FakeRsvps(rows)))
+    return TestClient(server.app)
+
+
+def test_rsvps_are_listed_newest_first_a_page_at_a_time(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/rsvp/w1", params=params).json()
+        assert body["total_count"] == 5
+        assert all("_id" not in rsvp for rsvp in body["rsvps"])
+        seen.extend(rsvp["id"] for rsvp in body["rsvps"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["r4", "r3", "r2", "r1", "r0"]
+
+
+def test_ndjson_streams_every_rsvp(client):
+    response = client.get("/api/rsvp/w1", params={"format": "ndjson", "batch_size": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+    assert ids == ["r4", "r3", "r2", "r1", "r0"]
+
+
+@pytest.mark.parametrize("params", [{"format": "xml"}, {"cursor": "not-a-cursor"}, {"limit": 0}])
+def test_bad_listing_parameters_are_rejected(client, params):
+    assert client.get("/api/rsvp/w1", params=params).status_code == 400
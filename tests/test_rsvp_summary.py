@@ -0,0 +1,43 @@
+"""
+Tests for the RSVP summary counters (utils/rsvp_summary.py)
+"""
+import asyncio
+from types import SimpleNamespace
+
+from utils.rsvp_summary import dietary_keys, get_summary, merge_deltas, summary_delta
+
+
+def test_dietary_text_is_normalised_into_safe_keys():
+    assert dietary_keys("Vegan, nut-free and  Gluten Free") == ["vegan", "nut-free", "gluten free"]
+    assert dietary_keys("N/A") == []
+    assert dietary_keys("none") == []
+    assert dietary_keys("veg.an; $halal") == ["veg an", "halal"]
+    assert dietary_keys(None) == []
+
+
+def test_delta_counts_attending_guests_and_dietary_needs():
+    rsvp = {"attendance": "yes", "guest_count": 3, "dietary_restrictions": "Vegan"}
+    assert summary_delta(rsvp) == {
+        "responses": 1, "attending": 1, "attending_guests": 3, "dietary.vegan": 1,
+    }
+    assert summary_delta({"attendance": "no", "guest_count": 4}) == {"responses": 1, "declined": 1}
+    assert summary_delta({"attendance": "yes", "guest_count": "many"})["attending_guests"] == 1
+    assert summary_delta(None) == {}
+
+
+def test_changed_rsvp_merges_into_one_increment():
+    before = {"attendance": "yes", "guest_count": 2, "dietary_restrictions": "vegan"}
+    after = {"attendance": "no", "guest_count": 2}
+    assert merge_deltas(summary_delta(before, -1), summary_delta(after)) == {
+        "attending": -1, "attending_guests": -2, "dietary.vegan": -1, "declined": 1,
+    }
+
+
+def test_summary_hides_retracted_dietary_keys():
+    class Summaries:
+        async def find_one(self, query, projection):
+            return {"wedding_id": "w1", "responses": 2, "dietary": {"vegan": 0, "halal": 1}}
+
+    summary = asyncio.run(get_summary(SimpleNamespace(rsvp_summaries=Summaries()), "w1"))
+    assert summary["dietary"] == {"halal": 1}
+    assert summary["attending"] == 0 and summary["responses"] == 2
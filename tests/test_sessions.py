@@ -0,0 +1,91 @@
+"""
+Tests for the cached session lookup in server.py
+"""
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("fastapi", "motor", "stripe", "python_multipart"):
+    pytest.importorskip(module)
+
+import server
+from fastapi import HTTPException
+from models.user import User
+
+
+class FakeSessions:
+    def __init__(self, *session_ids):
+        self.session_ids = set(session_ids)
+        self.queries = 0
+        self.fail = False
+
+    async def count_documents(self, query, limit=0):
+        self.queries += 1
+        if self.fail:
+            raise RuntimeError("connection refused")
+        return int(query["session_id"] in self.session_ids)
+
+    async def update_one(self, query, update):
+        self.queries += 1
+        return SimpleNamespace(matched_count=int(query["session_id"] in self.session_ids))
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    sessions = FakeSessions("s1")
+    monkeypatch.setattr(server, "database", SimpleNamespace(sessions=sessions))
+    monkeypatch.setattr(server, "active_sessions", server.TTLCache(ttl=3600, sliding=True))
+    return sessions
+
+
+def cache_session(session_id, validated_ago=0, refreshed_ago=0):
+    now = datetime.utcnow()
+    user = User(id="u1", username="alice", password="secret")
+    server.active_sessions.set(session_id, {
+        "session_id": session_id,
+        "user_id": "u1",
+        "refreshed_at": now - timedelta(seconds=refreshed_ago),
+        "validated_at": now - timedelta(seconds=validated_ago),
+        "user": user,
+    })
+    return user
+
+
+def test_recently_validated_session_is_served_from_the_cache(sessions):
+    user = cache_session("s1")
+    assert asyncio.run(server.get_current_user_simple("s1")) is user
+    assert sessions.queries == 0
+
+
+def test_session_ended_by_another_worker_is_rejected(sessions):
+    cache_session("s2", validated_ago=server.SESSION_REVALIDATE_SECONDS)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(server.get_current_user_simple("s2"))
+    assert raised.value.status_code == 401
+    assert server.active_sessions.get("s2") is None
+
+
+def test_revalidation_runs_at_most_once_per_interval(sessions):
+    user = cache_session("s1", validated_ago=server.SESSION_REVALIDATE_SECONDS)
+    assert asyncio.run(server.get_current_user_simple("s1")) is user
+    assert asyncio.run(server.get_current_user_simple("s1")) is user
+    assert sessions.queries == 1
+
+
+def test_expiry_refresh_also_revalidates(sessions):
+    cache_session(
+        "s2",
+        validated_ago=server.SESSION_REFRESH_SECONDS,
+        refreshed_ago=server.SESSION_REFRESH_SECONDS,
+    )
+    with pytest.raises(HTTPException):
+        asyncio.run(server.get_current_user_simple("s2"))
+    assert sessions.queries == 1
+
+
+def test_cached_sessions_survive_a_mongodb_outage(sessions):
+    sessions.fail = True
+    user = cache_session("s1", validated_ago=server.SESSION_REVALIDATE_SECONDS)
+    assert asyncio.run(server.get_current_user_simple("s1")) is user
@@ -0,0 +1,167 @@
+"""
+Tests for the sharded JSON backup store (utils/shard_store.py)
+"""
+import asyncio
+import json
+
+from utils.persistence import PersistenceExecutor
+from utils.shard_store import ShardedJsonStore
+
+
+def make_store(root, **options):
+    options.setdefault("executor", PersistenceExecutor())
+    return ShardedJsonStore(root, index_fields=("shareable_id", "user_id"), **options)
+
+
+def test_journaled_writes_are_replayed_after_restart(tmp_path):
+    async def scenario():
+        store = make_store(tmp_path)
+        await store.start()
+        await store.set("w1", {"id": "w1", "title": "first"})
+        await store.set("w1", {"id": "w1", "title": "second"})
+        await store.set("w2", {"id": "w2", "title": "other"})
+        await store.delete("w2")
+        await store.executor.flush()
+
+        # Nothing compacted yet: the records only exist in the journal
+        assert store.journal_path.stat().st_size > 0
+        assert not (store.records_dir / "w1.json").exists()
+
+        restarted = make_store(tmp_path)
+        await restarted.start()
+        return await restarted.get("w1"), await restarted.get("w2")
+
+    w1, w2 = asyncio.run(scenario())
+    assert w1 == {"id": "w1", "title": "second"}
+    assert w2 is None
+
+
+def test_torn_final_journal_line_is_skipped(tmp_path):
+    async def scenario():
+        store = make_store(tmp_path)
+        await store.start()
+        await store.set("w1", {"id": "w1", "title": "kept"})
+        await store.executor.flush()
+        # A crash in the middle of the next append
+        with open(store.journal_path, "a") as f:
+            f.write('{"key": "w2", "value": {"id": "w2", "ti')
+
+        restarted = make_store(tmp_path)
+        await restarted.start()
+        return await restarted.get("w1"), await restarted.get("w2")
+
+    w1, w2 = asyncio.run(scenario())
+    assert w1 == {"id": "w1", "title": "kept"}
+    assert w2 is None
+
+
+def test_compaction_writes_one_shard_per_record_and_an_index(tmp_path):
+    async def scenario():
+        store = make_store(tmp_path)
+        await store.start()
+        await store.set("w1", {"id": "w1", "shareable_id": "abc", "user_id": "u1"})
+        await store.set("w2", {"id": "w2", "shareable_id": "def", "user_id": "u2"})
+        await store.executor.flush()
+        await store.compact()
+        return store
+
+    store = asyncio.run(scenario())
+    assert sorted(path.name for path in store.records_dir.iterdir()) == ["w1.json", "w2.json"]
+    assert store.journal_path.stat().st_size == 0
+    assert store.stats()["pending_records"] == 0
+
+    restarted = make_store(tmp_path)
+    asyncio.run(restarted.start())
+    assert asyncio.run(restarted.get_by("shareable_id", "def"))["id"] == "w2"
+
+
+def test_compaction_only_rewrites_changed_shards(tmp_path):
+    async def scenario():
+        store = make_store(tmp_path)
+        await store.start()
+        await store.set("w1", {"id": "w1", "user_id": "u1"})
+        await store.set("w2", {"id": "w2", "user_id": "u2"})
+        await store.executor.flush()
+        await store.compact()
+        (store.records_dir / "w1.json").write_text('{"id": "w1", "marker": true}')
+
+        await store.delete("w2")
+        await store.executor.flush()
+        await store.compact()
+        return store
+
+    store = asyncio.run(scenario())
+    assert (store.records_dir / "w1.json").read_text() == '{"id": "w1", "marker": true}'
+    assert not (store.records_dir / "w2.json").exists()
+    assert set(json.loads(store.index_path.read_text())) == {"w1"}
+
+
+def test_secondary_key_follows_record_changes(tmp_path):
+    async def scenario():
+        store = make_store(tmp_path)
+        await store.start()
+        await store.set("w1", {"id": "w1", "shareable_id": "old"})
+        await store.update("w1", {"shareable_id": "new"})
+        return await store.get_by("shareable_id", "old"), await store.get_by("shareable_id", "new")
+
+    old, new = asyncio.run(scenario())
+    assert old is None
+    assert new["id"] == "w1"
+
+
+def test_monolithic_backup_is_migrated_into_shards(tmp_path):
+    legacy = tmp_path / "weddings.json"
+    legacy.write_text('{"w1": {"id": "w1", "shareable_id": "abc"}, "w2": {"id": "w2"}}')
+
+    async def scenario():
+        store = make_store(tmp_path / "weddings", legacy_file=legacy)
+        await store.start()
+        return store, await store.get_by("shareable_id", "abc"), await store.get("w2")
+
+    store, w1, w2 = asyncio.run(scenario())
+    assert w1 == {"id": "w1", "shareable_id": "abc"}
+    assert w2 == {"id": "w2"}
+    assert (store.records_dir / "w1.json").exists()
+    assert store.index_path.exists()
+
+
+def test_compaction_keeps_records_journaled_by_another_process(tmp_path):
+    async def scenario():
+        # Two workers sharing one backup directory, each with its own writer
+        first = make_store(tmp_path, refresh_interval=0)
+        second = make_store(tmp_path, refresh_interval=0)
+        await first.start()
+        await second.start()
+        await first.set("w1", {"id": "w1", "user_id": "u1"})
+        await first.executor.flush()
+        await second.set("w2", {"id": "w2", "user_id": "u2"})
+        await second.executor.flush()
+
+        await second.compact()
+        return second, await first.get("w2"), await first.get_by("user_id", "u2")
+
+    second, w2, by_user = asyncio.run(scenario())
+    assert (second.records_dir / "w1.json").exists()
+    assert (second.records_dir / "w2.json").exists()
+    assert second.journal_path.stat().st_size == 0
+    assert w2 == by_user == {"id": "w2", "user_id": "u2"}
+
+
+def test_refresh_reloads_changes_made_by_another_process(tmp_path):
+    async def scenario():
+        reader = make_store(tmp_path, refresh_interval=0)
+        await reader.start()
+        before = await reader.get("w1")
+
+        writer = make_store(tmp_path)
+        await writer.start()
+        await writer.set("w1", {"id": "w1", "shareable_id": "s1"})
+        await writer.executor.flush()
+        await writer.compact()
+
+        return before, await reader.get_by("shareable_id", "s1"), reader.stats()["index_reloads"]
+
+    before, after, reloads = asyncio.run(scenario())
+    assert before is None
+    assert after == {"id": "w1", "shareable_id": "s1"}
+    assert reloads >= 1
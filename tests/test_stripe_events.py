@@ -0,0 +1,121 @@
+"""
+Tests for Stripe webhook ingestion (utils/stripe_events.py and the webhook route)
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from pymongo.errors import DuplicateKeyError
+from utils.stripe_events import StripeEventProcessor, event_record
+
+
+def make_event(event_id, event_type, intent_id, created, **intent):
+    return {
+        "id": event_id,
+        "type": event_type,
+        "created": created,
+        "data": {"object": {"id": intent_id, "object": "payment_intent", **intent}},
+    }
+
+
+class FakeEvents:
+    def __init__(self):
+        self.documents = {}
+        self.processed = []
+
+    async def insert_one(self, document):
+        if document["id"] in self.documents:
+            raise DuplicateKeyError("E11000 duplicate key")
+        self.documents[document["id"]] = document
+
+    async def update_many(self, query, update):
+        self.processed.extend(query["id"]["$in"])
+
+
+class FakeContributions:
+    def __init__(self):
+        self.completed = []
+        self.failed = []
+
+    async def find_one_and_update(self, query, update, **options):
+        self.completed.append((query["stripe_payment_intent_id"], update["$set"].get("amount_received")))
+        return None
+
+    async def bulk_write(self, operations, ordered=True):
+        self.failed.extend(operation._filter["stripe_payment_intent_id"] for operation in operations)
+        return SimpleNamespace(modified_count=len(operations))
+
+
+def test_record_keeps_the_payment_intent_fields():
+    event = make_event("evt_1", "payment_intent.succeeded", "pi_1", 100, status="succeeded", amount_received=5000)
+    record = event_record(event)
+    assert record["payment_intent_id"] == "pi_1"
+    assert record["payment_status"] == "succeeded"
+    assert record["amount_received"] == 5000
+    assert record["processed_at"] is None
+
+
+def test_batch_applies_only_the_latest_event_per_intent():
+    database = SimpleNamespace(stripe_events=FakeEvents(), contributions=FakeContributions())
+    processor = StripeEventProcessor(lambda: database)
+    batch = [
+        event_record(make_event("evt_2", "payment_intent.succeeded", "pi_1", 200, amount_received=5000)),
+        event_record(make_event("evt_1", "payment_intent.payment_failed", "pi_1", 100)),
+        event_record(make_event("evt_3", "payment_intent.canceled", "pi_2", 150)),
+    ]
+
+    asyncio.run(processor.process_batch(batch))
+    assert database.contributions.completed == [("pi_1", 50.0)]
+    assert database.contributions.failed == ["pi_2"]
+    assert sorted(database.stripe_events.processed) == ["evt_1", "evt_2", "evt_3"]
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    for module in ("fastapi", "httpx", "motor", "stripe", "python_multipart"):
+        pytest.importorskip(module)
+    import server
+    from fastapi.testclient import TestClient
+
+    database = SimpleNamespace(stripe_events=FakeEvents())
+    processor = StripeEventProcessor(lambda: database)
+    monkeypatch.setattr(server, "STRIPE_WEBHOOK_SECRET", "whsec_test")
+    monkeypatch.setattr(server, "database", database)
+    monkeypatch.setattr(server, "stripe_event_processor", processor)
+    return TestClient(server.app), database, processor
+
+
+def post_signed(client, event, secret="whsec_test"):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return client.post(
+        "/api/payment/webhook",
+        content=payload,
+        headers={"Stripe-Signature": f"t={timestamp},v1={signature}", "Content-Type": "application/json"},
+    )
+
+
+def test_signed_events_are_stored_once_and_queued(webhook):
+    client, database, processor = webhook
+    event = make_event("evt_1", "payment_intent.succeeded", "pi_1", 100, status="succeeded", amount_received=5000)
+
+    assert post_signed(client, event).json() == {"received": True}
+    assert post_signed(client, event).json() == {"received": True, "duplicate": True}
+    assert database.stripe_events.documents["evt_1"]["payment_intent_id"] == "pi_1"
+    assert processor.queue.qsize() == 1
+
+
+def test_unsigned_and_unhandled_events_are_not_stored(webhook):
+    client, database, processor = webhook
+    event = make_event("evt_1", "payment_intent.succeeded", "pi_1", 100)
+    assert post_signed(client, event, secret="whsec_other").status_code == 400
+    assert post_signed(client, {**event, "type": "charge.refunded"}).json() == {"received": True, "handled": False}
+    assert database.stripe_events.documents == {}
@@ -0,0 +1,96 @@
+"""
+Tests for the Stripe call executor (utils/stripe_gateway.py)
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+stripe = pytest.importorskip("stripe")
+pytest.importorskip("requests")
+
+from utils.stripe_gateway import StripeGateway, StripeGatewayBusy
+from utils.stripe_stub import StubStripeServer
+
+
+def make_gateway(**options):
+    gateway = StripeGateway(**options)
+    # Skip configure(): these calls never reach the network
+    gateway._executor = ThreadPoolExecutor(max_workers=gateway.max_concurrency)
+    return gateway
+
+
+def test_calls_run_off_the_event_loop_and_are_timed():
+    gateway = make_gateway()
+
+    async def scenario():
+        loop_thread = threading.get_ident()
+        called_on = await gateway.call("ping", threading.get_ident)
+        with pytest.raises(ValueError):
+            await gateway.call("ping", int, "not a number")
+        return loop_thread, called_on
+
+    loop_thread, called_on = asyncio.run(scenario())
+    gateway.close()
+    assert called_on != loop_thread
+    latency = gateway.stats()["latency"]["ping"]
+    assert latency["count"] == 2 and latency["errors"] == 1
+
+
+def test_calls_beyond_the_concurrency_limit_are_rejected_when_the_queue_times_out():
+    gateway = make_gateway(max_concurrency=1, queue_timeout=0.05)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.ensure_future(gateway.call("slow", release.wait, 5))
+        await asyncio.sleep(0.01)
+        with pytest.raises(StripeGatewayBusy):
+            await gateway.call("slow", release.wait, 5)
+        release.set()
+        await blocked
+
+    asyncio.run(scenario())
+    gateway.close()
+    assert gateway.stats()["rejected"] == 1
+    assert gateway.stats()["in_flight"] == 0
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    # configure() installs module-level client settings; put them back afterwards
+    for name in ("api_key", "api_base", "default_http_client", "max_network_retries"):
+        monkeypatch.setattr(stripe, name, getattr(stripe, name))
+    stripe.api_key = "sk_test_stub"
+    server = StubStripeServer(port=0).start()
+    yield server
+    server.stop()
+
+
+def test_payment_intents_round_trip_through_the_stub(stub):
+    gateway = StripeGateway(max_concurrency=2, api_base=stub.url, max_network_retries=0).configure()
+
+    async def scenario():
+        created = await gateway.create_payment_intent(amount=5000, currency="inr", metadata={"wedding_id": "w1"})
+        stub.succeed(created.id)
+        return created, await gateway.retrieve_payment_intent(created.id)
+
+    created, retrieved = asyncio.run(scenario())
+    gateway.close()
+    assert created.id in stub.intents
+    assert created.metadata["wedding_id"] == "w1"
+    assert (retrieved.id, retrieved.status, retrieved.amount_received) == (created.id, "succeeded", 5000)
+    latency = gateway.stats()["latency"]
+    assert latency["payment_intents.create"]["count"] == latency["payment_intents.retrieve"]["count"] == 1
+
+
+def test_slow_stripe_responses_time_out_and_free_their_slot(stub):
+    stub.latency = 0.5
+    gateway = StripeGateway(max_concurrency=1, timeout=0.1, api_base=stub.url, max_network_retries=0).configure()
+
+    with pytest.raises(stripe.APIConnectionError):
+        asyncio.run(gateway.retrieve_payment_intent("pi_missing"))
+    gateway.close()
+    stats = gateway.stats()
+    assert stats["in_flight"] == 0
+    assert stats["latency"]["payment_intents.retrieve"]["errors"] == 1
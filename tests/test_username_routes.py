@@ -0,0 +1,100 @@
+"""
+Tests for the username wedding routes in server.py
+"""
+import pytest
+
+for module in ("fastapi", "httpx", "motor", "stripe", "python_multipart"):
+    pytest.importorskip(module)
+
+import server
+from fastapi.testclient import TestClient
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def to_list(self, length):
+        return self.rows[:length]
+
+
+class FakeWeddings:
+    name = "weddings"
+
+    def __init__(self, *documents):
+        self.documents = list(documents)
+
+    async def find_one(self, query, *args, **kwargs):
+        raise AssertionError("the wedding should come from the $lookup")
+
+
+class FakeUsers:
+    """Evaluates the $match/$limit/$lookup/$project pipeline of find_wedding_by_username"""
+
+    def __init__(self, weddings, *documents):
+        self.weddings = weddings
+        self.documents = list(documents)
+        self.round_trips = 0
+
+    def aggregate(self, pipeline):
+        self.round_trips += 1
+        rows = [dict(document) for document in self.documents]
+        for stage in pipeline:
+            if "$match" in stage:
+                rows = [row for row in rows if all(row.get(k) == v for k, v in stage["$match"].items())]
+            elif "$limit" in stage:
+                rows = rows[:stage["$limit"]]
+            elif "$lookup" in stage:
+                lookup = stage["$lookup"]
+                assert lookup["from"] == self.weddings.name
+                for row in rows:
+                    row[lookup["as"]] = [
+                        dict(wedding) for wedding in self.weddings.documents
+                        if wedding.get(lookup["foreignField"]) == row.get(lookup["localField"])
+                    ]
+            elif "$project" in stage:
+                rows = [{"id": row["id"], "weddings": row["weddings"][:1]} for row in rows]
+        return FakeCursor(rows)
+
+    async def find_one(self, query, *args, **kwargs):
+        raise AssertionError("the user should come from the aggregation")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    weddings = FakeWeddings({"_id": "oid", "id": "w1", "user_id": "u1", "couple_name_1": "Ana"})
+    users = FakeUsers(
+        weddings,
+        {"_id": "oid1", "id": "u1", "username": "ana", "password": "secret"},
+        {"_id": "oid2", "id": "u2", "username": "ben", "password": "secret"},
+    )
+
+    async def get_collections():
+        return users, weddings
+
+    monkeypatch.setattr(server, "get_collections", get_collections)
+    monkeypatch.setattr(server, "public_wedding_cache", server.TTLCache())
+    return TestClient(server.app), users
+
+
+def test_username_resolves_to_the_wedding_in_one_round_trip(client):
+    client, users = client
+    response = client.get("/api/wedding/user/ana")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == "w1" and body["couple_name_1"] == "Ana"
+    assert "user_id" not in body and "_id" not in body
+    assert users.round_trips == 1
+
+
+def test_user_without_a_wedding_gets_the_default_card(client):
+    client, _ = client
+    body = client.get("/api/wedding/user/ben/gallery").json()
+    assert body["id"] == "default"
+    assert body["current_section"] == "gallery" and body["username"] == "ben"
+    assert "user_id" not in body
+
+
+def test_unknown_username_is_not_found(client):
+    client, _ = client
+    assert client.get("/api/wedding/user/nobody").status_code == 404
@@ -0,0 +1,77 @@
+"""
+Tests for PUT /api/wedding in server.py
+"""
+import pytest
+
+for module in ("fastapi", "httpx", "motor", "stripe", "python_multipart"):
+    pytest.importorskip(module)
+
+import server
+from fastapi.testclient import TestClient
+from models.user import User
+from pymongo.errors import OperationFailure
+from utils.persistence import PersistenceExecutor
+from utils.shard_store import ShardedJsonStore
+
+
+class FakeWeddings:
+    """Applies $set/$inc to one document like MongoDB, including path conflicts"""
+
+    def __init__(self, document):
+        self.document = document
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        if any(field in update.get("$inc", {}) for field in update.get("$set", {})):
+            raise OperationFailure("Updating the path 'version' would create a conflict at 'version'")
+        if self.document["user_id"] != query["user_id"]:
+            return None
+        self.document.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            self.document[field] = self.document.get(field, 0) + amount
+        return dict(self.document)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    weddings = FakeWeddings({
+        "_id": "oid", "id": "w1", "user_id": "u1", "shareable_id": "s1",
+        "couple_name_1": "Sarah", "version": 3,
+    })
+
+    async def get_collections():
+        return None, weddings
+
+    monkeypatch.setattr(server, "get_collections", get_collections)
+    monkeypatch.setattr(server, "weddings_backup", ShardedJsonStore(tmp_path, executor=PersistenceExecutor()))
+    monkeypatch.setattr(server, "active_sessions", server.TTLCache())
+    server.active_sessions.set("session", {
+        "session_id": "session", "user_id": "u1",
+        "user": User(id="u1", username="sarah", password="secret"),
+    })
+    return TestClient(server.app), weddings
+
+
+def test_put_ignores_protected_fields_loaded_by_the_client(client):
+    client, weddings = client
+    response = client.put("/api/wedding", json={
+        "session_id": "session",
+        "id": "w1", "user_id": "u2", "shareable_id": "other", "version": 3,
+        "couple_name_1": "Sara",
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["couple_name_1"] == "Sara"
+    assert body["version"] == 4
+    assert body["user_id"] == "u1" and body["shareable_id"] == "s1"
+    assert "updated_at" in weddings.document
+
+
+def test_put_cannot_restore_the_embedded_guestbook(client):
+    client, weddings = client
+    response = client.put("/api/wedding", json={
+        "session_id": "session",
+        "couple_name_1": "Sara",
+        "guestbook_messages": [{"name": "stale", "message": "from an old editor tab"}],
+    })
+    assert response.status_code == 200
+    assert "guestbook_messages" not in weddings.document